@@ -0,0 +1,717 @@
+import atexit
+import bisect
+import gzip
+import io
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from locks import file_lock
+from log_columns import LogColumns
+from metrics import SIZE_BUCKETS, histogram
+
+try:
+    import zstandard  # opcional: pip install zstandard
+except ImportError:
+    zstandard = None
+
+# Intervalo máximo (s) e tamanho do lote antes de gravar os logs pendentes
+FLUSH_INTERVAL = float(os.environ.get('ACCESS_LOG_FLUSH_INTERVAL', '2.0'))
+FLUSH_SIZE = int(os.environ.get('ACCESS_LOG_FLUSH_SIZE', '50'))
+# Quantidade de logs mantidos em memória, em colunas (~60 bytes por log)
+MAX_LOGS = int(os.environ.get('ACCESS_LOG_MAX_LOGS', '1000'))
+# O arquivo ativo vira um segmento comprimido ao passar de ROTATE_BYTES ou
+# quando a primeira linha fica mais velha que ROTATE_SECONDS
+ROTATE_BYTES = int(os.environ.get('ACCESS_LOG_ROTATE_BYTES', str(8 * 1024 * 1024)))
+ROTATE_SECONDS = float(os.environ.get('ACCESS_LOG_ROTATE_SECONDS', str(24 * 3600)))
+# Compressão dos segmentos: 'gzip' ou 'zstd' (com o módulo zstandard)
+COMPRESSION = os.environ.get('ACCESS_LOG_COMPRESSION', 'gzip')
+SEGMENT_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+MANIFEST_FILE = 'manifest.json'
+TOMBSTONES_FILE = 'tombstones.json'
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Campos com índice secundário (offsets das linhas de cada valor)
+INDEXED_FIELDS = ('username', 'ip')
+# Índices de segmentos mantidos em memória por processo
+INDEX_CACHE_SIZE = 16
+# Tamanho padrão de uma página de query() e prefixo dos cursores no arquivo ativo
+QUERY_LIMIT = 100
+ACTIVE_PREFIX = 'ativo.'
+
+# Métricas das gravações em lote (/metrics)
+WRITE_SECONDS = histogram('biblioteca_access_log_write_seconds', 'Tempo de cada gravação de um lote de logs')
+WRITE_BYTES = histogram('biblioteca_access_log_write_bytes', 'Bytes gravados por lote de logs',
+                        buckets=SIZE_BUCKETS)
+ROTATE_SECONDS_METRIC = histogram('biblioteca_access_log_rotate_seconds',
+                                  'Tempo de cada rotação do log ativo para um segmento comprimido')
+COMPACT_SECONDS = histogram('biblioteca_access_log_compact_seconds',
+                            'Tempo de cada compactação das lápides de usuários apagados')
+
+
+def _parse(line):
+    try:
+        entry = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+def _timestamp(line):
+    entry = _parse(line)
+    return entry.get('timestamp') if entry else None
+
+def _visible(entry, tombstones):
+    """A entrada não foi apagada por uma lápide (usuário -> timestamp da exclusão)?"""
+    cutoff = tombstones.get(entry.get('username'))
+    return cutoff is None or (entry.get('timestamp') or '') > cutoff
+
+def _fingerprint(inode, first_line):
+    """Identidade do arquivo ativo, mantida quando ele vira segmento (para os cursores)"""
+    return f"{inode:x}-{zlib.crc32(first_line):08x}"
+
+def _write_json(path, data):
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+def _candidates(index, username, ip):
+    """Offsets das linhas que podem casar com os filtros indexados; None se
+    não há filtro indexado (ou índice) e o arquivo precisa ser lido todo"""
+    if index is None:
+        return None
+    lists = [index[field].get(value, []) for field, value in zip(INDEXED_FIELDS, (username, ip))
+             if value is not None]
+    if not lists:
+        return None
+    if len(lists) == 1:
+        return list(lists[0])
+    return sorted(set(lists[0]).intersection(*lists[1:]))
+
+def _skip_to(f, position, target):
+    """Avança `f` até o offset `target` (lendo e descartando, se não der para buscar)"""
+    if f.seekable():
+        f.seek(target)
+        return target
+    while position < target:
+        chunk = f.read(min(target - position, 1 << 16))
+        if not chunk:
+            break
+        position += len(chunk)
+    return position
+
+def _scan(f, start=0, end=None, offsets=None):
+    """(offset, linha) de `f` a partir de `start` e antes de `end`; com `offsets`, só essas linhas"""
+    if offsets is None:
+        position = _skip_to(f, 0, start)
+        for line in f:
+            if end is not None and position >= end:
+                return
+            yield position, line
+            position += len(line)
+        return
+    position = 0
+    for offset in offsets[bisect.bisect_left(offsets, start):]:
+        if end is not None and offset >= end:
+            return
+        position = _skip_to(f, position, offset)
+        line = f.readline()
+        yield offset, line
+        position += len(line)
+
+
+class _IndexBuilder:
+    """Monta o índice de um arquivo de log: faixa de timestamps, número de
+    linhas e, para cada usuário/IP, os offsets das suas linhas"""
+
+    def __init__(self):
+        self.first = self.last = None
+        self.lines = 0
+        self.index = {field: {} for field in INDEXED_FIELDS}
+
+    def add(self, line, offset):
+        self.lines += 1
+        entry = _parse(line)
+        if entry is None:
+            return
+        timestamp = entry.get('timestamp')
+        if isinstance(timestamp, str):
+            # Workers gravam lotes fora de ordem: a faixa é min/max, não primeira/última
+            if self.first is None or timestamp < self.first:
+                self.first = timestamp
+            if self.last is None or timestamp > self.last:
+                self.last = timestamp
+        for field, offsets in self.index.items():
+            value = entry.get(field)
+            if value is not None:
+                offsets.setdefault(str(value), []).append(offset)
+
+
+class _ActiveIndex:
+    """Índice do arquivo ativo neste processo, estendido a cada consulta só
+    com as linhas gravadas desde a anterior (por qualquer worker)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, fingerprint):
+        self.id = fingerprint
+        self.end = 0
+        self.builder = _IndexBuilder()
+
+    def refresh(self, f):
+        """Indexa as linhas completas ainda não vistas de `f` (o ativo, recém-aberto em 'rb');
+        retorna (fingerprint, offset final indexado, primeiro timestamp, último timestamp)"""
+        first_line = f.readline()
+        if not first_line.endswith(b'\n'):
+            return None, 0, None, None
+        # O inode do segmento recém-comprimido costuma ser reaproveitado pelo ativo novo
+        fingerprint = _fingerprint(os.fstat(f.fileno()).st_ino, first_line)
+        with self._lock:
+            if fingerprint != self.id:
+                self._reset(fingerprint)
+            f.seek(self.end)
+            for line in f:
+                # Uma linha sem \n ainda está sendo gravada
+                if not line.endswith(b'\n'):
+                    break
+                self.builder.add(line, self.end)
+                self.end += len(line)
+            return self.id, self.end, self.builder.first, self.builder.last
+
+    def candidates(self, username, ip):
+        with self._lock:
+            return _candidates(self.builder.index, username, ip)
+
+
+class LogArchive:
+    """Segmentos comprimidos do log de acesso, descritos por um manifest.
+
+    O manifest lista os segmentos do mais antigo para o mais recente, com a
+    faixa de timestamps e o número de linhas de cada um, então uma consulta
+    por período pula os segmentos de fora sem abri-los. Cada segmento tem um
+    índice (.idx) com os offsets das linhas de cada usuário e IP. Quem altera
+    o arquivo (rotação, lápides, compactação) segura a trava do log ativo.
+    """
+
+    def __init__(self, directory, compression=COMPRESSION):
+        if compression == 'zstd' and zstandard is None:
+            print("Erro ao configurar logs: zstd pedido sem o módulo zstandard, usando gzip")
+            compression = 'gzip'
+        self.directory = directory
+        self.compression = compression
+        self.manifest_file = os.path.join(directory, MANIFEST_FILE)
+        self.tombstones_file = os.path.join(directory, TOMBSTONES_FILE)
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def segments(self):
+        """Entradas do manifest, da mais antiga para a mais recente"""
+        try:
+            with open(self.manifest_file, encoding='utf-8') as f:
+                return json.load(f)["segments"]
+        except FileNotFoundError:
+            return []
+
+    def _write_manifest(self, segments):
+        _write_json(self.manifest_file, {"segments": segments})
+
+    def open_binary(self, name):
+        path = os.path.join(self.directory, name)
+        if name.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"segmento {name} exige o módulo zstandard")
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True))
+        return gzip.open(path, 'rb')
+
+    def _open(self, name):
+        return io.TextIOWrapper(self.open_binary(name), encoding='utf-8')
+
+    def index(self, segment):
+        """Índice do segmento (None se não existe, como nos segmentos antigos)"""
+        key = segment.get("id", segment["file"])
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+        try:
+            with open(os.path.join(self.directory, segment["file"] + '.idx'), encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _compress(self, source, target):
+        """Comprime `source` em `target` (via .tmp, com fsync)"""
+        tmp_file = target + '.tmp'
+        with open(source, 'rb') as src, open(tmp_file, 'wb') as dst:
+            if self.compression == 'zstd':
+                with zstandard.ZstdCompressor(level=10).stream_writer(dst, closefd=False) as writer:
+                    shutil.copyfileobj(src, writer)
+            else:
+                with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=6, mtime=0) as writer:
+                    shutil.copyfileobj(src, writer)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_file, target)
+
+    def _store(self, plain, name, segment_id, source):
+        """Comprime `plain` como o segmento `name`, grava o índice e retorna a entrada do manifest"""
+        builder = _IndexBuilder()
+        offset = 0
+        with open(plain, 'rb') as f:
+            for line in f:
+                builder.add(line, offset)
+                offset += len(line)
+        path = os.path.join(self.directory, name)
+        _write_json(path + '.idx', builder.index)
+        self._compress(plain, path)
+        return {"file": name, "id": segment_id, "source": source, "first": builder.first,
+                "last": builder.last, "lines": builder.lines, "bytes": os.path.getsize(path)}
+
+    def add(self, pending):
+        """Comprime o arquivo `pending` (já movido para o diretório) e registra no manifest"""
+        with open(pending, 'rb') as f:
+            source = _fingerprint(os.fstat(f.fileno()).st_ino, f.readline())
+        name = os.path.basename(pending) + SEGMENT_EXTENSIONS[self.compression]
+        entry = self._store(pending, name, os.path.splitext(os.path.basename(pending))[0], source)
+        segments = [segment for segment in self.segments() if segment["file"] != name]
+        segments.append(entry)
+        self._write_manifest(segments)
+        os.remove(pending)
+
+    def recover(self):
+        """Conclui rotações interrompidas (arquivo movido mas não comprimido)"""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith('.jsonl'):
+                self.add(os.path.join(self.directory, name))
+            elif name.endswith('.plain'):
+                os.remove(os.path.join(self.directory, name))
+
+    def iter_lines(self, since=None, until=None, segments=None):
+        """Linhas dos segmentos (descomprimidas sob demanda), pulando os fora de [since, until]"""
+        for segment in self.segments() if segments is None else segments:
+            if since and segment.get("last") and segment["last"] < since:
+                continue
+            if until and segment.get("first") and segment["first"] > until:
+                continue
+            try:
+                with self._open(segment["file"]) as f:
+                    yield from f
+            except FileNotFoundError:
+                continue
+
+    def tombstones(self):
+        """Lápides pendentes: usuário -> timestamp da exclusão"""
+        try:
+            with open(self.tombstones_file, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def add_tombstone(self, username, cutoff):
+        os.makedirs(self.directory, exist_ok=True)
+        tombstones = self.tombstones()
+        tombstones[username] = cutoff
+        _write_json(self.tombstones_file, tombstones)
+
+    def clear_tombstones(self):
+        try:
+            os.remove(self.tombstones_file)
+        except FileNotFoundError:
+            pass
+
+    def rewrite(self, keep, usernames):
+        """Regrava, só com as linhas em que keep(line) é verdadeiro, os segmentos
+        que têm linhas de algum usuário de `usernames` (segundo o índice)"""
+        segments = []
+        for segment in self.segments():
+            index = self.index(segment)
+            if index is not None and not any(username in index["username"] for username in usernames):
+                segments.append(segment)
+                continue
+            path = os.path.join(self.directory, segment["file"])
+            plain = path + '.plain'
+            lines = 0
+            with self.open_binary(segment["file"]) as src, open(plain, 'wb') as dst:
+                for line in src:
+                    if keep(line):
+                        dst.write(line)
+                        lines += 1
+            if lines == segment["lines"]:
+                os.remove(plain)
+                segments.append(segment)
+                continue
+            if lines == 0:
+                os.remove(plain)
+                for leftover in (path, path + '.idx'):
+                    try:
+                        os.remove(leftover)
+                    except FileNotFoundError:
+                        pass
+                continue
+            # Offsets mudam: id novo (cursores antigos para este segmento expiram)
+            segment_id = segment.get("id", segment["file"]).split('+')[0] + f"+{lines}"
+            segments.append(self._store(plain, segment["file"], segment_id, segment.get("source")))
+            os.remove(plain)
+        self._write_manifest(segments)
+
+
+class AccessLogger:
+    """Logs de acesso em um buffer circular, gravados em lote como JSON Lines.
+
+    `log()` só adiciona a entrada na memória; uma thread em segundo plano
+    grava os pendentes no arquivo a cada `flush_interval` segundos ou quando
+    juntam `flush_size` entradas. Cada lote é um único write com trava de
+    arquivo, então vários workers podem gravar no mesmo arquivo.
+
+    O arquivo só recebe appends: quando passa de `rotate_bytes` (ou fica
+    mais velho que `rotate_seconds`) ele é movido para o arquivo morto e
+    comprimido como um segmento, e um arquivo novo começa. O histórico
+    inteiro continua disponível em `iter_entries()` e `query()`.
+
+    Apagar os logs de um usuário grava uma lápide: as entradas somem na hora
+    das consultas e saem dos arquivos na compactação, feita pela thread de
+    gravação.
+    """
+
+    def __init__(self, log_file, maxlen=MAX_LOGS, flush_interval=FLUSH_INTERVAL,
+                 flush_size=FLUSH_SIZE, legacy_file=None, archive_dir=None,
+                 rotate_bytes=ROTATE_BYTES, rotate_seconds=ROTATE_SECONDS, compression=COMPRESSION):
+        self.log_file = log_file
+        self.legacy_file = legacy_file
+        self.maxlen = maxlen
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.archive = LogArchive(archive_dir or os.path.splitext(log_file)[0] + '_archive', compression)
+        self.buffer = LogColumns(maxlen)
+        self._pending = []
+        self._active = (None, None)  # (inode do arquivo ativo, epoch da primeira linha)
+        self._active_index = _ActiveIndex()
+        self._compact_due = False
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    def load(self):
+        """Carrega os últimos logs do arquivo ativo (e dos segmentos mais recentes, se
+        o ativo tiver menos de `maxlen`), migrando antes o formato JSON antigo"""
+        try:
+            with file_lock(self.log_file):
+                self.archive.recover()
+                self._import_legacy()
+        except Exception as e:
+            print(f"Erro ao recuperar arquivo morto dos logs: {e}")
+        tombstones = self.archive.tombstones()
+        self._compact_due = bool(tombstones)
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                lines = deque(f, maxlen=self.maxlen)
+        except FileNotFoundError:
+            lines = deque(maxlen=self.maxlen)
+        # Completa com os segmentos mais recentes (só os necessários são abertos)
+        for segment in reversed(self.archive.segments()):
+            missing = self.maxlen - len(lines)
+            if missing <= 0:
+                break
+            older = deque(self.archive.iter_lines(segments=[segment]), maxlen=missing)
+            lines.extendleft(reversed(older))
+        for line in lines:
+            entry = _parse(line)
+            if entry is not None and _visible(entry, tombstones):
+                self.buffer.append(entry)
+        return self
+
+    def _import_legacy(self):
+        """Migra o access_logs.json antigo para um segmento do arquivo morto (chamar
+        com a trava do log).
+
+        Roda uma vez só entre workers e reinícios: a trava e a verificação do
+        ativo e dos segmentos impedem que cada worker importe de novo, e o
+        arquivo antigo é renomeado para .migrated. Os logs importados vão direto
+        para o arquivo morto, então seus timestamps antigos não contam para a
+        idade do arquivo ativo (rotação por tempo).
+        """
+        if (not self.legacy_file or not os.path.exists(self.legacy_file)
+                or os.path.exists(self.log_file) or self.archive.segments()):
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Erro ao migrar logs antigos: {e}")
+            return
+        if entries:
+            os.makedirs(self.archive.directory, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(self.log_file))[0]
+            pending = os.path.join(self.archive.directory, f"{stem}-legado-{os.getpid()}.jsonl")
+            # Gravado com outro nome e renomeado: recover() só vê o arquivo completo
+            with open(pending + '.tmp', 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(pending + '.tmp', pending)
+            self.archive.add(pending)
+        os.replace(self.legacy_file, self.legacy_file + '.migrated')
+
+    def start(self):
+        """Inicia a thread de gravação e garante o flush ao encerrar"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def log(self, entry):
+        """Adiciona uma entrada sem tocar no disco"""
+        with self._cond:
+            self.buffer.append(entry)
+            self._pending.append(entry)
+            if len(self._pending) >= self.flush_size:
+                self._cond.notify()
+
+    def recent(self, limit=None):
+        """Cópia dos logs em memória (ou só os `limit` últimos), do mais antigo para o mais recente"""
+        with self._cond:
+            return self.buffer.tail(len(self.buffer) if limit is None else limit)
+
+    def iter_entries(self, since=None, until=None):
+        """Todos os logs gravados (arquivo morto + ativo), do mais antigo para o mais
+        recente, lidos sob demanda; `since`/`until` no formato do timestamp"""
+        tombstones = self.archive.tombstones()
+        lines = itertools.chain(self.archive.iter_lines(since, until), self._active_lines())
+        for line in lines:
+            entry = _parse(line)
+            if entry is None or not _visible(entry, tombstones):
+                continue
+            timestamp = entry.get('timestamp') or ''
+            if (since and timestamp < since) or (until and timestamp > until):
+                continue
+            yield entry
+
+    def _active_lines(self):
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                yield from f
+        except FileNotFoundError:
+            return
+
+    def query(self, username=None, ip=None, page=None, action=None, since=None, until=None,
+              cursor=None, limit=QUERY_LIMIT):
+        """Logs que casam com os filtros, do mais antigo para o mais recente, em páginas.
+
+        Retorna (entradas, próximo cursor), com cursor None na última página.
+        Filtros por usuário/IP leem só as linhas apontadas pelos índices; o
+        período pula segmentos inteiros pelo manifest. Levanta ValueError se o
+        cursor é inválido ou aponta para um segmento que já foi compactado.
+        """
+        start_id, start_offset = None, 0
+        if cursor:
+            start_id, _, offset = cursor.rpartition(':')
+            if not start_id or not offset.isdigit():
+                raise ValueError("Cursor inválido")
+            start_offset = int(offset)
+        filters = {"username": username, "ip": ip, "page": page, "action": action}
+        tombstones = self.archive.tombstones()
+        try:
+            # Aberto antes de ler o manifest: se rotacionar no meio, o fd continua válido
+            active = open(self.log_file, 'rb')
+        except FileNotFoundError:
+            active = None
+        try:
+            # (id do cursor, segmento ou None para o ativo, fingerprint de quando era o ativo)
+            sources = [(segment.get("id", segment["file"]), segment, ACTIVE_PREFIX + str(segment.get("source")))
+                       for segment in self.archive.segments()]
+            active_id = active_end = active_first = active_last = None
+            if active is not None:
+                fingerprint, active_end, active_first, active_last = self._active_index.refresh(active)
+                active_id = fingerprint and ACTIVE_PREFIX + fingerprint
+                # Rotacionado depois de aberto: o conteúdo já está no último segmento
+                if active_id is not None and not (sources and sources[-1][2] == active_id):
+                    sources.append((active_id, None, active_id))
+            if start_id is not None:
+                # Um cursor do ativo continua valendo depois da rotação (pela fingerprint);
+                # se ela se repetir, vale o arquivo mais recente
+                matches = [position for position, (source_id, _, fingerprint) in enumerate(sources)
+                           if start_id in (source_id, fingerprint)]
+                if not matches:
+                    raise ValueError("Cursor expirado")
+                sources = sources[matches[-1]:]
+
+            results = []
+            for position, (source_id, segment, _) in enumerate(sources):
+                if segment is None:
+                    first, last = active_first, active_last
+                else:
+                    first, last = segment.get("first"), segment.get("last")
+                if (since and last and last < since) or (until and first and first > until):
+                    continue
+                if segment is None:
+                    offsets = self._active_index.candidates(username, ip)
+                else:
+                    offsets = _candidates(self.archive.index(segment), username, ip)
+                if offsets is not None and not offsets:
+                    continue
+                start = start_offset if position == 0 else 0
+                try:
+                    f = active if segment is None else self.archive.open_binary(segment["file"])
+                except FileNotFoundError:
+                    # Removido por uma compactação depois de lido o manifest
+                    continue
+                try:
+                    end = active_end if segment is None else None
+                    for offset, line in _scan(f, start, end, offsets):
+                        entry = _parse(line)
+                        if entry is None or not _visible(entry, tombstones):
+                            continue
+                        if any(value is not None and entry.get(field) != value for field, value in filters.items()):
+                            continue
+                        timestamp = entry.get('timestamp') or ''
+                        if (since and timestamp < since) or (until and timestamp > until):
+                            continue
+                        results.append(entry)
+                        if len(results) >= limit:
+                            return results, f"{source_id}:{offset + len(line)}"
+                finally:
+                    if segment is not None:
+                        f.close()
+            return results, None
+        finally:
+            if active is not None:
+                active.close()
+
+    def flush(self):
+        """Grava no arquivo os logs pendentes (e rotaciona, se for a hora)"""
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            payload = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in batch).encode('utf-8')
+            try:
+                with file_lock(self.log_file):
+                    with WRITE_SECONDS.time():
+                        with open(self.log_file, 'ab') as f:
+                            f.write(payload)
+                            size, inode = f.tell(), os.fstat(f.fileno()).st_ino
+                    WRITE_BYTES.observe(len(payload))
+                    if self._should_rotate(size, inode):
+                        with ROTATE_SECONDS_METRIC.time():
+                            self._rotate()
+            except Exception as e:
+                print(f"Erro ao salvar logs: {e}")
+
+    def _should_rotate(self, size, inode):
+        if size >= self.rotate_bytes:
+            return True
+        if self._active[0] != inode:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                first = _timestamp(f.readline())
+            try:
+                since = datetime.strptime(first, TIMESTAMP_FORMAT).timestamp()
+            except (TypeError, ValueError):
+                since = time.time()
+            self._active = (inode, since)
+        return time.time() - self._active[1] >= self.rotate_seconds
+
+    def _rotate(self):
+        """Move o arquivo ativo para o arquivo morto e o comprime (chamar com a trava do log)"""
+        os.makedirs(self.archive.directory, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(self.log_file))[0]
+        name = f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}.jsonl"
+        pending = os.path.join(self.archive.directory, name)
+        os.replace(self.log_file, pending)
+        self._active = (None, None)
+        self.archive.add(pending)
+
+    def delete_user(self, username):
+        """Apaga os logs de um usuário: saem na hora da memória e das consultas (lápide)
+        e dos arquivos na próxima compactação; retorna as entradas removidas da memória"""
+        with self._cond:
+            removed = self.buffer.remove('username', username)
+            self._pending = [log for log in self._pending if log.get('username') != username]
+        try:
+            with file_lock(self.log_file):
+                self.archive.add_tombstone(username, datetime.now().strftime(TIMESTAMP_FORMAT))
+        except Exception as e:
+            print(f"Erro ao salvar logs: {e}")
+        with self._cond:
+            self._compact_due = True
+            self._cond.notify()
+        return removed
+
+    def compact(self):
+        """Aplica as lápides: regrava os segmentos com linhas dos usuários apagados
+        e o arquivo ativo, depois descarta as lápides"""
+        try:
+            with file_lock(self.log_file):
+                tombstones = self.archive.tombstones()
+                if not tombstones:
+                    return
+
+                def keep(line):
+                    entry = _parse(line)
+                    return entry is None or _visible(entry, tombstones)
+
+                with COMPACT_SECONDS.time():
+                    self.archive.rewrite(keep, tombstones)
+                    self._rewrite_active(keep)
+                    self.archive.clear_tombstones()
+        except Exception as e:
+            print(f"Erro ao compactar logs: {e}")
+
+    def _rewrite_active(self, keep):
+        try:
+            with open(self.log_file, 'rb') as f:
+                lines = list(f)
+        except FileNotFoundError:
+            return
+        kept = [line for line in lines if keep(line)]
+        if len(kept) == len(lines):
+            return
+        tmp_file = self.log_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.writelines(kept)
+        os.replace(tmp_file, self.log_file)
+        self._active = (None, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopped and not self._compact_due and len(self._pending) < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                stopped, compact = self._stopped, self._compact_due
+                self._compact_due = False
+            self.flush()
+            if compact:
+                self.compact()
+            if stopped:
+                return
+
+    def close(self):
+        """Para a thread de gravação e grava o que estiver pendente"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
@@ -0,0 +1,157 @@
+import hashlib
+import itertools
+import math
+import threading
+from collections import Counter, OrderedDict
+
+# Quantos buckets de cada granularidade são mantidos
+BUCKET_RETENTION = {"minute": 24 * 60, "hour": 30 * 24, "day": 365}
+# Tamanho do prefixo do timestamp ("%Y-%m-%d %H:%M:%S") que define cada bucket
+_BUCKET_PREFIX = {"minute": 16, "hour": 13, "day": 10}
+
+
+class HyperLogLog:
+    """Estimador de cardinalidade com memória fixa (2^p registradores, ~1.6% de erro com p=12)"""
+
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self._alpha = 0.7213 / (1 + 1.079 / self.m)
+        self._cached = 0
+        self._dirty = False
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        h = int.from_bytes(digest, 'big')
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            self._dirty = True
+
+    def count(self):
+        if self._dirty:
+            estimate = self._alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+            zeros = self.registers.count(0)
+            # Correção para cardinalidades pequenas (linear counting)
+            if estimate <= 2.5 * self.m and zeros:
+                estimate = self.m * math.log(self.m / zeros)
+            self._cached = int(round(estimate))
+            self._dirty = False
+        return self._cached
+
+
+class AccessStats:
+    """Agregados dos logs de acesso atualizados a cada evento.
+
+    O painel lê contadores prontos em vez de percorrer os logs, então o
+    custo de renderização não depende de quantos eventos já ocorreram.
+    IPs e usuários únicos são estimados com HyperLogLog; as contagens por
+    minuto/hora/dia ficam em buckets com retenção limitada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.mobile = 0
+        self.browsers = Counter()
+        self.os = Counter()
+        self.actions = Counter()
+        self.users = Counter()
+        self.unique_ips = HyperLogLog()
+        self.unique_users = HyperLogLog()
+        self.buckets = {granularity: OrderedDict() for granularity in BUCKET_RETENTION}
+
+    def _apply(self, entry, sign):
+        device_info = entry.get('device_info') or {}
+        self.total += sign
+        if device_info.get('is_mobile', False):
+            self.mobile += sign
+        self.browsers[device_info.get('browser', 'Unknown')] += sign
+        self.os[device_info.get('os', 'Unknown')] += sign
+        self.actions[entry.get('action', 'Unknown')] += sign
+        if entry.get('username'):
+            self.users[entry['username']] += sign
+
+    def record(self, entry):
+        """Contabiliza um evento (chamado por log_access)"""
+        with self._lock:
+            self._apply(entry, 1)
+            self.unique_ips.add(entry.get('ip', ''))
+            if entry.get('username'):
+                self.unique_users.add(entry['username'])
+
+            timestamp = entry.get('timestamp') or ''
+            for granularity, buckets in self.buckets.items():
+                key = timestamp[:_BUCKET_PREFIX[granularity]]
+                buckets[key] = buckets.get(key, 0) + 1
+                buckets.move_to_end(key)
+                while len(buckets) > BUCKET_RETENTION[granularity]:
+                    buckets.popitem(last=False)
+
+    def record_columns(self, columns):
+        """Contabiliza de uma vez os eventos de um LogColumns (carga inicial): as
+        contagens saem das colunas, sem montar um dict por evento, e os estimadores
+        de únicos recebem cada valor distinto uma vez só"""
+        total = len(columns)
+        ips, users = columns.counts('ip'), columns.counts('username')
+        minutes = columns.minute_counts()
+        with self._lock:
+            self.total += total
+            self.mobile += columns.mobile_count()
+            for counter, name in ((self.browsers, 'browser'), (self.os, 'os')):
+                counts = columns.device_counts(name)
+                counter.update(counts)
+                # Sem device_info o evento conta como 'Unknown', como em record()
+                if total > sum(counts.values()):
+                    counter['Unknown'] += total - sum(counts.values())
+            self.actions.update(columns.counts('action'))
+            self.users.update({username: count for username, count in users.items() if username})
+            for ip in ips:
+                self.unique_ips.add(ip)
+            for username in users:
+                if username:
+                    self.unique_users.add(username)
+            for granularity, buckets in self.buckets.items():
+                keys = Counter()
+                for minute, count in minutes.items():
+                    keys[minute[:_BUCKET_PREFIX[granularity]]] += count
+                for key in sorted(keys):
+                    buckets[key] = buckets.get(key, 0) + keys[key]
+                    buckets.move_to_end(key)
+                while len(buckets) > BUCKET_RETENTION[granularity]:
+                    buckets.popitem(last=False)
+
+    def forget(self, entries):
+        """Desconta eventos excluídos. Os estimadores de únicos não regridem"""
+        with self._lock:
+            for entry in entries:
+                self._apply(entry, -1)
+                timestamp = entry.get('timestamp') or ''
+                for granularity, buckets in self.buckets.items():
+                    key = timestamp[:_BUCKET_PREFIX[granularity]]
+                    if key in buckets:
+                        buckets[key] -= 1
+            self.users = +self.users
+
+    def snapshot(self, top_browsers=5, top_os=5, top_actions=10):
+        """Valores usados pelo painel /admin/logs"""
+        with self._lock:
+            return {
+                "total_logs": self.total,
+                "unique_ips": self.unique_ips.count(),
+                "unique_users_count": self.unique_users.count(),
+                "mobile_percentage": round((self.mobile / self.total) * 100, 1) if self.total else 0,
+                "top_browsers": [item for item in self.browsers.most_common(top_browsers) if item[1] > 0],
+                "top_os": [item for item in self.os.most_common(top_os) if item[1] > 0],
+                "top_actions": [item for item in self.actions.most_common(top_actions) if item[1] > 0],
+                "unique_users": sorted(self.users),
+            }
+
+    def trend(self, granularity, last):
+        """Últimos `last` buckets da granularidade, do mais antigo ao mais recente"""
+        with self._lock:
+            items = list(itertools.islice(reversed(self.buckets[granularity].items()), last))
+        return items[::-1]
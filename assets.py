@@ -0,0 +1,90 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli  # opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Arquivos de static/ que passam pelo build (minificados e com hash no nome)
+ASSETS = ("styles.css", "lazy_sections.js", "biblioteca.js", "em_aberto.js", "view_other.js")
+# Saída do build, dentro de static/, e o mapa nome original -> arquivo gerado
+DIST_DIR = "dist"
+MANIFEST_FILE = "manifest.json"
+# Arquivos com hash nunca mudam: o navegador pode guardar por um ano sem revalidar
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def minificar_css(text):
+    """Remove comentários e espaços que não mudam o significado do CSS"""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    # Espaço antes de ':' separa seletores (a :hover), por isso só o de depois sai
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip() + '\n'
+
+def minificar_js(text):
+    """Minificação conservadora: tira indentação, linhas vazias e comentários de linha inteira.
+
+    Não mexe dentro das linhas, então strings e regex continuam intactas
+    (nenhum dos scripts tem template string de várias linhas).
+    """
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+MINIFIERS = {".css": minificar_css, ".js": minificar_js}
+
+
+def build(static_dir="static"):
+    """Gera static/dist/<nome>.<hash>.<ext> (mais .gz e .br) e o manifest; retorna o manifest"""
+    dist = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+    manifest = {}
+    for name in ASSETS:
+        with open(os.path.join(static_dir, name), encoding='utf-8') as f:
+            source = f.read()
+        base, ext = os.path.splitext(name)
+        data = MINIFIERS[ext](source).encode('utf-8')
+        output = f"{base}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        path = os.path.join(dist, output)
+        with open(path, 'wb') as f:
+            f.write(data)
+        # Versões pré-comprimidas: servidas sem custo de CPU por requisição
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+        manifest[name] = output
+    with open(os.path.join(dist, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def load_manifest(static_dir="static"):
+    """Manifest do último build, ou {} se o build não foi rodado (usa os originais)"""
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Erro ao carregar manifest dos assets: {e}")
+        return {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minifica os assets de static/ em arquivos com hash no nome")
+    parser.add_argument("--static", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+    args = parser.parse_args()
+    for name, output in build(args.static).items():
+        before = os.path.getsize(os.path.join(args.static, name))
+        path = os.path.join(args.static, DIST_DIR, output)
+        print(f"{name:<18} {before:>7} B -> {output:<28} {os.path.getsize(path):>7} B "
+              f"(gzip {os.path.getsize(path + '.gz')} B)")
@@ -0,0 +1,82 @@
+"""Bytes transferidos por /mybiblioteca antes e depois da compressão e do build dos assets.
+
+"Antes": HTML sem compressão e os arquivos originais de static/. "Depois":
+HTML com gzip (ou br, se o módulo brotli estiver instalado) e os assets
+minificados do build, pré-comprimidos. Roda numa pasta temporária, com um
+usuário de teste; o static/ do projeto não é alterado.
+
+    python -m benchmarks.bench_compression [--titles 200] [--encoding gzip|br]
+"""
+import argparse
+import atexit
+import os
+import re
+import shutil
+import tempfile
+
+
+def _wire(client, url, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    response = client.get(url, headers=headers)
+    size = len(response.get_data())
+    response.close()
+    return size
+
+
+def _page(client, username, encoding):
+    """Tamanho de cada recurso da página (HTML + CSS/JS referenciados)"""
+    html = client.get(f'/mybiblioteca?username={username}').get_data(as_text=True)
+    urls = [url for url in re.findall(r'(?:href|src)="(/static/[^"]+)"', html) if not url.endswith('.ico')]
+    sizes = {'/mybiblioteca': _wire(client, f'/mybiblioteca?username={username}', encoding)}
+    for url in urls:
+        sizes[url] = _wire(client, url, encoding)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=200, help='títulos do usuário de teste')
+    parser.add_argument('--encoding', choices=['gzip', 'br'], default='gzip')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='biblioteca-compression-')
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        import assets
+        import main as webapp
+        app = webapp.create_app()
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench'})
+        for i in range(args.titles):
+            client.post('/add', data={'username': 'bench', 'title': f'Título número {i}',
+                                      'category': 'filme' if i % 2 else 'serie'})
+
+        webapp.asset_manifest.clear()
+        webapp.versao_templates.cache_clear()
+        before = _page(client, 'bench', None)
+
+        static = os.path.join(workdir, 'static')
+        shutil.copytree(app.static_folder, static)
+        app.static_folder = static
+        webapp.asset_manifest.update(assets.build(static))
+        webapp.versao_templates.cache_clear()
+        after = _page(client, 'bench', args.encoding)
+        # Grava e fecha tudo ainda dentro da pasta temporária
+        webapp.shutdown()
+        atexit.unregister(webapp.shutdown)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'recurso':<44} {'bytes':>8}")
+    for url, size in before.items():
+        print(f"antes  {url:<37} {size:>8}")
+    for url, size in after.items():
+        print(f"depois {url:<37} {size:>8}")
+    total_before, total_after = sum(before.values()), sum(after.values())
+    print(f"total: {total_before} -> {total_after} bytes ({100 * (1 - total_after / total_before):.0f}% menos)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Latência das mutações do storage JSON em cada modo de durabilidade.
+
+Simula a exclusão em sequência de vários itens de Em Aberto (uma mutação
+por requisição), com uma e com várias threads. Roda numa pasta temporária.
+
+    python -m benchmarks.bench_durability [--mutations 2000] [--threads 8]
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from storage import DURABILITY_MODES, JsonStorage
+
+
+def _run(mode, mutations, threads):
+    workdir = tempfile.mkdtemp(prefix='biblioteca-durability-')
+    try:
+        storage = JsonStorage(f"{workdir}/media_lists.json", durability=mode)
+        storage.init_user("bench")
+        per_thread = mutations // threads
+        for t in range(threads):
+            for i in range(per_thread):
+                storage.add_title("bench", "movies", f"T{t}-{i}", abertos=True)
+
+        def worker(t):
+            for i in range(per_thread):
+                storage.remove_title("bench", "movies", f"T{t}-{i}", abertos=True)
+
+        pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        storage.close()
+        return elapsed / (per_thread * threads) * 1e6
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mutations', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'modo':<10} {'1 thread (µs)':>14} {f'{args.threads} threads (µs)':>16}")
+    for mode in DURABILITY_MODES:
+        single = _run(mode, args.mutations, 1)
+        multi = _run(mode, args.mutations, args.threads)
+        print(f"{mode:<10} {single:>14.1f} {multi:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Memória e tempo de agregação dos logs em memória: deque de dicts vs LogColumns.
+
+Lê N logs sintéticos (os mesmos da suíte) e guarda cada um como o
+AccessLogger fazia (um dict por evento, com o device_info aninhado) e em
+colunas. A memória é medida com tracemalloc e extrapolada para 1 milhão
+de eventos; a agregação é a carga inicial do painel (AccessStats).
+
+    python -m benchmarks.bench_log_memory [--events 200000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+from analytics import AccessStats
+from benchmarks.suite import generate
+from log_columns import LogColumns
+
+
+def _measure_memory(build):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        store = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return store, after - before
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        generate(workdir, {"users": 100, "titles": 1, "other_titles": 1, "logs": args.events}, iterations=1)
+        with open(os.path.join(workdir, 'access_logs.jsonl'), encoding='utf-8') as f:
+            lines = f.readlines()
+
+    def dicts():
+        return deque((json.loads(line) for line in lines), maxlen=len(lines))
+
+    def columns():
+        store = LogColumns(len(lines))
+        for line in lines:
+            store.append(json.loads(line))
+        return store
+
+    scale = 1_000_000 / len(lines)
+    results = {}
+    for name, build in (("deque de dicts", dicts), ("LogColumns", columns)):
+        store, size = _measure_memory(build)
+        stats = AccessStats()
+        if isinstance(store, LogColumns):
+            aggregate = _timed(lambda: stats.record_columns(store))
+        else:
+            aggregate = _timed(lambda: [stats.record(entry) for entry in store])
+        results[name] = (size, aggregate)
+        print(f"{name:16} {size * scale / 2 ** 20:8.1f} MiB/milhão ({size / len(lines):6.1f} B/evento)  "
+              f"agregação {aggregate * scale:6.2f} s/milhão")
+        del store
+    before, after = results["deque de dicts"], results["LogColumns"]
+    print(f"memória {before[0] / after[0]:.1f}x menor, agregação {before[1] / after[1]:.1f}x mais rápida")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Latência do índice de busca com uma coleção sintética de títulos.
+
+    python -m benchmarks.bench_search [--titles 100000] [--users 100]
+"""
+import argparse
+import random
+import time
+
+from search import TitleIndex
+
+PALAVRAS = ["capitão", "américa", "vingadores", "noite", "vampiro", "aventura", "mistério", "última",
+            "guerra", "estrelas", "coração", "sombras", "assassin’s", "creed", "dragão", "cidade",
+            "perdido", "tempo", "reino", "gelo", "fogo", "futuro", "código", "missão", "impossível"]
+CONSULTAS = ["capitao", "america vinga", "vampro", "assassin's creed", "misterio da noite", "zzz", "c"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    index = TitleIndex()
+    index._built = True
+    start = time.perf_counter()
+    for i in range(args.titles):
+        title = ' '.join(rng.choice(PALAVRAS).title() for _ in range(rng.randint(1, 4))) + f" {i}"
+        index.on_mutation("add", f"user{i % args.users}", rng.choice(["movies", "series"]), title)
+    build = time.perf_counter() - start
+    print(f"{len(index)} títulos indexados em {build:.2f}s ({build / args.titles * 1e6:.1f} µs/título)")
+
+    print(f"{'consulta':<20} {'todos (ms)':>11} {'1 usuário (ms)':>15} {'resultados':>11}")
+    for query in CONSULTAS:
+        timings = []
+        for username in (None, "user7"):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results = index.search(query, username=username)
+            timings.append((time.perf_counter() - start) / args.repeat * 1000)
+        print(f"{query:<20} {timings[0]:>11.3f} {timings[1]:>15.3f} {len(results):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Início do storage e memória conforme a quantidade de usuários: engine json vs mmap.
+
+Para cada quantidade gera um media_lists.json sintético (o snapshot
+binário é criado a partir dele antes de medir) e mede, com o journal
+vazio, o tempo de create_storage e a memória alocada pelo Python
+(tracemalloc, que também deixa os tempos maiores) logo depois, e de novo
+após ler `--reads` usuários. Na engine mmap a memória fica limitada
+pelo LRU (USER_CACHE_SIZE).
+
+    python -m benchmarks.bench_snapshot [--users 1000 10000 100000] [--titles 20] [--reads 2000]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from storage import create_storage
+
+
+def _generate(json_file, users, titles):
+    rng = random.Random(users)
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump({f"user{i}": {"movies": [f"Filme {rng.randrange(10 ** 6)}" for _ in range(titles)],
+                                "series": [f"Série {rng.randrange(10 ** 6)}" for _ in range(titles // 2)],
+                                "abertos": {"movies": [], "series": []}, "version": 1}
+                   for i in range(users)}, f, ensure_ascii=False)
+
+
+def _measure(backend, json_file, users, reads):
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        storage = create_storage(backend, json_file=json_file)
+        startup = time.perf_counter() - start
+        loaded = tracemalloc.get_traced_memory()[0]
+        rng = random.Random(0)
+        for _ in range(reads):
+            storage.get_user(f"user{rng.randrange(users)}")
+        after_reads = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    storage.journal.stop()
+    return startup, loaded, after_reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--titles', type=int, default=20, help='filmes por usuário (e metade em séries)')
+    parser.add_argument('--reads', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'usuários':>9} {'engine':<6} {'início (ms)':>12} {'memória (MiB)':>14} {'após leituras':>14}")
+    for users in args.users:
+        with tempfile.TemporaryDirectory() as workdir:
+            json_file = os.path.join(workdir, 'media_lists.json')
+            _generate(json_file, users, args.titles)
+            create_storage('mmap', json_file=json_file).close()
+            for backend in ('json', 'mmap'):
+                startup, loaded, after_reads = _measure(backend, json_file, users, args.reads)
+                print(f"{users:>9} {backend:<6} {startup * 1000:>12.1f} {loaded / 2 ** 20:>14.1f} "
+                      f"{after_reads / 2 ** 20:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compara o tempo de renderização por requisição: template inline x arquivo.
+
+"Antes" reproduz o render_template_string com o código-fonte da página, que
+o Jinja compila a cada chamada. "Depois" usa render_template com o template
+já compilado em cache.
+
+    python -m benchmarks.bench_templates [--titles 351] [--repeat 200]
+"""
+import argparse
+import os
+import time
+
+from flask import Flask, render_template, render_template_string
+
+import main as webapp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _contexts(titles):
+    movies = [f"Filme {i}" for i in range(titles)]
+    series = [f"Série {i}" for i in range(titles // 4)]
+    logs = [{
+        "timestamp": "2025-01-01 12:00:00", "ip": f"10.0.0.{i % 50}", "page": "mybiblioteca",
+        "username": f"user{i % 20}", "action": None, "method": "GET", "extra_data": {},
+        "device_info": {"is_mobile": i % 3 == 0, "browser": "Chrome", "os": "Android", "language": "pt-BR"}
+    } for i in range(1000)]
+    return {
+        'biblioteca.html': dict(username='bench', movies=movies, series=series, users=['bench', 'outro']),
+        'view_other.html': dict(username='bench', other_username='outro', movies=movies, series=series),
+        'view_aberto.html': dict(username='bench', other_user='outro', movies=movies[:20], series=series[:20]),
+        'em_aberto.html': dict(username='bench', movies=movies[:20], series=series[:20]),
+        'admin_logs.html': dict(logs=logs, total_logs=len(logs), unique_ips=50, unique_users_count=20,
+                                mobile_percentage=33.3, top_browsers=[('Chrome', 1000)],
+                                top_os=[('Android', 1000)], top_actions=[(None, 1000)],
+                                unique_users=[f"user{i}" for i in range(20)]),
+    }
+
+def _measure(render, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=351)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask('main', root_path=ROOT)
+    # Helpers globais que os templates usam (o base.html chama asset_url); sem
+    # o build de assets, apontam para os arquivos originais em static/
+    app.jinja_env.globals['asset_url'] = webapp.asset_url
+    print(f"{'template':<18} {'inline (ms)':>12} {'arquivo (ms)':>13} {'ganho':>7}")
+    with app.test_request_context('/'):
+        for name, context in _contexts(args.titles).items():
+            with open(os.path.join(ROOT, 'templates', name), encoding='utf-8') as f:
+                source = f.read()
+            render_template(name, **context)
+            before = _measure(lambda: render_template_string(source, **context), args.repeat)
+            after = _measure(lambda: render_template(name, **context), args.repeat)
+            print(f"{name:<18} {before:>12.3f} {after:>13.3f} {before / after:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
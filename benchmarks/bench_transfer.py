@@ -0,0 +1,83 @@
+"""Importação e exportação de uma biblioteca com um milhão de linhas.
+
+Gera o arquivo numa pasta temporária (com ~1% de linhas repetidas),
+importa para um storage novo, exporta de volta e confere a contagem. A
+memória da exportação é medida com tracemalloc: deve ficar constante,
+independente do tamanho da biblioteca.
+
+    python -m benchmarks.bench_transfer [--rows 1000000] [--format csv|jsonl] [--backend json|mmap|sqlite]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from storage import create_storage
+from transfer import FIELDS, export_chunks, import_rows, parse_rows, text_lines
+
+
+def _generate(path, rows, fmt):
+    rng = random.Random(42)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        if fmt == 'csv':
+            writer.writerow(FIELDS)
+        for i in range(rows):
+            n = rng.randrange(i) if i and rng.random() < 0.01 else i
+            row = (rng.choice(["biblioteca", "biblioteca", "abertos"]) if n == i else "biblioteca",
+                   "filme" if n % 2 else "serie", f"Título número {n}")
+            if fmt == 'csv':
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--backend', choices=['json', 'mmap', 'sqlite'], default='json')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='biblioteca-transfer-')
+    try:
+        source = os.path.join(workdir, f'entrada.{args.format}')
+        _generate(source, args.rows, args.format)
+        print(f"arquivo: {args.rows} linhas, {os.path.getsize(source) / 1e6:.1f} MB")
+
+        storage = create_storage(args.backend, json_file=os.path.join(workdir, 'media_lists.json'),
+                                 db_file=os.path.join(workdir, 'biblioteca.db'))
+        start = time.perf_counter()
+        with open(source, 'rb') as f:
+            totals = import_rows(storage, 'bench', parse_rows(text_lines(f), args.format))
+        elapsed = time.perf_counter() - start
+        print(f"importação: {elapsed:.1f}s ({args.rows / elapsed:,.0f} linhas/s) {totals}")
+
+        target = os.path.join(workdir, f'saida.{args.format}')
+        tracemalloc.start()
+        start = time.perf_counter()
+        exported = 0
+        with open(target, 'w', encoding='utf-8', newline='') as f:
+            for chunk in export_chunks(storage, 'bench', args.format):
+                f.write(chunk)
+                exported += chunk.count('\n')
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if args.format == 'csv':
+            exported -= 1
+        print(f"exportação: {elapsed:.1f}s ({exported / elapsed:,.0f} linhas/s), "
+              f"pico de memória {peak / 1024:.0f} KiB (com tracemalloc)")
+        print(f"linhas exportadas: {exported} (importadas: {totals['imported']})")
+        storage.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
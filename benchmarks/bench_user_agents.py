@@ -0,0 +1,65 @@
+"""Custo por chamada do parse de User-Agent, com e sem o cache LRU.
+
+O tráfego é simulado sorteando User-Agents reais com distribuição de Zipf
+(poucos navegadores concentram a maior parte dos acessos).
+
+    python -m benchmarks.bench_user_agents [--requests 200000]
+"""
+import argparse
+import random
+import time
+
+from user_agents import parse_user_agent
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.2478.80",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) SamsungBrowser/24.0 Chrome/117.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPad; CPU OS 17_4 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:124.0) Gecko/20100101 Firefox/124.0",
+    "Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.6367.82 Mobile Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "python-requests/2.31.0",
+    "curl/8.4.0",
+    "",
+]
+LANGUAGES = ["pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7", "pt-BR", "en-US,en;q=0.9", ""]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(len(USER_AGENTS))]
+    traffic = [(ua, rng.choice(LANGUAGES))
+               for ua in rng.choices(USER_AGENTS, weights=weights, k=args.requests)]
+
+    uncached = parse_user_agent.__wrapped__
+    start = time.perf_counter()
+    for user_agent, language in traffic:
+        uncached(user_agent, language)
+    before = (time.perf_counter() - start) / len(traffic) * 1e6
+
+    parse_user_agent.cache_clear()
+    start = time.perf_counter()
+    for user_agent, language in traffic:
+        parse_user_agent(user_agent, language)
+    after = (time.perf_counter() - start) / len(traffic) * 1e6
+
+    info = parse_user_agent.cache_info()
+    print(f"{len(traffic)} chamadas, {len(set(traffic))} pares distintos")
+    print(f"sem cache: {before:.3f} µs/chamada")
+    print(f"com cache: {after:.3f} µs/chamada ({before / after:.1f}x)")
+    print(f"hits: {info.hits}, misses: {info.misses}, taxa de acerto: {info.hits / (info.hits + info.misses):.2%}")
+
+
+if __name__ == '__main__':
+    main()
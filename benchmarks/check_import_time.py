@@ -0,0 +1,105 @@
+"""Verificação de regressão do início a frio: `import main` com -X importtime.
+
+Importa o main num subprocesso, numa pasta vazia, `--runs` vezes e fica com
+a melhor medição (a menos afetada por ruído). Antes, os módulos do projeto
+são compilados (compileall) e um import de aquecimento é descartado: o que
+se mede é o início de um worker com o bytecode já em __pycache__, como num
+deploy, e não a compilação dos fontes. Falha (código 1) se:
+
+- o import total passar de `--budget-ms`;
+- a parte do projeto (tempo próprio do main + módulos do repositório que ele
+  importa) passar de `--own-budget-ms`;
+- o import tiver efeitos colaterais: arquivos criados na pasta ou threads
+  iniciadas (isso é trabalho de create_app()).
+
+    python -m benchmarks.check_import_time [--budget-ms 400] [--own-budget-ms 40] [--runs 5]
+
+Não há suíte de testes no repositório: a verificação roda como um passo
+próprio do CI (ou antes de um deploy), na raiz do repositório, e o passo
+falha com o código de saída 1.
+"""
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Orçamentos padrão, com folga sobre o medido (~200 ms no total, ~25 ms do projeto, 1 CPU)
+IMPORT_BUDGET_MS = 400
+OWN_BUDGET_MS = 40
+# Executado no subprocesso depois do import: threads vivas e arquivos na pasta
+_PROBE = "import main, os, threading; print(threading.active_count(), sorted(os.listdir('.')))"
+
+
+def _parse(stderr):
+    """{módulo: (próprio µs, acumulado µs, nível)} das linhas do -X importtime"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules[name.strip()] = (int(own), int(cumulative), level)
+    return modules
+
+def _project_modules():
+    return {name[:-3] for name in os.listdir(ROOT) if name.endswith('.py')}
+
+def measure():
+    """Uma importação a frio; retorna (total ms, projeto ms, por módulo, threads, arquivos)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        child = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE], cwd=workdir, env=env,
+                               capture_output=True, text=True)
+    if child.returncode != 0:
+        raise RuntimeError(f"import main falhou:\n{child.stderr[-2000:]}")
+    modules = _parse(child.stderr)
+    threads, files = child.stdout.strip().split(' ', 1)
+    project = _project_modules()
+    # Módulos importados diretamente pelo main: os do repositório contam inteiros
+    own = {name: cumulative for name, (_, cumulative, level) in modules.items() if level == 1 and name in project}
+    own['main'] = modules['main'][0]
+    total = modules['main'][1]
+    return total / 1000, sum(own.values()) / 1000, own, int(threads), files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--own-budget-ms', type=float, default=OWN_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # Bytecode atualizado dos módulos do projeto; o primeiro import aquece o
+    # cache de arquivos do sistema e grava o bytecode do que faltar
+    compileall.compile_dir(ROOT, maxlevels=0, quiet=1)
+    measure()
+    runs = [measure() for _ in range(args.runs)]
+    # Melhor medição de cada orçamento; os efeitos colaterais valem para qualquer execução
+    total = min(run[0] for run in runs)
+    _, own_total, own, _, _ = min(runs, key=lambda run: run[1])
+    threads = max(run[3] for run in runs)
+    files = next((run[4] for run in runs if run[4] != '[]'), '[]')
+    print(f"import main: {total:.1f} ms (orçamento {args.budget_ms:.0f}), "
+          f"projeto {own_total:.1f} ms (orçamento {args.own_budget_ms:.0f})")
+    for name, cumulative in sorted(own.items(), key=lambda item: -item[1]):
+        print(f"  {name:<14} {cumulative / 1000:6.1f} ms")
+
+    failures = []
+    if total > args.budget_ms:
+        failures.append(f"import total acima do orçamento: {total:.1f} ms")
+    if own_total > args.own_budget_ms:
+        failures.append(f"módulos do projeto acima do orçamento: {own_total:.1f} ms")
+    if threads != 1:
+        failures.append(f"o import iniciou threads ({threads} vivas)")
+    if files != '[]':
+        failures.append(f"o import criou arquivos: {files}")
+    for failure in failures:
+        print(f"FALHOU: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Teste de carga do servidor gunicorn com diferentes números de workers.
+
+Sobe o gunicorn numa cópia temporária dos dados (os arquivos do projeto não
+são alterados), dispara requisições concorrentes com conexões persistentes
+e mede req/s e latência para /health, /login e /api/biblioteca.
+
+    python -m benchmarks.load_test [--workers 1 2 4] [--clients 8] [--seconds 5]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILES = ['media_lists.json']
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(server, port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def _requests(username):
+    query = urlencode({'username': username, 'category': 'filme', 'limit': 100})
+    login = urlencode({'username': username})
+    return [
+        ('GET', '/health', None, {}),
+        ('POST', '/login', login, {'Content-Type': 'application/x-www-form-urlencoded'}),
+        ('GET', f'/api/biblioteca?{query}', None, {}),
+    ]
+
+
+def _client(port, seconds, username, results):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    latencies, errors = [], 0
+    requests = _requests(username)
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        method, path, body, headers = requests[i % len(requests)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except OSError:
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    results.put((latencies, errors))
+
+
+def run(workers, clients, seconds, threads):
+    workdir = tempfile.mkdtemp(prefix='biblioteca-load-')
+    for name in DATA_FILES:
+        if os.path.exists(os.path.join(ROOT, name)):
+            shutil.copy(os.path.join(ROOT, name), workdir)
+    port = _free_port()
+    env = dict(os.environ, WEB_BIND=f'127.0.0.1:{port}', WEB_WORKERS=str(workers),
+               WEB_THREADS=str(threads), WEB_ACCESS_LOG='',
+               TEMPLATE_CACHE_DIR=os.path.join(workdir, '.jinja_cache'))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--chdir', workdir, '--pythonpath', ROOT, 'wsgi:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not _wait_ready(server, port):
+            raise RuntimeError('gunicorn não respondeu em /health')
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_client, args=(port, seconds, f'carga{i}', results))
+                 for i in range(clients)]
+        for proc in procs:
+            proc.start()
+        collected = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = sorted(lat for lats, _ in collected for lat in lats)
+    errors = sum(err for _, err in collected)
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        'workers': workers,
+        'requests': len(latencies),
+        'errors': errors,
+        'req_per_s': round(len(latencies) / seconds, 1),
+        'p50_ms': round(pct(0.50), 2),
+        'p99_ms': round(pct(0.99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--json', action='store_true', help='imprime os resultados em JSON')
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s), {args.clients} clientes, {args.seconds}s por rodada", file=sys.stderr)
+    results = [run(w, args.clients, args.seconds, args.threads) for w in args.workers]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'workers':>8} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'erros':>6}")
+    for r in results:
+        print(f"{r['workers']:>8} {r['req_per_s']:>9} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['errors']:>6}")
+
+
+if __name__ == '__main__':
+    main()
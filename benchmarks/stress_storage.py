@@ -0,0 +1,128 @@
+"""Teste de estresse: mutações paralelas (processos x threads) no mesmo storage.
+
+Cada thread adiciona títulos próprios em usuários compartilhados, remove
+parte deles e move outros de Em Aberto para a biblioteca. No fim os dados
+são recarregados do disco e comparados com o resultado esperado: nenhuma
+escrita pode ter se perdido. Roda numa pasta temporária.
+
+    python -m benchmarks.stress_storage [--backend json|mmap|sqlite] [--processes 4] [--threads 8] [--ops 200]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from storage import create_storage
+
+USERS = [f"user{i}" for i in range(5)]
+
+
+def _expected(worker, thread, ops):
+    """Títulos que devem sobrar de uma thread, por (usuário, lista)"""
+    rng = random.Random(f"{worker}-{thread}")
+    plan, expected = [], {}
+    for i in range(ops):
+        username = rng.choice(USERS)
+        key = rng.choice(["movies", "series"])
+        title = f"T{worker}-{thread}-{i}"
+        action = rng.choice(["keep", "keep", "remove", "move"])
+        plan.append((username, key, title, action))
+        target = (username, key) if action != "remove" else None
+        if target:
+            expected.setdefault(target, set()).add(title)
+    return plan, expected
+
+
+def _thread(storage, plan, errors):
+    try:
+        for username, key, title, action in plan:
+            storage.init_user(username)
+            if action == "move":
+                storage.add_title(username, key, title, abertos=True)
+                storage.move_to_library(username, key, title)
+            else:
+                storage.add_title(username, key, title)
+                if action == "remove":
+                    storage.remove_title(username, key, title)
+    except Exception as e:
+        errors.append(repr(e))
+
+
+def _worker(backend, json_file, db_file, worker, threads, ops, compact_threshold, results):
+    storage = create_storage(backend, json_file=json_file, db_file=db_file)
+    if backend in ('json', 'mmap'):
+        storage.journal.compact_threshold = compact_threshold
+    errors = []
+    pool = [threading.Thread(target=_thread, args=(storage, _expected(worker, t, ops)[0], errors))
+            for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    storage.close()
+    results.put(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=['json', 'mmap', 'sqlite'], default='json')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=200, help='títulos por thread')
+    parser.add_argument('--compact-threshold', type=int, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='biblioteca-stress-')
+    json_file = os.path.join(workdir, 'media_lists.json')
+    db_file = os.path.join(workdir, 'biblioteca.db')
+    try:
+        results = multiprocessing.Queue()
+        start = time.perf_counter()
+        procs = [multiprocessing.Process(target=_worker, args=(args.backend, json_file, db_file, w,
+                                                               args.threads, args.ops,
+                                                               args.compact_threshold, results))
+                 for w in range(args.processes)]
+        for proc in procs:
+            proc.start()
+        errors = [e for _ in procs for e in results.get()]
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+
+        expected = {}
+        for w in range(args.processes):
+            for t in range(args.threads):
+                for target, titles in _expected(w, t, args.ops)[1].items():
+                    expected.setdefault(target, set()).update(titles)
+
+        storage = create_storage(args.backend, json_file=json_file, db_file=db_file)
+        lost = extra = 0
+        for username in USERS:
+            user = storage.get_user(username) or {"movies": [], "series": [], "abertos": {"movies": [], "series": []}}
+            for key in ("movies", "series"):
+                got = set(user[key])
+                want = expected.get((username, key), set())
+                lost += len(want - got)
+                extra += len(got - want) + len(user["abertos"][key])
+        storage.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    mutations = args.processes * args.threads * args.ops
+    print(f"{args.backend}: {args.processes} processos x {args.threads} threads, "
+          f"~{mutations * 2} mutações em {elapsed:.2f}s ({mutations * 2 / elapsed:.0f}/s)")
+    print(f"títulos esperados: {sum(len(t) for t in expected.values())}, perdidos: {lost}, sobrando: {extra}, "
+          f"erros: {len(errors)}")
+    for error in errors[:5]:
+        print(f"  {error}")
+    if lost or extra or errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
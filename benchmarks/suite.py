@@ -0,0 +1,284 @@
+"""Suíte de benchmarks reproduzível: rotas (pelo test client) e persistência.
+
+Cada dataset é gerado numa pasta temporária, com semente fixa: usuários,
+títulos e logs de acesso sintéticos. Cada um é medido num subprocesso
+próprio, com a pasta do dataset como diretório atual: o main lê arquivos
+relativos a ela, create_app() prepara o estado global (storage, logs,
+métricas) uma vez por processo, e assim o startup_s é o de um worker
+novo. O resultado é um JSON com o commit e a máquina, para comparar
+entre commits:
+
+    python -m benchmarks.suite [--datasets small medium] [--backend json|mmap|sqlite] [--output arquivo.json]
+    python -m benchmarks.suite --compare antes.json depois.json
+
+O dataset "large" (10 mil usuários, 100 mil títulos, 1 milhão de logs)
+ocupa algumas centenas de MB em disco e só roda se pedido.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_user_agents import USER_AGENTS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# users: total de usuários; titles: títulos do usuário medido ("bench");
+# other_titles: títulos de cada um dos outros; logs: linhas em access_logs.jsonl
+DATASETS = {
+    "small": {"users": 1, "titles": 10, "other_titles": 10, "logs": 1_000},
+    "medium": {"users": 100, "titles": 1_000, "other_titles": 100, "logs": 100_000},
+    "large": {"users": 10_000, "titles": 100_000, "other_titles": 10, "logs": 1_000_000},
+}
+DEFAULT_DATASETS = ("small", "medium")
+BENCH_USER = "bench"
+# Diferença de p50 a partir da qual --compare aponta regressão/melhora
+COMPARE_THRESHOLD = 0.10
+
+
+def _titles(prefix, count):
+    return [f"{prefix} {i:06d}" for i in range(count)]
+
+def generate(workdir, config, iterations, seed=42):
+    """Grava media_lists.json e access_logs.jsonl do dataset em `workdir`"""
+    rng = random.Random(seed)
+    data = {}
+    for u in range(config["users"]):
+        username = BENCH_USER if u == 0 else f"user{u:05d}"
+        count = config["titles"] if u == 0 else config["other_titles"]
+        titles = _titles(f"Título {username}", count)
+        split = count * 3 // 4
+        data[username] = {"movies": titles[:split], "series": titles[split:],
+                          # Em Aberto do usuário medido: títulos para a rota de mover
+                          "abertos": {"movies": _titles("Em aberto", iterations) if u == 0 else [],
+                                      "series": []},
+                          "version": 0}
+    with open(os.path.join(workdir, 'media_lists.json'), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    start = datetime(2025, 1, 1)
+    usernames = list(data)
+    pages = ["login_page", "mybiblioteca", "em_aberto", "add_item_success", "delete_item_success"]
+    with open(os.path.join(workdir, 'access_logs.jsonl'), 'w', encoding='utf-8') as f:
+        for i in range(config["logs"]):
+            mobile = rng.random() < 0.4
+            f.write(json.dumps({
+                "timestamp": (start + timedelta(seconds=i * 7)).strftime("%Y-%m-%d %H:%M:%S"),
+                "ip": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+                "page": rng.choice(pages), "username": rng.choice(usernames), "action": "success",
+                "device_info": {"browser": rng.choice(["Chrome", "Firefox", "Safari", "Edge"]),
+                                "os": "Android" if mobile else rng.choice(["Windows", "Linux", "macOS"]),
+                                "is_mobile": mobile, "language": "pt-BR"},
+                "method": "GET", "extra_data": {}}, ensure_ascii=False) + '\n')
+
+
+def _stats(latencies):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 4)
+    return {"iterations": len(latencies), "ops_per_s": round(len(latencies) / total, 1) if total else None,
+            "mean_ms": round(total / len(latencies) * 1000, 4),
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+def measure(fn, iterations, warmup=3):
+    """Chama fn(i) `iterations` vezes (depois do aquecimento) e resume as latências"""
+    for i in range(warmup):
+        fn(-1 - i)
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    return _stats(latencies)
+
+
+def _run_routes(webapp, iterations):
+    client = webapp.app.test_client()
+
+    def headers(i):
+        return {'User-Agent': USER_AGENTS[i % len(USER_AGENTS)]}
+
+    def check(response, *expected):
+        if response.status_code not in expected:
+            raise RuntimeError(f"{response.request.path}: status {response.status_code}")
+        response.close()
+
+    def move(i):
+        check(client.post('/mover_para_biblioteca_ajax', headers=headers(i), json={
+            'username': BENCH_USER, 'title': f"Em aberto {i:06d}", 'category': 'filme'}), 200)
+
+    routes = {
+        "login": lambda i: check(client.post('/login', data={'username': BENCH_USER}, headers=headers(i)), 302),
+        "mybiblioteca": lambda i: check(client.get(f'/mybiblioteca?username={BENCH_USER}', headers=headers(i)), 200),
+        "add": lambda i: check(client.post('/add', headers=headers(i), data={
+            'username': BENCH_USER, 'title': f"Novo {i}", 'category': 'filme'}), 200),
+        "delete": lambda i: check(client.post('/delete', headers=headers(i), json={
+            'username': BENCH_USER, 'title': f"Novo {i}", 'category': 'filme'}), 200, 400),
+        "move": move,
+        "sync_em_aberto": lambda i: check(client.get(f'/sync_em_aberto?username={BENCH_USER}',
+                                                     headers=headers(i)), 200),
+        "admin_logs": lambda i: check(client.get('/admin/logs', headers=headers(i)), 200),
+    }
+    # O aquecimento de "move" usa índices negativos: só os títulos 0..N-1 existem
+    return {name: measure(fn, iterations, warmup=0 if name == "move" else 3) for name, fn in routes.items()}
+
+def _run_micro(webapp, backend, iterations):
+    import access_log
+    from storage import create_storage
+
+    results = {}
+    storage = webapp.storage
+    # Journal vazio: o load mede só a leitura do snapshot, sem compactar ao fechar
+    if hasattr(storage, "compact"):
+        storage.compact(force=True)
+    results["storage_load"] = measure(
+        lambda i: create_storage(backend, json_file='media_lists.json', db_file='biblioteca.db').close(),
+        max(3, iterations // 20), warmup=1)
+    results["storage_mutation"] = measure(
+        lambda i: (storage.add_title(BENCH_USER, "series", f"Micro {i}"),
+                   storage.remove_title(BENCH_USER, "series", f"Micro {i}")), iterations)
+    if hasattr(storage, "compact"):
+        # A antiga save_data reescrevia tudo a cada mutação; hoje é a compactação
+        def compact(i):
+            storage.add_title(BENCH_USER, "series", f"Compact {i}")
+            storage.compact(force=True)
+        results["storage_compact"] = measure(compact, max(3, iterations // 20), warmup=1)
+    results["access_log_load"] = measure(
+        lambda i: access_log.AccessLogger('access_logs.jsonl').load(), max(3, iterations // 20), warmup=1)
+
+    for name, fn in (("get_device_info", lambda i: webapp.get_device_info()),
+                     ("log_access", lambda i: webapp.log_access('10.0.0.1', 'bench', BENCH_USER))):
+        def call(i, fn=fn):
+            with webapp.app.test_request_context('/', headers={'User-Agent': USER_AGENTS[i % len(USER_AGENTS)]}):
+                fn(i)
+        results[name] = measure(call, iterations * 10)
+    return results
+
+def run_dataset(workdir, backend, iterations):
+    """Mede um dataset já gerado (no subprocesso, com cwd = workdir)"""
+    if backend == 'sqlite':
+        from storage import migrate_json_to_sqlite
+        migrate_json_to_sqlite('media_lists.json', 'biblioteca.db')
+    elif backend == 'mmap':
+        # A conversão do media_lists.json acontece uma vez só, fora do tempo de início
+        from storage import create_storage
+        create_storage('mmap', json_file='media_lists.json').close()
+    start = time.perf_counter()
+    import main as webapp
+    webapp.create_app()
+    startup = time.perf_counter() - start
+    result = {"startup_s": round(startup, 3),
+              "routes": _run_routes(webapp, iterations),
+              "micro": _run_micro(webapp, backend, iterations)}
+    webapp.shutdown()
+    return result
+
+
+def _commit():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def run_suite(names, backend, iterations):
+    sha, dirty = _commit()
+    results = {"commit": sha, "dirty": dirty, "timestamp": datetime.now().isoformat(timespec='seconds'),
+               "python": platform.python_version(), "platform": platform.platform(),
+               "cpu_count": os.cpu_count(), "backend": backend, "iterations": iterations, "datasets": {}}
+    for name in names:
+        config = DATASETS[name]
+        workdir = tempfile.mkdtemp(prefix=f'biblioteca-suite-{name}-')
+        try:
+            start = time.perf_counter()
+            generate(workdir, config, iterations)
+            generated = time.perf_counter() - start
+            env = dict(os.environ, STORAGE_BACKEND=backend, PYTHONPATH=ROOT,
+                       TEMPLATE_CACHE_DIR=os.path.join(workdir, '.jinja_cache'),
+                       PROFILE_ROUTES='', PROFILE_SECRET='')
+            child = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--run-dataset', workdir,
+                                    '--backend', backend, '--iterations', str(iterations)],
+                                   cwd=workdir, env=env, capture_output=True, text=True)
+            if child.returncode != 0:
+                raise RuntimeError(f"dataset {name} falhou:\n{child.stderr[-2000:]}")
+            measured = json.loads(child.stdout.strip().splitlines()[-1])
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results["datasets"][name] = {"config": config, "generate_s": round(generated, 3), **measured}
+        print(f"{name}: ok ({generated:.1f}s gerando, {measured['startup_s']}s iniciando)", file=sys.stderr)
+    return results
+
+
+def _rows(results):
+    for dataset, data in results["datasets"].items():
+        for group in ("routes", "micro"):
+            for bench, stats in data[group].items():
+                yield (dataset, group, bench), stats
+
+def print_results(results):
+    print(f"{'dataset':<8} {'benchmark':<18} {'ops/s':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    for (dataset, _, bench), stats in _rows(results):
+        print(f"{dataset:<8} {bench:<18} {stats['ops_per_s']:>10} {stats['p50_ms']:>10} "
+              f"{stats['p95_ms']:>10} {stats['p99_ms']:>10}")
+
+def compare(before, after, threshold=COMPARE_THRESHOLD):
+    """Imprime o p50 de cada benchmark nos dois resultados; retorna quantos pioraram"""
+    old = dict(_rows(before))
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'dataset':<8} {'benchmark':<18} {'antes (ms)':>11} {'depois (ms)':>12} {'razão':>7}")
+    regressions = 0
+    for key, stats in _rows(after):
+        if key not in old:
+            continue
+        ratio = stats['p50_ms'] / old[key]['p50_ms'] if old[key]['p50_ms'] else float('inf')
+        mark = ''
+        if ratio > 1 + threshold:
+            mark, regressions = '  pior', regressions + 1
+        elif ratio < 1 - threshold:
+            mark = '  melhor'
+        print(f"{key[0]:<8} {key[2]:<18} {old[key]['p50_ms']:>11} {stats['p50_ms']:>12} {ratio:>6.2f}x{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--datasets', nargs='+', choices=DATASETS, default=list(DEFAULT_DATASETS))
+    parser.add_argument('--backend', choices=['json', 'mmap', 'sqlite'], default='json')
+    parser.add_argument('--iterations', type=int, default=200, help='requisições por rota')
+    parser.add_argument('--output', help='arquivo JSON (padrão: bench-results/<commit>-<backend>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DEPOIS'), help='compara dois resultados')
+    parser.add_argument('--run-dataset', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_dataset:
+        print(json.dumps(run_dataset(args.run_dataset, args.backend, args.iterations)))
+        return
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            before = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            after = json.load(f)
+        sys.exit(1 if compare(before, after) else 0)
+
+    results = run_suite(args.datasets, args.backend, args.iterations)
+    output = args.output or os.path.join('bench-results', f"{results['commit'] or 'local'}-{args.backend}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print_results(results)
+    print(f"resultados em {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import gzip
+import os
+
+from werkzeug.security import safe_join
+
+try:
+    import brotli  # opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Respostas menores que isso não compensam o custo de comprimir
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '500'))
+# Níveis para respostas dinâmicas: comprimidas a cada requisição, então
+# ficam no meio-termo entre tamanho e CPU (os assets do build usam o máximo)
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5'))
+COMPRESSIBLE_TYPES = {"text/html", "text/css", "text/plain", "application/json", "application/javascript",
+                      "text/javascript"}
+# Codificações suportadas, em ordem de preferência do servidor
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+# Extensão das versões pré-comprimidas geradas pelo build dos assets
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+
+
+def escolher_codificacao(accept_encodings, available=ENCODINGS):
+    """Melhor codificação aceita pelo cliente (Accept-Encoding, com q=), ou None"""
+    return accept_encodings.best_match(available)
+
+def comprimir(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def comprimir_resposta(response, accept_encodings):
+    """Comprime HTML/JSON já gerados; respostas em streaming e arquivos passam direto"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = escolher_codificacao(accept_encodings)
+    if encoding is None:
+        return response
+    response.set_data(comprimir(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    # O corpo comprimido não é byte a byte o original: o ETag passa a ser fraco
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def arquivo_precomprimido(folder, filename, accept_encodings):
+    """(arquivo a enviar, codificação) escolhendo a versão .br/.gz gerada no build, se houver"""
+    available = []
+    for encoding in ENCODINGS:
+        path = safe_join(folder, filename + PRECOMPRESSED[encoding])
+        if path is not None and os.path.isfile(path):
+            available.append(encoding)
+    encoding = escolher_codificacao(accept_encodings, available) if available else None
+    if encoding is None:
+        return filename, None
+    return filename + PRECOMPRESSED[encoding], encoding
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Deltas guardados por usuário para retomar um stream (Last-Event-ID)
+FEED_HISTORY = int(os.environ.get('SSE_HISTORY', '256'))
+# Streams abertos ao mesmo tempo por processo: cada um ocupa uma thread do
+# worker, então o limite fica abaixo de WEB_THREADS para sobrar thread para
+# as outras requisições
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', '12'))
+# Intervalo (s) em que o processo confere mutações feitas por outros workers
+SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', '1.0'))
+
+
+class _UserFeed:
+    """Deltas recentes de um usuário e a Condition que acorda os streams dele"""
+
+    def __init__(self, version, history):
+        self.version = version
+        self.events = deque(maxlen=history)
+        self.cond = threading.Condition()
+        self.streams = 0
+
+
+class ChangeFeed:
+    """Entrega aos streams SSE as mutações de Em Aberto de cada usuário.
+
+    Registrado como listener do storage, guarda só os usuários que têm (ou
+    tiveram) um stream aberto neste processo. Cada stream espera na
+    Condition do seu usuário: uma mutação acorda apenas as abas daquele
+    usuário, e abas ociosas não gastam CPU.
+
+    Mutações de outros workers chegam pelo listener quando o storage
+    sincroniza; uma thread consulta a versão dos usuários com stream aberto
+    a cada `poll_interval` segundos para provocar essa sincronização. Se a
+    versão avançou sem deltas (SQLite, ou histórico esgotado), os streams
+    recebem um reset e o cliente recarrega a lista inteira.
+    """
+
+    def __init__(self, storage, history=FEED_HISTORY, max_streams=SSE_MAX_STREAMS,
+                 poll_interval=SSE_POLL_INTERVAL):
+        self.storage = storage
+        self.history = history
+        self.max_streams = max_streams
+        self.poll_interval = poll_interval
+        self._feeds = {}
+        self._streams = 0
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._watcher = None
+
+    def on_mutation(self, op, username, key, title, abertos=False, version=None):
+        """Listener do storage: registra o delta e acorda os streams do usuário"""
+        feed = self._feeds.get(username)
+        if feed is None:
+            return
+        delta = {"op": op, "category": "filme" if key == "movies" else "serie",
+                 "lista": "abertos" if abertos else "biblioteca", "title": title}
+        with feed.cond:
+            delta["version"] = version if version is not None else feed.version + 1
+            feed.events.append(delta)
+            feed.version = max(feed.version, delta["version"])
+            feed.cond.notify_all()
+
+    def open(self, username):
+        """Reserva um stream para o usuário; None se o processo já está no limite"""
+        with self._lock:
+            if self._streams >= self.max_streams:
+                return None
+            feed = self._feeds.get(username)
+            if feed is None:
+                feed = self._feeds[username] = _UserFeed(self.storage.get_version(username) or 0, self.history)
+            feed.streams += 1
+            self._streams += 1
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, daemon=True)
+                self._watcher.start()
+        self._active.set()
+        return feed
+
+    def close(self, feed):
+        with self._lock:
+            feed.streams -= 1
+            self._streams -= 1
+
+    def wait(self, feed, since, timeout):
+        """Espera até `timeout` por deltas com versão maior que `since`.
+
+        Retorna (deltas, reset); reset=True quando o histórico não cobre o
+        intervalo pedido e o cliente precisa recarregar a lista.
+        """
+        with feed.cond:
+            if feed.version <= since:
+                feed.cond.wait(timeout)
+            if feed.version <= since:
+                return [], False
+            deltas = [delta for delta in feed.events if delta["version"] > since]
+            if not deltas or deltas[0]["version"] != since + 1:
+                return [], True
+            return deltas, False
+
+    def _watch(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.poll_interval)
+            with self._lock:
+                users = [(username, feed) for username, feed in self._feeds.items() if feed.streams]
+                if not users:
+                    # Sem streams abertos a thread dorme até o próximo open()
+                    self._active.clear()
+                    continue
+            for username, feed in users:
+                try:
+                    # No storage JSON isto aplica o journal e dispara on_mutation
+                    version = self.storage.get_version(username)
+                except Exception as e:
+                    print(f"Erro ao consultar versão de {username}: {e}")
+                    continue
+                with feed.cond:
+                    if version is not None and version > feed.version:
+                        # Mutações sem delta: quem estiver atrás recebe reset
+                        feed.events.clear()
+                        feed.version = version
+                        feed.cond.notify_all()
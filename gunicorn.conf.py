@@ -0,0 +1,33 @@
+import multiprocessing
+import os
+import sys
+
+# Configuração do gunicorn (gunicorn -c gunicorn.conf.py wsgi:app)
+bind = os.environ.get('WEB_BIND', '0.0.0.0:3000')
+
+# Os dois storages são seguros entre processos (o JSON sincroniza pelo
+# journal com trava de arquivo), então os workers escalam com os núcleos.
+# Os agregados de /admin/logs continuam sendo de cada worker.
+_default_workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.environ.get('WEB_WORKERS', _default_workers))
+worker_class = 'gthread'
+# Cada stream SSE de /em_aberto/stream ocupa uma thread enquanto a aba está
+# aberta (até SSE_MAX_STREAMS por worker); as demais ficam para as requisições
+threads = int(os.environ.get('WEB_THREADS', '16'))
+
+timeout = int(os.environ.get('WEB_TIMEOUT', '30'))
+graceful_timeout = 10
+keepalive = 5
+
+# Cada worker importa a aplicação sozinho (threads de log e arquivos abertos
+# não atravessam o fork)
+preload_app = False
+# Log de requisições no stdout; WEB_ACCESS_LOG='' desliga
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None
+
+
+def worker_exit(server, worker):
+    """Grava logs e dados pendentes quando o worker sai (SIGTERM, reload, max_requests)"""
+    main = sys.modules.get('main')
+    if main is not None:
+        main.shutdown()
@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: só roda o servidor de desenvolvimento, com um processo
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Trava entre processos usando o arquivo `path` + '.lock'"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
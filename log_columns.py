@@ -0,0 +1,271 @@
+import json
+import time
+from array import array
+from collections import Counter
+
+try:
+    import numpy  # opcional: contagens com bincount
+except ImportError:
+    numpy = None
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Colunas codificadas por dicionário: nome -> caminho do valor na entrada
+ENCODED_COLUMNS = {
+    "ip": ("ip",),
+    "page": ("page",),
+    "username": ("username",),
+    "action": ("action",),
+    "method": ("method",),
+    "browser": ("device_info", "browser"),
+    "os": ("device_info", "os"),
+    "language": ("device_info", "language"),
+}
+_ENTRY_COLUMNS = [(name, path[0]) for name, path in ENCODED_COLUMNS.items() if len(path) == 1]
+_DEVICE_COLUMNS = [(name, path[1]) for name, path in ENCODED_COLUMNS.items() if len(path) == 2]
+# Campos com coluna própria; o resto da entrada vai como JSON na coluna "extra"
+_TOP_LEVEL = {"timestamp", "device_info", *(field for _, field in _ENTRY_COLUMNS)}
+_DEVICE_FIELDS = {"is_mobile", *(field for _, field in _DEVICE_COLUMNS)}
+
+
+class _Dictionary:
+    """Valores distintos de uma coluna; cada linha guarda só o código (índice na lista)"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _bits(size):
+    return bytearray((size + 7) // 8)
+
+def _get_bit(bits, i):
+    return bits[i >> 3] >> (i & 7) & 1
+
+def _set_bit(bits, i, value):
+    if value:
+        bits[i >> 3] |= 1 << (i & 7)
+    else:
+        bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+def _count_codes(codes):
+    """Histograma dos códigos: {código: ocorrências}"""
+    if numpy is not None and len(codes):
+        values, counts = numpy.unique(numpy.frombuffer(codes, dtype=numpy.uint32), return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+    return Counter(codes)
+
+
+class LogColumns:
+    """Buffer circular de logs de acesso guardado em colunas.
+
+    Strings repetidas (IP, página, ação, usuário, navegador, SO...) viram
+    códigos de 4 bytes num `array`, com um dicionário por coluna; o
+    timestamp é um epoch inteiro e `is_mobile` um bit. Campos fora do
+    esquema (extra_data) ficam como JSON compacto, só quando não vazios.
+    Fica com a interface de deque que o AccessLogger usa (append, extend,
+    clear, len, iteração, `maxlen`) e as entradas voltam a ser dicts só
+    quando lidas. Contagens e únicos são calculados direto nas colunas.
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self._start = 0
+        self._size = 0
+        self._allocate()
+        self._minute_cache = (None, 0)
+        self._format_cache = (None, None)
+
+    def _allocate(self):
+        self.timestamps = array('I', bytes(4 * self.maxlen))
+        self.columns = {name: array('I', bytes(4 * self.maxlen)) for name in ENCODED_COLUMNS}
+        self.dictionaries = {name: _Dictionary() for name in ENCODED_COLUMNS}
+        self.has_device = _bits(self.maxlen)
+        self.mobile = _bits(self.maxlen)
+        self.extra = [None] * self.maxlen
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return (self._row(self._physical(k)) for k in range(self._size))
+
+    def _physical(self, k):
+        return (self._start + k) % self.maxlen
+
+    def _epoch(self, timestamp):
+        # strptime é lento; logs seguidos quase sempre caem no mesmo minuto
+        try:
+            minute, base = self._minute_cache
+            if timestamp[:16] != minute:
+                minute = timestamp[:16]
+                base = int(time.mktime(time.strptime(minute, "%Y-%m-%d %H:%M")))
+                self._minute_cache = (minute, base)
+            return base + int(timestamp[17:19])
+        except (TypeError, ValueError, OverflowError):
+            return 0
+
+    def _format(self, epoch):
+        cached, timestamp = self._format_cache
+        if epoch != cached:
+            timestamp = time.strftime(TIMESTAMP_FORMAT, time.localtime(epoch)) if epoch else None
+            self._format_cache = (epoch, timestamp)
+        return timestamp
+
+    def _write(self, i, entry):
+        device = entry.get("device_info")
+        if not isinstance(device, dict):
+            device = None
+        self.timestamps[i] = self._epoch(entry.get("timestamp"))
+        columns, dictionaries = self.columns, self.dictionaries
+        # Maior código usado: indica quando algum dicionário cresceu demais
+        top = 0
+        for name, field in _ENTRY_COLUMNS:
+            code = columns[name][i] = dictionaries[name].encode(entry.get(field))
+            if code > top:
+                top = code
+        for name, field in _DEVICE_COLUMNS:
+            code = columns[name][i] = dictionaries[name].encode(device.get(field) if device is not None else None)
+            if code > top:
+                top = code
+        _set_bit(self.has_device, i, device is not None)
+        _set_bit(self.mobile, i, bool(device and device.get("is_mobile")))
+        rest = None
+        other = entry.keys() - _TOP_LEVEL
+        if other and (other != {"extra_data"} or entry["extra_data"] != {}):
+            rest = {key: entry[key] for key in other if key != "extra_data" or entry[key] != {}}
+        if device is not None and device.keys() - _DEVICE_FIELDS:
+            rest = rest or {}
+            rest["device_info"] = {key: device[key] for key in device.keys() - _DEVICE_FIELDS}
+        self.extra[i] = json.dumps(rest, ensure_ascii=False, separators=(',', ':')) if rest else None
+        return top
+
+    def _row(self, i):
+        values = {name: self.dictionaries[name].values[self.columns[name][i]] for name in ENCODED_COLUMNS}
+        entry = {"timestamp": self._format(self.timestamps[i]), "ip": values["ip"], "page": values["page"],
+                 "username": values["username"], "action": values["action"]}
+        if _get_bit(self.has_device, i):
+            entry["device_info"] = {"is_mobile": bool(_get_bit(self.mobile, i)), "browser": values["browser"],
+                                    "os": values["os"], "language": values["language"]}
+        entry["method"] = values["method"]
+        entry["extra_data"] = {}
+        if self.extra[i] is not None:
+            rest = json.loads(self.extra[i])
+            if "device_info" in rest:
+                entry.setdefault("device_info", {}).update(rest.pop("device_info"))
+            entry.update(rest)
+        return entry
+
+    def append(self, entry):
+        if self._size < self.maxlen:
+            i = self._physical(self._size)
+            self._size += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % self.maxlen
+        if self._write(i, entry) > 2 * self.maxlen + 1024:
+            self._compact_dictionaries()
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def clear(self):
+        self._start = self._size = 0
+        self._allocate()
+
+    def tail(self, n):
+        """As `n` últimas entradas, da mais antiga para a mais recente"""
+        n = min(n, self._size)
+        return [self._row(self._physical(k)) for k in range(self._size - n, self._size)]
+
+    def remove(self, name, value):
+        """Tira as entradas com `value` na coluna `name`; retorna as removidas"""
+        code = self.dictionaries[name].codes.get(value)
+        if code is None:
+            return []
+        column = self.columns[name]
+        order = [self._physical(k) for k in range(self._size)]
+        removed = [self._row(i) for i in order if column[i] == code]
+        if removed:
+            self._keep([i for i in order if column[i] != code])
+        return removed
+
+    def _keep(self, indices):
+        """Reorganiza as colunas só com as linhas `indices` (físicas), a partir da posição 0"""
+        timestamps, columns = self.timestamps, self.columns
+        has_device, mobile, extra = self.has_device, self.mobile, self.extra
+        padding = self.maxlen - len(indices)
+        self.timestamps = array('I', (timestamps[i] for i in indices))
+        self.timestamps.extend(array('I', bytes(4 * padding)))
+        for name, column in columns.items():
+            kept = array('I', (column[i] for i in indices))
+            kept.extend(array('I', bytes(4 * padding)))
+            self.columns[name] = kept
+        self.has_device, self.mobile = _bits(self.maxlen), _bits(self.maxlen)
+        for k, i in enumerate(indices):
+            _set_bit(self.has_device, k, _get_bit(has_device, i))
+            _set_bit(self.mobile, k, _get_bit(mobile, i))
+        self.extra = [extra[i] for i in indices] + [None] * padding
+        self._start, self._size = 0, len(indices)
+
+    def _compact_dictionaries(self):
+        """Os dicionários guardam valores que já saíram do buffer; quando passam
+        do dobro da capacidade, são refeitos só com os valores ainda usados"""
+        for name, dictionary in self.dictionaries.items():
+            if len(dictionary.values) <= self.maxlen:
+                continue
+            column = self.columns[name]
+            fresh = _Dictionary()
+            for k in range(self._size):
+                i = self._physical(k)
+                column[i] = fresh.encode(dictionary.values[column[i]])
+            self.dictionaries[name] = fresh
+
+    def _live(self, column):
+        # Com o buffer incompleto as linhas ocupam [0, size); a ordem não importa para contagens
+        return column if self._size == self.maxlen else column[:self._size]
+
+    def counts(self, name):
+        """Ocorrências de cada valor da coluna ("timestamp" conta por segundo)"""
+        if name == "timestamp":
+            return Counter({self._format(epoch): count
+                            for epoch, count in _count_codes(self._live(self.timestamps)).items()})
+        values = self.dictionaries[name].values
+        return Counter({values[code]: count for code, count in _count_codes(self._live(self.columns[name])).items()})
+
+    def minute_counts(self):
+        """Ocorrências por minuto ("AAAA-MM-DD HH:MM"; '' para entradas sem timestamp)"""
+        epochs = self._live(self.timestamps)
+        if numpy is not None and len(epochs):
+            minutes, counts = numpy.unique(numpy.frombuffer(epochs, dtype=numpy.uint32) // 60, return_counts=True)
+            per_minute = zip(minutes.tolist(), counts.tolist())
+        else:
+            per_minute = Counter(epoch // 60 for epoch in epochs).items()
+        return Counter({time.strftime("%Y-%m-%d %H:%M", time.localtime(minute * 60)) if minute else '': count
+                        for minute, count in per_minute})
+
+    def device_counts(self, name):
+        """Como counts(), só nas entradas com device_info"""
+        if _count_bits(self.has_device) == self._size:
+            return self.counts(name)
+        column, values = self.columns[name], self.dictionaries[name].values
+        codes = array('I', (column[i] for i in range(self._size) if _get_bit(self.has_device, i)))
+        return Counter({values[code]: count for code, count in _count_codes(codes).items()})
+
+    def unique(self, name):
+        """Quantidade de valores distintos (não nulos) da coluna"""
+        return sum(1 for value in self.counts(name) if value)
+
+    def mobile_count(self):
+        return _count_bits(self.mobile)
+
+
+def _count_bits(bits):
+    return bin(int.from_bytes(bits, 'little')).count('1')
@@ -1,55 +1,189 @@
 
 import json
-from flask import Flask, render_template, request, render_template_string, redirect, url_for, jsonify
+import mimetypes
+from flask import Flask, Response, before_render_template, g, make_response, render_template, request, redirect, send_from_directory, template_rendered, url_for, jsonify, stream_with_context
+import atexit
+import functools
+import hashlib
 import os
 import platform
+import re
+import signal
+import sys
+import threading
+import time
 from datetime import datetime
-from keep_alive import keep_alive
+from jinja2 import FileSystemBytecodeCache
+from storage import create_storage, validar_categoria, validar_titulo
+from access_log import AccessLogger
+from analytics import AccessStats
+from assets import DIST_DIR as ASSETS_DIST_DIR, IMMUTABLE_MAX_AGE, load_manifest
+from compression import arquivo_precomprimido, comprimir_resposta
+from events import ChangeFeed
+from metrics import histogram, registry as metrics_registry
+import profiling
+from search import SCOPES as SEARCH_SCOPES, TitleIndex, normalizar
+from user_agents import parse_user_agent
+from transfer import FORMATS as TRANSFER_FORMATS, export_chunks, guess_format, import_rows, parse_rows, text_lines
 
 app = Flask(__name__)
 
-keep_alive()
+# Importar este módulo não tem efeitos colaterais (nem arquivos, nem threads,
+# nem leitura dos dados): tudo isso acontece em create_app()
 
-ngrok_link = ""  # Variável para armazenar o link do ngrok
+# Templates: bytecode compilado fica em disco e é reaproveitado entre processos
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', '.jinja_cache')
 
-# Arquivos JSON
-MEDIA_LISTS_FILE = 'media_lists.json'
-ACCESS_LOGS_FILE = 'access_logs.json'
+# Arquivos estáticos: o navegador reaproveita por STATIC_MAX_AGE segundos
+# antes de revalidar (com ETag/Last-Modified)
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', '3600'))
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
 
-def load_data():
-    """Carrega dados do arquivo JSON"""
-    try:
-        with open(MEDIA_LISTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+# Assets minificados pelo build (python assets.py): nome original -> arquivo
+# com hash em static/dist/. Sem build, os templates usam os originais.
+asset_manifest = {}
 
-def save_data():
-    """Salva dados no arquivo JSON"""
-    try:
-        with open(MEDIA_LISTS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(user_data, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"Erro ao salvar dados: {e}")
+@app.template_global()
+def asset_url(name):
+    """URL do asset: a versão com hash do build, se houver, ou o arquivo original"""
+    if name in asset_manifest:
+        return url_for('static_dist', filename=asset_manifest[name])
+    return url_for('static', filename=name)
 
-def load_access_logs():
-    """Carrega logs de acesso do arquivo JSON"""
-    try:
-        with open(ACCESS_LOGS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+ngrok_link = ""  # Variável para armazenar o link do ngrok
 
-def save_access_logs(logs):
-    """Salva logs de acesso no arquivo JSON"""
-    try:
-        with open(ACCESS_LOGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"Erro ao salvar logs: {e}")
+# Arquivos JSON
+MEDIA_LISTS_FILE = 'media_lists.json'
+ACCESS_LOGS_FILE = 'access_logs.jsonl'
+LEGACY_ACCESS_LOGS_FILE = 'access_logs.json'
+# /admin/logs/query: entradas por página (padrão e máximo)
+LOGS_QUERY_LIMIT = 100
+MAX_LOGS_QUERY_LIMIT = 1000
+
+# Nomes de usuário aceitos no login
+USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_-]+$')
+
+# Paginação das seções da biblioteca (carregadas sob demanda)
+LIBRARY_PAGE_SIZE = int(os.environ.get('LIBRARY_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = 500
+
+# /batch: operações por requisição JSON e por lote na importação em streaming
+MAX_BATCH_OPERATIONS = 1000
+BATCH_STREAM_CHUNK = 500
+# Operações aceitas por /batch e o método correspondente do storage
+BATCH_OPERATIONS = {"add": "add", "delete": "remove", "move": "move"}
+
+# /em_aberto/stream (SSE): heartbeat de conexões ociosas, duração máxima de
+# cada conexão (o navegador reconecta sozinho e retoma pela versão) e
+# espera sugerida ao navegador antes de reconectar
+SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', '15'))
+SSE_MAX_DURATION = float(os.environ.get('SSE_MAX_DURATION', '300'))
+SSE_RETRY_MS = 3000
+
+# Logs de acesso: buffer em memória gravado em lote por uma thread
+access_logger = AccessLogger(ACCESS_LOGS_FILE, legacy_file=LEGACY_ACCESS_LOGS_FILE)
+# Agregados do painel /admin/logs, atualizados a cada log_access
+access_stats = AccessStats()
+
+# Métricas expostas em /metrics (por worker); gravações do storage e dos
+# logs são medidas nos próprios módulos
+REQUEST_SECONDS = histogram('biblioteca_request_duration_seconds', 'Tempo de cada requisição por rota',
+                            ('route', 'method', 'status'))
+LOG_ACCESS_SECONDS = histogram('biblioteca_log_access_seconds', 'Tempo de log_access dentro da requisição')
+RENDER_SECONDS = histogram('biblioteca_render_seconds', 'Tempo de renderização de cada template', ('template',))
 
-# Carrega dados na inicialização
-user_data = load_data()
+def load_access_logs():
+    """Retorna os logs de acesso em memória (sem ler o disco)"""
+    return access_logger.recent()
+
+# Storage (engine escolhida por STORAGE_BACKEND) e deltas de Em Aberto para
+# os streams SSE: criados por carregar_dados(), a partir de create_app()
+storage = None
+change_feed = None
+
+# Índice de busca: montado na primeira busca e atualizado a cada mutação
+search_index = TitleIndex()
+
+def carregar_dados():
+    """Abre o storage e registra os listeners de mutação"""
+    global storage, change_feed
+    storage = create_storage(json_file=MEDIA_LISTS_FILE)
+    storage.subscribe(search_index.on_mutation)
+    change_feed = ChangeFeed(storage)
+    storage.subscribe(change_feed.on_mutation)
+
+def warm_up_templates():
+    """Compila todos os templates antes da primeira requisição"""
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+_app_ready = False
+_app_lock = threading.Lock()
+
+def shutdown():
+    """Grava logs e mutações pendentes e compacta os dados antes de o processo sair"""
+    access_logger.close()
+    if storage is not None:
+        storage.close()
+
+def create_app():
+    """Prepara a aplicação para servir (logs, agregados, templates) e retorna o app.
+
+    Chamado uma vez por processo: pelo wsgi.py em cada worker do gunicorn ou
+    pelo servidor de desenvolvimento no __main__. Se o app for servido sem
+    passar por aqui (ex: flask --app main run), roda na primeira requisição.
+    """
+    global _app_ready
+    with _app_lock:
+        if not _app_ready:
+            os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+            carregar_dados()
+            access_logger.load().start()
+            asset_manifest.update(load_manifest(app.static_folder))
+            access_stats.record_columns(access_logger.buffer)
+            warm_up_templates()
+            # Modo de perfil (PROFILE_ROUTES/PROFILE_SECRET): desligado, nada é instalado
+            if profiling.enabled():
+                app.wsgi_app = profiling.ProfilerMiddleware(app.wsgi_app)
+            atexit.register(shutdown)
+            _app_ready = True
+    return app
+
+@app.before_request
+def preparar_app():
+    if not _app_ready:
+        create_app()
+
+@functools.lru_cache(maxsize=None)
+def versao_templates():
+    """Identifica a versão atual dos templates, para o ETag mudar quando algum muda"""
+    digest = hashlib.blake2b(digest_size=4)
+    for name in sorted(app.jinja_env.list_templates(extensions=['html'])):
+        path = os.path.join(app.root_path, app.template_folder, name)
+        digest.update(f"{name}:{os.path.getmtime(path)}:{os.path.getsize(path)}".encode())
+    # As páginas apontam para os assets do build: um build novo também muda o ETag
+    digest.update(json.dumps(asset_manifest, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def etag_usuario(username, *extra):
+    """ETag forte das listas do usuário: muda a cada mutação (None se não existe)"""
+    version = storage.get_version(username)
+    if version is None:
+        return None
+    return '-'.join(str(part) for part in (version, *extra, versao_templates()))
+
+def resposta_condicional(etag, render):
+    """304 se o cliente já tem a versão `etag`; senão gera a resposta com render()"""
+    # Comparação fraca (RFC 9110): a versão comprimida tem ETag W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    # Sempre revalida; com o ETag a revalidação custa só a consulta da versão
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 def get_client_ip():
     """Obtém o IP real do cliente"""
@@ -63,45 +197,13 @@ def get_client_ip():
 
 def get_device_info():
     """Coleta informações detalhadas do dispositivo/navegador"""
-    user_agent = request.headers.get('User-Agent', '')
-    
-    # Detecta tipo de dispositivo
-    is_mobile = any(keyword in user_agent.lower() for keyword in 
-                   ['mobile', 'android', 'iphone', 'ipad', 'windows phone'])
-    
-    # Detecta navegador
-    browser = 'Unknown'
-    if 'Chrome' in user_agent:
-        browser = 'Chrome'
-    elif 'Firefox' in user_agent:
-        browser = 'Firefox'
-    elif 'Safari' in user_agent and 'Chrome' not in user_agent:
-        browser = 'Safari'
-    elif 'Edge' in user_agent:
-        browser = 'Edge'
-    
-    # Detecta sistema operacional
-    os_info = 'Unknown'
-    if 'Windows' in user_agent:
-        os_info = 'Windows'
-    elif 'Mac' in user_agent:
-        os_info = 'macOS'
-    elif 'Linux' in user_agent:
-        os_info = 'Linux'
-    elif 'Android' in user_agent:
-        os_info = 'Android'
-    elif 'iOS' in user_agent or 'iPhone' in user_agent or 'iPad' in user_agent:
-        os_info = 'iOS'
-    
-    return {
-        'is_mobile': is_mobile,
-        'browser': browser,
-        'os': os_info,
-        'language': request.headers.get('Accept-Language', '').split(',')[0] if request.headers.get('Accept-Language') else 'Unknown'
-    }
+    info = parse_user_agent(request.headers.get('User-Agent', ''),
+                            request.headers.get('Accept-Language', ''))
+    return info._asdict()
 
 def log_access(ip, page, username=None, action=None, extra_data=None):
     """Registra acesso com informações detalhadas"""
+    start = time.perf_counter()
     device_info = get_device_info()
     
     log_entry = {
@@ -115,43 +217,54 @@ def log_access(ip, page, username=None, action=None, extra_data=None):
         "extra_data": extra_data or {}
     }
     
-    logs = load_access_logs()
-    logs.append(log_entry)
-    
-    # Manter apenas os últimos 1000 logs
-    if len(logs) > 1000:
-        logs = logs[-1000:]
-    
-    save_access_logs(logs)
+    access_logger.log(log_entry)
+    access_stats.record(log_entry)
+    LOG_ACCESS_SECONDS.observe(time.perf_counter() - start)
 
 def limpar_input(texto):
-    """Limpa e normaliza texto para comparações"""
-    if not texto or not isinstance(texto, str):
-        return ""
-    return texto.strip().lower()
-
-def validar_titulo(titulo):
-    """Valida se o título é válido"""
-    if not titulo or not isinstance(titulo, str):
-        return False
-    titulo_limpo = titulo.strip()
-    if len(titulo_limpo) < 1 or len(titulo_limpo) > 200:
-        return False
-    return True
-
-def validar_categoria(categoria):
-    """Valida se a categoria é válida"""
-    return categoria in ["filme", "serie"]
+    """Limpa e normaliza texto para comparações (sem acentos, casefold)"""
+    return normalizar(texto)
+
+def preparar_operacao(item):
+    """Valida uma operação do /batch; retorna ((op, key, title, abertos), None) ou (None, erro)"""
+    if not isinstance(item, dict):
+        return None, "Operação inválida"
+    op = BATCH_OPERATIONS.get(item.get('op'))
+    if op is None:
+        return None, "Operação desconhecida"
+    title = item.get('title')
+    if not validar_titulo(title):
+        return None, "Título inválido"
+    category = item.get('category')
+    if not validar_categoria(category):
+        return None, "Categoria inválida"
+    lista = item.get('lista', 'biblioteca')
+    if lista not in ('biblioteca', 'abertos'):
+        return None, "Lista inválida"
+    key = "movies" if category == "filme" else "series"
+    return (op, key, title.strip(), lista == 'abertos'), None
+
+def aplicar_lote(username, items, start=0):
+    """Valida e aplica um lote de operações do /batch; retorna o resultado de cada uma"""
+    results, valid, positions = [], [], []
+    for index, item in enumerate(items, start):
+        operation, error = preparar_operacao(item)
+        if error:
+            results.append({"index": index, "success": False, "message": error})
+        else:
+            results.append({"index": index, "success": True})
+            valid.append(operation)
+            positions.append(len(results) - 1)
+
+    for position, done, (op, _, _, _) in zip(positions, storage.apply_batch(username, valid), valid):
+        if not done:
+            results[position] = {"index": results[position]["index"], "success": False,
+                                 "message": "Item já existe" if op == "add" else "Item não encontrado"}
+    return results
 
 def inicializar_usuario(username):
     """Inicializa usuário se não existir"""
-    if username not in user_data:
-        user_data[username] = {
-            "movies": [],
-            "series": [],
-            "abertos": {"movies": [], "series": []}
-        }
-        save_data()
+    storage.init_user(username)
 
 @app.route('/')
 def index():
@@ -159,6 +272,59 @@ def index():
     log_access(client_ip, "index")
     return redirect('/login')
 
+@app.route('/health')
+def health():
+    """Verificação de saúde para o balanceador/Replit (substitui o keep_alive)"""
+    return "Estou Online!"
+
+@app.route('/metrics')
+def metrics():
+    """Histogramas de tempo e de bytes gravados, no formato de texto do Prometheus"""
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.before_request
+def iniciar_cronometro():
+    g.request_start = time.perf_counter()
+
+@before_render_template.connect_via(app)
+def inicio_render(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def fim_render(sender, template, context, **extra):
+    start = g.pop('render_start', None)
+    if start is not None:
+        RENDER_SECONDS.observe(time.perf_counter() - start, template=template.name)
+
+@app.after_request
+def medir_requisicao(response):
+    """Tempo da requisição por rota; registrado antes da compressão, roda depois dela e a inclui"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'desconhecida'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method,
+                                status=f"{response.status_code // 100}xx")
+    return response
+
+@app.route('/static/dist/<path:filename>')
+def static_dist(filename):
+    """Assets do build: imutáveis (hash no nome) e pré-comprimidos quando o cliente aceita"""
+    folder = os.path.join(app.static_folder, ASSETS_DIST_DIR)
+    sent, encoding = arquivo_precomprimido(folder, filename, request.accept_encodings)
+    response = send_from_directory(folder, sent, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.after_request
+def comprimir(response):
+    """gzip/brotli nas páginas e respostas JSON, conforme o Accept-Encoding"""
+    return comprimir_resposta(response, request.accept_encodings)
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     client_ip = get_client_ip()
@@ -180,8 +346,7 @@ def login():
             return render_template('login.html', error="Nome deve ter entre 2 e 50 caracteres!")
         
         # Caracteres permitidos
-        import re
-        if not re.match(r'^[a-zA-Z0-9_-]+$', username):
+        if not USERNAME_PATTERN.match(username):
             log_access(client_ip, "login_fail", username, "validation_error", 
                       {"error": "invalid_characters"})
             return render_template('login.html', error="Use apenas letras, números, _ ou -")
@@ -189,12 +354,10 @@ def login():
         # Inicializa usuário se não existir
         inicializar_usuario(username)
         
-        movies = user_data[username]["movies"]
-        series = user_data[username]["series"]
-        
         log_access(client_ip, "login_success", username, "success", 
-                   {"new_user": username not in user_data,
-                    "total_movies": len(movies), "total_series": len(series)})
+                   {"new_user": not storage.has_user(username),
+                    "total_movies": storage.count_titles(username, "movies"),
+                    "total_series": storage.count_titles(username, "series")})
         return redirect(url_for('my_biblioteca', username=username))
     
     log_access(client_ip, "login_page", None, "page_view")
@@ -206,293 +369,82 @@ def my_biblioteca():
     client_ip = get_client_ip()
     log_access(client_ip, "mybiblioteca", username)
     
-    if username not in user_data:
+    # Os títulos não vão no HTML: cada seção busca suas páginas em /api/biblioteca
+    all_users = storage.list_users()
+    etag = etag_usuario(username, len(all_users))
+    if etag is None:
         return "Usuário não encontrado!", 404
 
-    movies = user_data[username]["movies"]
-    series = user_data[username]["series"]
-    all_users = list(user_data.keys())
-
-    return render_template_string('''
-<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
-<link rel="icon" type="image/x-icon" href="/static/favicon.ico">
-<link rel="stylesheet" href="/static/styles.css">
-<title>🎬 Minha Biblioteca - {{ username }}</title>
-<body class="biblioteca-page">
-    <div class="biblioteca-container">
-        <div class="header">
-            <h1>🎬 Biblioteca de {{ username }}</h1>
-            <a href="/login" class="logout-button">Sair</a>
-        </div>
-
-        <form id="addForm" class="add-form">
-            <input type="hidden" name="username" value="{{ username }}">
-            <input type="text" name="title" placeholder="Título do filme ou série" required>
-            <select name="category" required>
-                <option value="filme">Filme</option>
-                <option value="serie">Série</option>
-            </select>
-            <button type="submit" class="add-button">Adicionar</button>
-        </form>
-
-        <div class="section">
-            <h2 class="toggle" data-target="movies">🎞️ Seus Filmes</h2>
-            <div id="movies" class="content-grid" style="display: none;">
-                {% for movie in movies %}
-                    <div class="card">
-                        <span>{{ movie }}</span>
-                        <button class="delete delete-button" data-title="{{ movie }}" data-category="filme">Deletar</button>
-                    </div>
-                {% endfor %}
-            </div>
-        </div>
-
-        <div class="section">
-            <h2 class="toggle" data-target="series">📺 Suas Séries</h2>
-            <div id="series" class="content-grid" style="display: none;">
-                {% for serie in series %}
-                    <div class="card">
-                        <span>{{ serie }}</span>
-                        <button class="delete delete-button" data-title="{{ serie }}" data-category="serie">Deletar</button>
-                    </div>
-                {% endfor %}
-            </div>
-        </div>
-                                  
-        <div class="section">
-        <h2 class="toggle" onclick="goToAberto('{{ username }}')">🎯 Em Aberto</h2>
-        </div>
-                                  
-        <script>
-        // redireciona para a página "Em Aberto"
-        function goToAberto(username) {
-            const form = document.createElement('form');
-            form.method = 'GET';
-            form.action = '/em_aberto';
-
-            const input = document.createElement('input');
-            input.type = 'hidden';
-            input.name = 'username';
-            input.value = username;
-
-            form.appendChild(input);
-            document.body.appendChild(form);
-            form.submit();
-        }
-        </script>
-                  
-        <div class="view-other">
-            <h3 class="view-title">🔍 Ver lista de outro usuário</h3>
-            <form method="post" action="/view_other" class="view-form">
-                <input type="hidden" name="username" value="{{ username }}">
-                <select name="other_username" class="view-select">
-                    {% for user in users if user != username %}
-                        <option value="{{ user }}">{{ user }}</option>
-                    {% endfor %}
-                </select>
-                <button type="submit" name="action" value="view" class="view-button">Ver Lista</button>
-            </form>
-        </div>
-    </div>
-       <h3 class="view-title">🔍 Ver lista de Em Abertos</h3>
-         <form method="post" action="/view_aberto" class="view-form">
-            <input type="hidden" name="username" value="{{ username }}">
-            <select name="other_username" class="view-select">
-            {% for user in users if user != username %}
-                <option value="{{ user }}">{{ user }}</option>
-            {% endfor %}
-        </select>
-        <button type="submit" name="action" value="view_aberto" class="view-button">Ver Em Aberto</button>
-    </form>
-
-    <div id="toast" class="toast"></div>
-
-<script>
-    document.addEventListener('DOMContentLoaded', function () {
-        function showToast(message, isError = false) {
-            const toast = document.getElementById("toast");
-            toast.textContent = message;
-            toast.className = "toast" + (isError ? " error" : "");
-            toast.classList.add("show");
-            setTimeout(() => {
-                toast.classList.remove("show");
-            }, 3000);
-        }
-
-        function toggleSection(sectionId) {
-            const section = document.getElementById(sectionId);
-            if (section.style.display === "none" || section.style.display === "") {
-                section.style.display = "grid";
-            } else {
-                section.style.display = "none";
-            }
-        }
-
-        document.querySelectorAll('.toggle').forEach(function (toggle) {
-            toggle.addEventListener('click', function () {
-                toggleSection(this.getAttribute('data-target'));
-            });
-        });
-
-        function attachDeleteEvent(button) {
-            button.addEventListener('click', function () {
-                const title = this.getAttribute('data-title');
-                const category = this.getAttribute('data-category');
-
-                fetch('/delete', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        username: '{{ username }}',
-                        title: title,
-                        category: category
-                    })
-                })
-                .then(res => res.json())
-                .then(data => {
-                    if (data.success) {
-                        this.closest('.card').remove();
-                        showToast(`${title} foi deletado da sua lista de ${category === 'filme' ? 'filmes' : 'séries'}`);
-                    } else {
-                        showToast('Erro ao deletar item.', true);
-                    }
-                });
-            });
-        }
-
-        document.querySelectorAll('.delete-button').forEach(btn => attachDeleteEvent(btn));
-
-        document.getElementById('addForm').addEventListener('submit', function (event) {
-            event.preventDefault();
-            const formData = new FormData(this);
-            const title = formData.get("title");
-            const category = formData.get("category");
-
-            fetch('/add', {
-                method: 'POST',
-                body: formData
-            })
-            .then(res => res.json())
-            .then(data => {
-                if (data.success) {
-                    const containerId = category === 'filme' ? 'movies' : 'series';
-                    const container = document.getElementById(containerId);
-
-                    const card = document.createElement('div');
-                    card.className = 'card';
-
-                    const span = document.createElement('span');
-                    span.textContent = title;
-                    card.appendChild(span);
-
-                    const delBtn = document.createElement('button');
-                    delBtn.textContent = 'Deletar';
-                    delBtn.className = 'delete delete-button';
-                    delBtn.setAttribute('data-title', title);
-                    delBtn.setAttribute('data-category', category);
-                    card.appendChild(delBtn);
-
-                    container.appendChild(card);
-                    attachDeleteEvent(delBtn);
-
-                    showToast(`${title} foi adicionado como ${category === 'filme' ? 'filme' : 'série'}`);
-                    this.reset();
-                } else {
-                    showToast('Erro ao adicionar item.', true);
-                }
-            })
-            .catch(err => {
-                console.error(err);
-                showToast('Erro inesperado.', true);
-            });
-        });
-    });
-</script>
-</body>
-''',
-                                  username=username,
-                                  movies=movies,
-                                  series=series,
-                                  users=all_users)
+    return resposta_condicional(etag, lambda: render_template('biblioteca.html',
+                                                              username=username,
+                                                              page_size=LIBRARY_PAGE_SIZE,
+                                                              users=all_users))
 
 @app.route('/view_other', methods=['POST'])
 def view_other():
     username = request.form.get('username')
     other_user = request.form.get('other_username')
     
-    if other_user not in user_data:
+    if not storage.has_user(other_user):
         return "Usuário não encontrado!", 404
-    
-    other_movies = user_data[other_user]["movies"]
-    other_series = user_data[other_user]["series"]
-    all_users = list(user_data.keys())
-
-    return render_template_string('''
- <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
-<link rel="icon" type="image/x-icon" href="/static/favicon.ico">
-<link rel="stylesheet" href="/static/styles.css">
-<title>📚 Lista de {{ other_username }}</title>
-<body class="biblioteca-page">
-    <div class="biblioteca-container">
-        <div class="header">
-            <h1>📚 Biblioteca de {{ other_username }}</h1>
-            <a href="/login" class="logout-button">Sair</a>
-        </div>
-
-        <div class="section">
-            <h2 class="toggle" data-target="other_movies">🎞️ Filmes</h2>
-            <div id="other_movies" class="content-grid" style="display: none;">
-                {% for movie in movies %}
-                    <div class="card">
-                        <span>{{ movie }}</span>
-                    </div>
-                {% endfor %}
-            </div>
-        </div>
-
-        <div class="section">
-            <h2 class="toggle" data-target="other_series">📺 Séries</h2>
-            <div id="other_series" class="content-grid" style="display: none;">
-                {% for serie in series %}
-                    <div class="card">
-                        <span>{{ serie }}</span>
-                    </div>
-                {% endfor %}
-            </div>
-        </div>
-
-        <form method="get" action="/mybiblioteca" class="back-form">
-            <input type="hidden" name="username" value="{{ username }}">
-            <button type="submit" class="back-button">⬅ Voltar para Minha Biblioteca</button>
-        </form>
-    </div>
-
-<script>
-    document.addEventListener('DOMContentLoaded', function () {
-        function toggleSection(sectionId) {
-            const section = document.getElementById(sectionId);
-            if (section.style.display === "none" || section.style.display === "") {
-                section.style.display = "grid";
-            } else {
-                section.style.display = "none";
-            }
-        }
-
-        document.querySelectorAll('.toggle').forEach(function (toggle) {
-            toggle.addEventListener('click', function () {
-                toggleSection(this.getAttribute('data-target'));
-            });
-        });
-    });
-</script>
-</body>
-''',
-                                      username=username,
-                                      other_username=other_user,
-                                      movies=other_movies,
-                                      series=other_series)
+
+    return render_template('view_other.html',
+                           username=username,
+                           other_username=other_user,
+                           page_size=LIBRARY_PAGE_SIZE)
+
+@app.route('/api/biblioteca', methods=['GET'])
+def biblioteca_page():
+    """Uma página de títulos da biblioteca de um usuário"""
+    username = request.args.get('username')
+    category = request.args.get('category', '')
+
+    if not username or not storage.has_user(username):
+        return jsonify({"success": False, "error": "Usuário inválido"}), 400
+    if not validar_categoria(category):
+        return jsonify({"success": False, "error": "Categoria inválida"}), 400
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', LIBRARY_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"success": False, "error": "Paginação inválida"}), 400
+
+    key = "movies" if category == "filme" else "series"
+
+    def render():
+        # Busca um a mais para saber se existe próxima página
+        titles = storage.page_titles(username, key, offset, limit + 1)
+        has_more = len(titles) > limit
+        return jsonify({
+            "success": True,
+            "titles": titles[:limit],
+            "next_offset": offset + limit if has_more else None
+        })
+
+    return resposta_condicional(etag_usuario(username), render)
+
+@app.route('/search', methods=['GET'])
+def search():
+    """Busca títulos na biblioteca e em aberto de um usuário ou de todos"""
+    query = request.args.get('q', '')
+    username = request.args.get('username') or None
+    scope = request.args.get('scope', 'all')
+
+    if not limpar_input(query):
+        return jsonify({"success": False, "error": "Busca vazia"}), 400
+    if username and not storage.has_user(username):
+        return jsonify({"success": False, "error": "Usuário inválido"}), 400
+    if scope not in SEARCH_SCOPES:
+        return jsonify({"success": False, "error": "Escopo inválido"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"success": False, "error": "Limite inválido"}), 400
+
+    search_index.ensure_built(storage)
+    search_index.sync(storage)
+    results = search_index.search(query, username=username, sections=SEARCH_SCOPES[scope], limit=limit)
+    return jsonify({"success": True, "query": query, "results": results})
 
 @app.route('/delete', methods=['POST'])
 def delete_item():
@@ -502,23 +454,21 @@ def delete_item():
     category = data.get('category')
     client_ip = get_client_ip()
 
-    if username not in user_data:
+    if not storage.has_user(username):
         log_access(client_ip, "delete_item_fail", username, "user_not_found", 
                   {"title": title, "category": category})
         return jsonify({"success": False}), 400
 
     key = "movies" if category == "filme" else "series"
-    if title in user_data[username][key]:
-        user_data[username][key].remove(title)
-        save_data()
+    if storage.remove_title(username, key, title):
         
         # Log da deleção
         log_access(client_ip, "delete_item_success", username, "delete_item", {
             "title": title,
             "category": category,
             "library_stats": {
-                "total_movies": len(user_data[username]["movies"]),
-                "total_series": len(user_data[username]["series"])
+                "total_movies": storage.count_titles(username, "movies"),
+                "total_series": storage.count_titles(username, "series")
             }
         })
         
@@ -531,74 +481,82 @@ def view_aberto():
     username = request.form.get('username')
     other_user = request.form.get('other_username')
 
-    if other_user not in user_data:
+    other = storage.get_user(other_user)
+    if other is None:
         return "Usuário não encontrado!", 404
 
-    abertos_movies = user_data[other_user].get("abertos", {}).get("movies", [])
-    abertos_series = user_data[other_user].get("abertos", {}).get("series", [])
-
-    return render_template_string('''
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <link rel="stylesheet" href="/static/styles.css">
-    <title>Em Aberto de {{ other_user }}</title>
-    <body class="biblioteca-page">
-    <div class="biblioteca-container">
-        <div class="header">
-            <h1>🎯 Lista Em Aberto de {{ other_user }}</h1>
-            <a href="/login" class="logout-button">Sair</a>
-        </div>
-
-        <div class="section">
-            <h2 class="toggle" data-target="other_abertos_filmes">🎞️ Filmes em Aberto</h2>
-            <div id="other_abertos_filmes" class="content-grid" style="display: none;">
-                {% for movie in movies %}
-                    <div class="card"><span>{{ movie }}</span></div>
-                {% endfor %}
-            </div>
-        </div>
-
-        <div class="section">
-            <h2 class="toggle" data-target="other_abertos_series">📺 Séries em Aberto</h2>
-            <div id="other_abertos_series" class="content-grid" style="display: none;">
-                {% for serie in series %}
-                    <div class="card"><span>{{ serie }}</span></div>
-                {% endfor %}
-            </div>
-        </div>
-
-        <form method="get" action="/mybiblioteca" class="back-form">
-            <input type="hidden" name="username" value="{{ username }}">
-            <button type="submit" class="back-button">⬅ Voltar</button>
-        </form>
-    </div>
-
-    <script>
-        document.querySelectorAll('.toggle').forEach(function(toggle) {
-            toggle.addEventListener('click', function () {
-                const section = document.getElementById(this.getAttribute('data-target'));
-                section.style.display = (section.style.display === "none" || section.style.display === "") ? "grid" : "none";
-            });
-        });
-    </script>
-    </body>
-    ''',
-                                  username=username,
-                                  other_user=other_user,
-                                  movies=abertos_movies,
-                                  series=abertos_series)
+    abertos_movies = other["abertos"]["movies"]
+    abertos_series = other["abertos"]["series"]
+
+    return render_template('view_aberto.html',
+                           username=username,
+                           other_user=other_user,
+                           movies=abertos_movies,
+                           series=abertos_series)
 
 @app.route('/sync_em_aberto', methods=['GET'])
 def sync_em_aberto():
     username = request.args.get('username')
-    if not username or username not in user_data:
+    etag = etag_usuario(username) if username else None
+    if etag is None:
         return jsonify({"success": False, "error": "Usuário inválido"}), 400
 
-    abertos = user_data[username].get("abertos", {"movies": [], "series": []})
-    return jsonify({
-        "success": True,
-        "movies": abertos.get("movies", []),
-        "series": abertos.get("series", [])
-    })
+    def render():
+        abertos = storage.get_user(username)["abertos"]
+        return jsonify({
+            "success": True,
+            "movies": abertos["movies"],
+            "series": abertos["series"]
+        })
+
+    # Clientes que fazem polling recebem 304 enquanto nada muda
+    return resposta_condicional(etag, render)
+
+def evento_sse(event, version, data):
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/em_aberto/stream', methods=['GET'])
+def em_aberto_stream():
+    """Server-Sent Events com as mudanças das listas do usuário.
+
+    Retoma a partir da versão em Last-Event-ID (reconexão do EventSource)
+    ou em ?since=; se o histórico não cobre a diferença, manda "reset".
+    """
+    username = request.args.get('username')
+    version = storage.get_version(username) if username else None
+    if version is None:
+        return jsonify({"success": False, "error": "Usuário inválido"}), 400
+    try:
+        since = int(request.headers.get('Last-Event-ID') or request.args.get('since', version))
+    except ValueError:
+        since = version
+
+    feed = change_feed.open(username)
+    if feed is None:
+        # O cliente volta a fazer polling de /sync_em_aberto
+        return jsonify({"success": False, "error": "Muitas conexões abertas"}), 503
+
+    def stream():
+        nonlocal since
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            deadline = time.monotonic() + SSE_MAX_DURATION
+            while time.monotonic() < deadline:
+                deltas, reset = change_feed.wait(feed, since, SSE_HEARTBEAT)
+                if reset:
+                    since = feed.version
+                    yield evento_sse("reset", since, {"version": since})
+                elif deltas:
+                    since = deltas[-1]["version"]
+                    yield "".join(evento_sse("delta", delta["version"], delta) for delta in deltas)
+                else:
+                    # Mantém a conexão viva em proxies e detecta abas fechadas
+                    yield ": ping\n\n"
+        finally:
+            change_feed.close(feed)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/em_aberto', methods=['GET', 'POST'])
 def em_aberto():
@@ -606,223 +564,18 @@ def em_aberto():
     if not username:
         return "Usuário inválido", 404
     
-    if username not in user_data:
-        inicializar_usuario(username)
-    
-    abertos = user_data[username].get("abertos", {"movies": [], "series": []})
-    abertos_movies = abertos.get("movies", [])
-    abertos_series = abertos.get("series", [])
-
-    return render_template_string(
-        '''
-<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>🎯 Em Aberto</title>
-    <link rel="icon" type="image/x-icon" href="/static/favicon.ico">
-    <link rel="stylesheet" href="/static/styles.css">
-</head>
-<body class="biblioteca-page">
-    <div class="biblioteca-container">
-        <div class="header">
-            <h1>🎯 Lista Em Aberto de {{ username }}</h1>
-            <a href="/login" class="logout-button">Sair</a>
-        </div>
-                                  
-       <div id="toast" class="toast"></div>
-
-        <!-- Formulário para adicionar -->
-        <form id="addAbertoForm" class="add-form">
-            <input type="hidden" name="username" value="{{ username }}">
-            <input type="text" name="title" placeholder="Título do filme ou série" required>
-            <select name="category">
-                <option value="filme">Filme</option>
-                <option value="serie">Série</option>
-            </select>
-            <button type="submit" class="add-button">Adicionar</button>
-        </form>
-
-        <!-- Filmes em aberto -->
-        <div class="section">
-            <h2 class="toggle" data-target="abertos_filmes">🎞️ Filmes em Aberto</h2>
-            <div id="abertos_filmes" class="content-grid">
-                {% for movie in movies %}
-                    <div class="card">
-                        <span>{{ movie }}</span>
-                        <button class="delete-button delete-aberto-btn" data-title="{{ movie }}" data-category="filme" style="margin-top: 10px;">🗑 Deletar</button>
-                        <button class="add-button mover-biblioteca-btn" data-title="{{ movie }}" data-category="filme">📥 Mover para Biblioteca</button>
-                    </div>
-                {% endfor %}
-            </div>
-        </div>
-
-        <!-- Séries em aberto -->
-        <div class="section">
-            <h2 class="toggle" data-target="abertos_series">📺 Séries em Aberto</h2>
-            <div id="abertos_series" class="content-grid">
-                {% for serie in series %}
-                    <div class="card">
-                        <span>{{ serie }}</span>
-                        <button class="delete-button delete-aberto-btn" data-title="{{ serie }}" data-category="serie" style="margin-top: 10px;">🗑 Deletar</button>
-                        <button class="add-button mover-biblioteca-btn" data-title="{{ serie }}" data-category="serie">📥 Mover para Biblioteca</button>
-                    </div>
-                {% endfor %}
-            </div>
-        </div>
-
-        <form method="get" action="/mybiblioteca" class="back-form">
-            <input type="hidden" name="username" value="{{ username }}">
-            <button type="submit" class="back-button">⬅ Voltar</button>
-        </form>
-    </div>
-
-<script>
-    document.addEventListener('DOMContentLoaded', function () {
-        function showToast(message, isError = false) {
-            const toast = document.getElementById("toast");
-            toast.textContent = message;
-            toast.className = "toast" + (isError ? " error" : "");
-            toast.classList.add("show");
-            setTimeout(() => {
-                toast.classList.remove("show");
-            }, 3000);
-        }
-
-        document.querySelectorAll('.toggle').forEach(function (toggle) {
-            toggle.addEventListener('click', function () {
-                const target = document.getElementById(this.getAttribute('data-target'));
-                target.style.display = (target.style.display === "none" || target.style.display === "") ? "grid" : "none";
-            });
-        });
-
-        // Adicionar item via AJAX
-        document.getElementById('addAbertoForm').addEventListener('submit', function (event) {
-            event.preventDefault();
-            const formData = new FormData(this);
-            const title = formData.get("title");
-            const category = formData.get("category");
-
-            fetch('/add_aberto_ajax', {
-                method: 'POST',
-                body: formData
-            })
-            .then(res => res.json())
-            .then(data => {
-                if (data.success) {
-                    const containerId = category === 'filme' ? 'abertos_filmes' : 'abertos_series';
-                    const container = document.getElementById(containerId);
-
-                    const card = document.createElement('div');
-                    card.className = 'card';
-
-                    const span = document.createElement('span');
-                    span.textContent = title;
-                    card.appendChild(span);
-
-                    const delBtn = document.createElement('button');
-                    delBtn.textContent = '🗑 Deletar';
-                    delBtn.className = 'delete-button delete-aberto-btn';
-                    delBtn.setAttribute('data-title', title);
-                    delBtn.setAttribute('data-category', category);
-                    delBtn.style.marginTop = '10px';
-                    card.appendChild(delBtn);
-
-                    const moveBtn = document.createElement('button');
-                    moveBtn.textContent = '📥 Mover para Biblioteca';
-                    moveBtn.className = 'add-button mover-biblioteca-btn';
-                    moveBtn.setAttribute('data-title', title);
-                    moveBtn.setAttribute('data-category', category);
-                    card.appendChild(moveBtn);
-
-                    container.appendChild(card);
-                    attachEvents(delBtn, moveBtn);
-
-                    showToast(`${title} foi adicionado como ${category === 'filme' ? 'filme' : 'série'} em aberto`);
-                    this.reset();
-                } else {
-                    showToast('Erro ao adicionar item.', true);
-                }
-            })
-            .catch(err => {
-                console.error(err);
-                showToast('Erro inesperado.', true);
-            });
-        });
-
-        function attachEvents(delBtn, moveBtn) {
-            delBtn.addEventListener('click', function () {
-                const title = this.getAttribute('data-title');
-                const category = this.getAttribute('data-category');
-
-                fetch('/delete_aberto_ajax', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        username: '{{ username }}',
-                        title: title,
-                        category: category
-                    })
-                })
-                .then(res => res.json())
-                .then(data => {
-                    if (data.success) {
-                        this.closest('.card').remove();
-                        showToast(`${title} foi removido dos em aberto`);
-                    } else {
-                        showToast('Erro ao deletar item.', true);
-                    }
-                });
-            });
-
-            moveBtn.addEventListener('click', function () {
-                const title = this.getAttribute('data-title');
-                const category = this.getAttribute('data-category');
-
-                fetch('/mover_para_biblioteca_ajax', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        username: '{{ username }}',
-                        title: title,
-                        category: category
-                    })
-                })
-                .then(res => res.json())
-                .then(data => {
-                    if (data.success) {
-                        this.closest('.card').remove();
-                        showToast(`${title} foi movido para a biblioteca`);
-                    } else {
-                        showToast('Erro ao mover item.', true);
-                    }
-                });
-            });
-        }
-
-        // Anexar eventos aos botões existentes
-        document.querySelectorAll('.delete-aberto-btn').forEach(btn => {
-            const moveBtn = btn.nextElementSibling;
-            attachEvents(btn, moveBtn);
-        });
-
-        // Inicia fechado no mobile
-        if (window.innerWidth <= 600) {
-            document.getElementById('abertos_filmes').style.display = "none";
-            document.getElementById('abertos_series').style.display = "none";
-        }
-    });
-</script>
-</body>
-</html>
-''',
-        username=username,
-        movies=abertos_movies,
-        series=abertos_series)
+    inicializar_usuario(username)
+
+    def render():
+        user = storage.get_user(username)
+        # A versão da cópia renderizada é de onde o stream de mudanças parte
+        return render_template('em_aberto.html',
+                               username=username,
+                               version=user["version"],
+                               movies=user["abertos"]["movies"],
+                               series=user["abertos"]["series"])
+
+    return resposta_condicional(etag_usuario(username), render)
 
 @app.route('/add_aberto_ajax', methods=['POST'])
 def add_aberto_ajax():
@@ -832,7 +585,7 @@ def add_aberto_ajax():
         category = request.form.get('category', '').strip()
 
         # Validações
-        if not username or username not in user_data:
+        if not username or not storage.has_user(username):
             return jsonify({"success": False, "message": "Usuário inválido"}), 400
             
         if not validar_titulo(title):
@@ -841,19 +594,11 @@ def add_aberto_ajax():
         if not validar_categoria(category):
             return jsonify({"success": False, "message": "Categoria inválida"}), 400
 
-        # Inicializar abertos se não existir
-        if "abertos" not in user_data[username]:
-            user_data[username]["abertos"] = {"movies": [], "series": []}
-
         key = "movies" if category == "filme" else "series"
         
-        # Verificar se já existe
-        if title in user_data[username]["abertos"][key]:
+        # Adicionar (falha se já existe)
+        if not storage.add_title(username, key, title, abertos=True):
             return jsonify({"success": False, "message": "Item já existe"}), 400
-
-        # Adicionar
-        user_data[username]["abertos"][key].append(title)
-        save_data()
         
         return jsonify({
             "success": True, 
@@ -874,16 +619,13 @@ def delete_aberto_ajax():
     title = data.get('title')
     category = data.get('category')
 
-    if username not in user_data or category not in ["filme", "serie"]:
+    if not storage.has_user(username) or category not in ["filme", "serie"]:
         return jsonify({"success": False}), 400
 
     key = "movies" if category == "filme" else "series"
     
-    if "abertos" in user_data[username] and key in user_data[username]["abertos"]:
-        if title in user_data[username]["abertos"][key]:
-            user_data[username]["abertos"][key].remove(title)
-            save_data()
-            return jsonify({"success": True})
+    if storage.remove_title(username, key, title, abertos=True):
+        return jsonify({"success": True})
 
     return jsonify({"success": False}), 400
 
@@ -894,22 +636,134 @@ def mover_para_biblioteca_ajax():
     title = data.get('title')
     category = data.get('category')
 
-    if username not in user_data or category not in ["filme", "serie"]:
+    if not storage.has_user(username) or category not in ["filme", "serie"]:
         return jsonify({"success": False}), 400
 
     key = "movies" if category == "filme" else "series"
 
-    # Adiciona à biblioteca (se ainda não estiver)
-    if title not in user_data[username][key]:
-        user_data[username][key].append(title)
+    # Adiciona à biblioteca (se ainda não estiver) e remove dos abertos
+    storage.move_to_library(username, key, title)
+    return jsonify({"success": True})
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Várias operações (add/delete/move) numa requisição, gravadas de uma vez.
 
-    # Remove da lista de abertos (se estiver)
-    if "abertos" in user_data[username] and key in user_data[username]["abertos"]:
-        if title in user_data[username]["abertos"][key]:
-            user_data[username]["abertos"][key].remove(title)
+    JSON: {"username": ..., "operations": [{"op", "title", "category", "lista"}]}.
+    Com Content-Type application/x-ndjson, o corpo traz uma operação por
+    linha (usuário em ?username=) e os resultados voltam em streaming,
+    também uma linha por operação, aplicados em lotes de BATCH_STREAM_CHUNK.
+    """
+    client_ip = get_client_ip()
 
-    save_data()
-    return jsonify({"success": True})
+    if request.mimetype == 'application/x-ndjson':
+        username = request.args.get('username', '').strip()
+        if not username or not storage.has_user(username):
+            return jsonify({"success": False, "message": "Usuário inválido"}), 400
+
+        def importar():
+            applied = failed = index = 0
+            chunk = []
+
+            def aplicar():
+                nonlocal applied, failed
+                results = aplicar_lote(username, chunk, index - len(chunk))
+                chunk.clear()
+                for result in results:
+                    if result["success"]:
+                        applied += 1
+                    else:
+                        failed += 1
+                return ''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in results)
+
+            for line in request.stream:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    chunk.append(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    chunk.append(None)
+                index += 1
+                if len(chunk) >= BATCH_STREAM_CHUNK:
+                    yield aplicar()
+            if chunk:
+                yield aplicar()
+            log_access(client_ip, "batch_import", username, "batch",
+                       {"operations": index, "applied": applied, "failed": failed})
+            yield json.dumps({"done": True, "applied": applied, "failed": failed}) + '\n'
+
+        return Response(stream_with_context(importar()), mimetype='application/x-ndjson')
+
+    data = request.get_json(silent=True) or {}
+    username = data.get('username')
+    operations = data.get('operations')
+
+    if not username or not storage.has_user(username):
+        return jsonify({"success": False, "message": "Usuário inválido"}), 400
+    if not isinstance(operations, list):
+        return jsonify({"success": False, "message": "Lista de operações inválida"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"success": False,
+                        "message": f"Máximo de {MAX_BATCH_OPERATIONS} operações por requisição"}), 400
+
+    results = aplicar_lote(username, operations)
+    applied = sum(1 for result in results if result["success"])
+    log_access(client_ip, "batch", username, "batch",
+               {"operations": len(operations), "applied": applied})
+    return jsonify({
+        "success": True,
+        "applied": applied,
+        "failed": len(results) - applied,
+        "results": results
+    })
+
+@app.route('/export', methods=['GET'])
+def export_library():
+    """Baixa as listas do usuário em CSV ou JSON Lines, geradas em streaming"""
+    username = request.args.get('username', '').strip()
+    fmt = request.args.get('format', 'csv')
+    client_ip = get_client_ip()
+
+    if not username or not storage.has_user(username):
+        return jsonify({"success": False, "message": "Usuário inválido"}), 400
+    if fmt not in TRANSFER_FORMATS:
+        return jsonify({"success": False, "message": "Formato inválido"}), 400
+
+    log_access(client_ip, "export", username, "export", {"format": fmt})
+    filename = re.sub(r'[^\w.-]', '_', username, flags=re.ASCII) or 'biblioteca'
+    return Response(export_chunks(storage, username, fmt),
+                    mimetype=TRANSFER_FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'})
+
+@app.route('/import', methods=['POST'])
+def import_library():
+    """Importa títulos de um CSV/JSON Lines (corpo da requisição ou campo 'file')"""
+    # Ler request.form (ou request.files) consome o corpo quando ele chega como
+    # form-urlencoded (o padrão do curl --data-binary): só formulários multipart
+    # são lidos como formulário; nos outros casos o corpo é o próprio arquivo
+    multipart = request.mimetype == 'multipart/form-data'
+    username = request.args.get('username', '')
+    if not username and (multipart or request.mimetype == 'application/x-www-form-urlencoded'):
+        username = request.form.get('username', '')
+    username = username.strip()
+    client_ip = get_client_ip()
+    if not username or not storage.has_user(username):
+        return jsonify({"success": False, "message": "Usuário inválido"}), 400
+
+    upload = request.files.get('file') if multipart else None
+    default = 'jsonl' if request.mimetype == 'application/x-ndjson' else 'csv'
+    fmt = request.args.get('format') or guess_format(upload.filename if upload else None, default)
+    if fmt not in TRANSFER_FORMATS:
+        return jsonify({"success": False, "message": "Formato inválido"}), 400
+
+    stream = upload.stream if upload else request.stream
+    totals = import_rows(storage, username, parse_rows(text_lines(stream), fmt))
+    if not any(totals.values()):
+        # Corpo vazio (ou já consumido como formulário): nada foi lido
+        return jsonify({"success": False, "message": "Nenhum título enviado"}), 400
+    log_access(client_ip, "import", username, "import", dict(totals, format=fmt))
+    return jsonify({"success": True, **totals})
 
 @app.route('/admin/logs', methods=['GET', 'POST'])
 def view_logs():
@@ -923,307 +777,89 @@ def view_logs():
         if action == 'delete_user_logs':
             username_to_delete = request.form.get('username_to_delete')
             if username_to_delete:
-                logs = load_access_logs()
-                # Filtrar logs removendo os do usuário selecionado
-                filtered_logs = [log for log in logs if log.get('username') != username_to_delete]
-                save_access_logs(filtered_logs)
-                
+                removed = access_logger.delete_user(username_to_delete)
+                access_stats.forget(removed)
+                logs_after = len(access_logger.buffer)
+
                 log_access(client_ip, "admin_delete_logs", None, "delete_user_logs", 
                           {"deleted_user": username_to_delete, 
-                           "logs_before": len(logs), 
-                           "logs_after": len(filtered_logs)})
-    
-    logs = load_access_logs()[-1000:]  # Últimos 1000 logs
+                           "logs_before": logs_after + len(removed), 
+                           "logs_after": logs_after})
     
-    # Calcular estatísticas avançadas
-    mobile_users = sum(1 for log in logs if log.get('device_info', {}).get('is_mobile', False))
-    browsers = {}
-    os_stats = {}
-    actions_stats = {}
-    
-    for log in logs:
-        device_info = log.get('device_info', {})
-        browser = device_info.get('browser', 'Unknown')
-        os_info = device_info.get('os', 'Unknown')
-        action = log.get('action', 'Unknown')
-        
-        browsers[browser] = browsers.get(browser, 0) + 1
-        os_stats[os_info] = os_stats.get(os_info, 0) + 1
-        actions_stats[action] = actions_stats.get(action, 0) + 1
-
-    # Obter lista de usuários únicos dos logs para o formulário
-    unique_users = sorted(set(log.get('username') for log in logs if log.get('username')))
+    # Painel lê só os agregados e os últimos 50 logs (mais recentes primeiro)
+    recent_logs = access_logger.recent(50)[::-1]
     
-    return render_template_string('''
-<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>📊 Analytics Avançado</title>
-    <link rel="stylesheet" href="/static/styles.css">
-    <style>
-        .logs-container {
-            max-width: 1400px;
-            margin: 20px auto;
-            padding: 20px;
-            background: #1a1a1a;
-            border-radius: 10px;
-        }
-        .log-table {
-            width: 100%;
-            border-collapse: collapse;
-            margin-top: 20px;
-            font-size: 12px;
-        }
-        .log-table th, .log-table td {
-            padding: 8px;
-            text-align: left;
-            border-bottom: 1px solid #333;
-            color: #fff;
-        }
-        .log-table th {
-            background: #2d2d2d;
-            font-weight: bold;
-        }
-        .log-table tr:hover {
-            background: #2a2a2a;
-        }
-        .stats {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(180px, 1fr));
-            gap: 15px;
-            margin-bottom: 20px;
-        }
-        .stat-card {
-            background: #2d2d2d;
-            padding: 15px;
-            border-radius: 8px;
-            text-align: center;
-        }
-        .stat-number {
-            font-size: 1.8em;
-            font-weight: bold;
-            color: #4CAF50;
-        }
-        .back-button {
-            background: #666;
-            color: white;
-            padding: 10px 20px;
-            border: none;
-            border-radius: 5px;
-            cursor: pointer;
-            text-decoration: none;
-            display: inline-block;
-            margin-bottom: 20px;
-        }
-        .detailed-stats {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 20px;
-            margin: 20px 0;
-        }
-        .stat-section {
-            background: #2d2d2d;
-            padding: 15px;
-            border-radius: 8px;
-        }
-        .stat-section h3 {
-            color: #4CAF50;
-            margin-top: 0;
-        }
-        .stat-item {
-            display: flex;
-            justify-content: space-between;
-            padding: 5px 0;
-            border-bottom: 1px solid #444;
-            color: #ccc;
-        }
-        .mobile-badge {
-            background: #ff9800;
-            color: white;
-            padding: 2px 6px;
-            border-radius: 3px;
-            font-size: 10px;
-        }
-        .desktop-badge {
-            background: #2196F3;
-            color: white;
-            padding: 2px 6px;
-            border-radius: 3px;
-            font-size: 10px;
-        }
-        .delete-form {
-            background: #2d2d2d;
-            padding: 20px;
-            border-radius: 8px;
-            margin: 20px 0;
-            border: 2px solid #ff4444;
-        }
-        .delete-form h3 {
-            color: #ff4444;
-            margin-top: 0;
-        }
-        .delete-form select, .delete-form button {
-            padding: 10px;
-            margin: 5px;
-            border-radius: 5px;
-            border: 1px solid #555;
-            background: #1a1a1a;
-            color: white;
-        }
-        .delete-button {
-            background: #ff4444;
-            cursor: pointer;
-            font-weight: bold;
-        }
-        .delete-button:hover {
-            background: #cc0000;
-        }
-        .warning-text {
-            color: #ffaa00;
-            font-size: 14px;
-            margin: 10px 0;
-        }
-    </style>
-</head>
-<body class="biblioteca-page">
-    <div class="logs-container">
-        <a href="/login" class="back-button">⬅ Voltar ao Login</a>
-        
-        <h1>📊 Analytics Avançado</h1>
-        
-        <!-- Formulário para excluir logs por usuário -->
-        <div class="delete-form">
-            <h3>🗑️ Excluir Logs por Usuário</h3>
-            <p class="warning-text">⚠️ Atenção: Esta ação não pode ser desfeita!</p>
-            <form method="post">
-                <input type="hidden" name="action" value="delete_user_logs">
-                <select name="username_to_delete" required>
-                    <option value="">Selecione o usuário</option>
-                    {% for user in unique_users %}
-                    <option value="{{ user }}">{{ user }}</option>
-                    {% endfor %}
-                </select>
-                <button type="submit" class="delete-button" onclick="return confirm('Tem certeza que deseja excluir TODOS os logs deste usuário? Esta ação não pode ser desfeita!')">
-                    🗑️ Excluir Logs do Usuário
-                </button>
-            </form>
-        </div>
-        
-        <div class="stats">
-            <div class="stat-card">
-                <div class="stat-number">{{ total_logs }}</div>
-                <div>Total de Acessos</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-number">{{ unique_ips }}</div>
-                <div>IPs Únicos</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-number">{{ unique_users_count }}</div>
-                <div>Usuários Únicos</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-number">{{ mobile_percentage }}%</div>
-                <div>Usuários Mobile</div>
-            </div>
-        </div>
-        
-        <div class="detailed-stats">
-            <div class="stat-section">
-                <h3>🌐 Navegadores</h3>
-                {% for browser, count in top_browsers %}
-                <div class="stat-item">
-                    <span>{{ browser }}</span>
-                    <span>{{ count }}</span>
-                </div>
-                {% endfor %}
-            </div>
-            
-            <div class="stat-section">
-                <h3>💻 Sistemas Operacionais</h3>
-                {% for os, count in top_os %}
-                <div class="stat-item">
-                    <span>{{ os }}</span>
-                    <span>{{ count }}</span>
-                </div>
-                {% endfor %}
-            </div>
-            
-            <div class="stat-section">
-                <h3>🎯 Ações Mais Frequentes</h3>
-                {% for action, count in top_actions %}
-                <div class="stat-item">
-                    <span>{{ action }}</span>
-                    <span>{{ count }}</span>
-                </div>
-                {% endfor %}
-            </div>
-        </div>
-        
-        <table class="log-table">
-            <thead>
-                <tr>
-                    <th>Timestamp</th>
-                    <th>IP</th>
-                    <th>Usuário</th>
-                    <th>Página</th>
-                    <th>Ação</th>
-                    <th>Dispositivo</th>
-                    <th>Navegador</th>
-                    <th>SO</th>
-                    <th>Detalhes</th>
-                </tr>
-            </thead>
-            <tbody>
-                {% for log in logs[:50] %}
-                <tr>
-                    <td>{{ log.timestamp }}</td>
-                    <td>{{ log.ip }}</td>
-                    <td>{{ log.username or '-' }}</td>
-                    <td>{{ log.page }}</td>
-                    <td>{{ log.action or '-' }}</td>
-                    <td>
-                        {% if log.device_info and log.device_info.is_mobile %}
-                            <span class="mobile-badge">📱 Mobile</span>
-                        {% else %}
-                            <span class="desktop-badge">🖥️ Desktop</span>
-                        {% endif %}
-                    </td>
-                    <td>{{ log.device_info.browser if log.device_info else '-' }}</td>
-                    <td>{{ log.device_info.os if log.device_info else '-' }}</td>
-                    <td>
-                        {% if log.extra_data %}
-                            {{ log.extra_data|truncate(50) }}
-                        {% else %}
-                            -
-                        {% endif %}
-                    </td>
-                </tr>
-                {% endfor %}
-            </tbody>
-        </table>
-        
-        {% if logs|length > 50 %}
-        <p style="text-align: center; color: #888; margin-top: 20px;">
-            Mostrando apenas os 50 logs mais recentes de {{ logs|length }} total
-        </p>
-        {% endif %}
-    </div>
-</body>
-</html>
-    ''', 
-    logs=logs,
-    total_logs=len(logs),
-    unique_ips=len(set(log.get('ip', '') for log in logs)),
-    unique_users_count=len(set(log.get('username', '') for log in logs if log.get('username'))),
-    mobile_percentage=round((mobile_users / len(logs)) * 100, 1) if logs else 0,
-    top_browsers=sorted(browsers.items(), key=lambda x: x[1], reverse=True)[:5],
-    top_os=sorted(os_stats.items(), key=lambda x: x[1], reverse=True)[:5],
-    top_actions=sorted(actions_stats.items(), key=lambda x: x[1], reverse=True)[:10],
-    unique_users=unique_users
-    )
+    return render_template('admin_logs.html',
+                           logs=recent_logs,
+                           hourly=access_stats.trend("hour", 24),
+                           daily=access_stats.trend("day", 30),
+                           **access_stats.snapshot())
+
+def filtro_logs(name):
+    """Valor de um filtro das consultas de logs (None se ausente)"""
+    return request.args.get(name, '').strip() or None
+
+def periodo_logs():
+    """(since, until) das consultas de logs: "AAAA-MM-DD HH:MM:SS" ou um prefixo"""
+    since, until = filtro_logs('since'), filtro_logs('until')
+    if until:
+        # "2025-01-31" inclui o dia inteiro
+        until += '\uffff'
+    return since, until
+
+@app.route('/admin/logs/history', methods=['GET'])
+def logs_history():
+    """Histórico completo dos logs (arquivo morto + ativo) em JSON Lines, em streaming;
+    filtros opcionais: username, since e until"""
+    username = filtro_logs('username')
+    since, until = periodo_logs()
+    access_logger.flush()
+
+    def gerar():
+        for entry in access_logger.iter_entries(since, until):
+            if username is None or entry.get('username') == username:
+                yield json.dumps(entry, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(gerar()), mimetype='application/x-ndjson')
+
+@app.route('/admin/logs/query', methods=['GET'])
+def logs_query():
+    """Consulta paginada dos logs (mais antigos primeiro) com filtros username, ip,
+    page, action, since e until; a próxima página vem de ?cursor=<next_cursor>"""
+    try:
+        limit = min(max(int(request.args.get('limit', LOGS_QUERY_LIMIT)), 1), MAX_LOGS_QUERY_LIMIT)
+    except ValueError:
+        return jsonify({"success": False, "message": "Limite inválido"}), 400
+    since, until = periodo_logs()
+    access_logger.flush()
+    try:
+        logs, next_cursor = access_logger.query(username=filtro_logs('username'), ip=filtro_logs('ip'),
+                                                page=filtro_logs('page'), action=filtro_logs('action'),
+                                                since=since, until=until, cursor=filtro_logs('cursor'),
+                                                limit=limit)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "logs": logs, "next_cursor": next_cursor})
+
+@app.route('/admin/profiles', methods=['GET'])
+def view_profiles():
+    """Perfis gravados pelo modo de perfil, mais recentes primeiro"""
+    return render_template('admin_profiles.html',
+                           profiles=profiling.list_profiles(profiling.PROFILE_DIR, limit=100),
+                           enabled=profiling.enabled(),
+                           routes=profiling.PROFILE_ROUTES)
+
+@app.route('/admin/profiles/<name>/<kind>', methods=['GET'])
+def profile_file(name, kind):
+    """Resumo em texto (kind=resumo) ou download do .pstats/.collapsed de um perfil"""
+    if not re.fullmatch(r'[\w.-]+', name) or kind not in ('resumo', 'pstats', 'collapsed'):
+        return "Perfil não encontrado", 404
+    if kind == 'resumo':
+        try:
+            return Response(profiling.summary(profiling.PROFILE_DIR, name), mimetype='text/plain')
+        except FileNotFoundError:
+            return "Perfil não encontrado", 404
+    return send_from_directory(os.path.abspath(profiling.PROFILE_DIR), f"{name}.{kind}", as_attachment=True)
 
 @app.route('/add', methods=['POST'])
 def add_item():
@@ -1234,7 +870,7 @@ def add_item():
         client_ip = get_client_ip()
 
         # Validações
-        if not username or username not in user_data:
+        if not username or not storage.has_user(username):
             log_access(client_ip, "add_item_fail", username, "validation_error", 
                       {"error": "invalid_user"})
             return jsonify({"success": False, "message": "Usuário inválido"}), 400
@@ -1253,26 +889,22 @@ def add_item():
         title_clean = title.strip()
         key = "movies" if category == "filme" else "series"
 
-        # Verificar se já existe
-        if title_clean in user_data[username][key]:
+        # Adicionar (falha se já existe)
+        if not storage.add_title(username, key, title_clean):
             log_access(client_ip, "add_item_fail", username, "duplicate", 
                       {"title": title_clean, "category": category})
             return jsonify({
                 "success": False,
                 "message": "Já existe esse título"
             }), 400
-
-        # Adicionar
-        user_data[username][key].append(title_clean)
-        save_data()
         
         # Log de sucesso com estatísticas
         log_access(client_ip, "add_item_success", username, "add_item", {
             "title": title_clean,
             "category": category,
             "library_stats": {
-                "total_movies": len(user_data[username]["movies"]),
-                "total_series": len(user_data[username]["series"])
+                "total_movies": storage.count_titles(username, "movies"),
+                "total_series": storage.count_titles(username, "series")
             }
         })
         
@@ -1296,5 +928,8 @@ if __name__ == "__main__":
         os.system("mode con: cols=80 lines=25")
         os.system("title Gerenciador de Filmes e Séries")
 
-    # Para funcionar no Replit
-    app.run(host='0.0.0.0', port=3000)
+    # SIGTERM (ex: parada do Replit) sai pelo caminho normal, que roda shutdown() no atexit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # Servidor de desenvolvimento; em produção use: gunicorn -c gunicorn.conf.py wsgi:app
+    create_app().run(host='0.0.0.0', port=3000)
@@ -0,0 +1,140 @@
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Limites dos buckets (s) dos histogramas de tempo: de 50µs a 10s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Limites dos buckets (bytes) dos histogramas de tamanho de escrita: de 64 B a 64 MiB
+SIZE_BUCKETS = tuple(64 * 4 ** i for i in range(11))
+# Quantis expostos, calculados sobre as últimas QUANTILE_WINDOW observações de cada série
+QUANTILES = (0.5, 0.95, 0.99)
+QUANTILE_WINDOW = int(os.environ.get('METRICS_QUANTILE_WINDOW', '1024'))
+
+
+class Histogram:
+    """Uma série: contagem cumulativa por bucket, soma, total e uma janela
+    das observações recentes para os quantis"""
+
+    def __init__(self, buckets, window=QUANTILE_WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def snapshot(self):
+        """(contagens cumulativas, soma, total, quantis das observações recentes)"""
+        with self._lock:
+            counts, total, recent = list(self.counts), self.sum, sorted(self.recent)
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        quantiles = {}
+        if recent:
+            for q in QUANTILES:
+                quantiles[q] = recent[min(len(recent) - 1, int(q * len(recent)))]
+        return cumulative, total, running, quantiles
+
+
+class HistogramFamily:
+    """Histograma com labels; cada combinação de valores é uma série própria"""
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, Histogram(self.buckets))
+        return series
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede o bloco e registra a duração em segundos (também se ele falhar)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        quantile_lines = []
+        for key, series in sorted(self._series.items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative, total, count, quantiles = series.snapshot()
+            for bound, value in zip((*self.buckets, '+Inf'), cumulative):
+                lines.append(f"{self.name}_bucket{_labels(labels + [('le', _number(bound))])} {value}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+            for q, value in quantiles.items():
+                quantile_lines.append(f"{self.name}_quantile{_labels(labels + [('quantile', q)])} {_number(value)}")
+        if quantile_lines:
+            lines.append(f"# HELP {self.name}_quantile Quantis de {self.name} nas últimas "
+                         f"{QUANTILE_WINDOW} observações")
+            lines.append(f"# TYPE {self.name}_quantile gauge")
+            lines.extend(quantile_lines)
+        return lines
+
+
+def _number(value):
+    return value if isinstance(value, str) else repr(float(value))
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Registry:
+    """Métricas do processo, no formato de texto do Prometheus.
+
+    Cada worker do gunicorn tem o seu registro (como os agregados de
+    /admin/logs); os valores de um scrape são os do worker que atendeu.
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        """Declara (ou retorna, se já existe) um histograma"""
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = HistogramFamily(name, help, labelnames, buckets)
+        return family
+
+    def render(self):
+        with self._lock:
+            families = list(self._families.values())
+        lines = [line for family in families for line in family.render()]
+        return '\n'.join(lines) + '\n'
+
+
+# Registro usado pela aplicação: módulos declaram suas métricas nele
+registry = Registry()
+histogram = registry.histogram
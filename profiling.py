@@ -0,0 +1,194 @@
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import parse_qs
+
+# Rotas perfiladas em toda requisição (prefixos separados por vírgula, "*" para todas)
+PROFILE_ROUTES = [route.strip() for route in os.environ.get('PROFILE_ROUTES', '').split(',') if route.strip()]
+# Com um segredo, qualquer rota pode ser perfilada sob demanda com ?profile=<assinatura>
+# (gerada por `python profiling.py sign <rota>`)
+PROFILE_SECRET = os.environ.get('PROFILE_SECRET', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+# Perfis mantidos em disco (os mais antigos são apagados)
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+# Intervalo (s) entre amostras da pilha para o arquivo de flamegraph
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.001'))
+
+
+def enabled():
+    """Modo de perfil ligado? Desligado, o middleware nem é instalado (custo zero)"""
+    return bool(PROFILE_ROUTES or PROFILE_SECRET)
+
+def assinar(path, secret=PROFILE_SECRET):
+    """Assinatura que libera ?profile= para a rota `path`"""
+    return hmac.new(secret.encode('utf-8'), path.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Amostra a pilha de uma thread em intervalos fixos, gerando o formato
+    "collapsed" (uma linha por pilha: frames separados por ';' e a contagem),
+    lido por flamegraph.pl, speedscope e similares"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilerMiddleware:
+    """Middleware WSGI que perfila as requisições escolhidas.
+
+    Cada perfil gera três arquivos em `profile_dir`: .pstats (cProfile,
+    determinístico), .collapsed (amostras da pilha, para flamegraph) e
+    .json (rota, status, duração). Só uma requisição é perfilada por vez
+    no processo; as outras seguem normalmente. O corpo de respostas em
+    streaming é gerado fora do perfil.
+    """
+
+    def __init__(self, app, profile_dir=PROFILE_DIR, routes=PROFILE_ROUTES, secret=PROFILE_SECRET,
+                 keep=PROFILE_KEEP):
+        self.app = app
+        self.profile_dir = profile_dir
+        self.routes = routes
+        self.secret = secret
+        self.keep = keep
+        self._lock = threading.Lock()
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def _wanted(self, environ):
+        path = environ.get('PATH_INFO', '')
+        if any(route == '*' or path.startswith(route) for route in self.routes):
+            return True
+        if self.secret and 'profile=' in environ.get('QUERY_STRING', ''):
+            token = parse_qs(environ['QUERY_STRING']).get('profile', [''])[0]
+            return hmac.compare_digest(token, assinar(path, self.secret))
+        return False
+
+    def __call__(self, environ, start_response):
+        if not self._wanted(environ) or not self._lock.acquire(blocking=False):
+            return self.app(environ, start_response)
+        status = []
+
+        def capture(code, headers, *args):
+            status.append(code)
+            return start_response(code, headers, *args)
+
+        # Amostras mais frequentes que o intervalo padrão de troca de threads
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, SAMPLE_INTERVAL / 2))
+        # cProfile e pstats só são importados quando usados: o modo de perfil
+        # costuma ficar desligado e eles pesariam no início de cada worker
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            start = time.perf_counter()
+            with StackSampler(threading.get_ident()) as sampler:
+                profiler.enable()
+                try:
+                    response = self.app(environ, capture)
+                finally:
+                    profiler.disable()
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.setswitchinterval(switch_interval)
+            self._lock.release()
+        try:
+            self._save(environ, status[0] if status else '', elapsed, profiler, sampler)
+        except Exception as e:
+            print(f"Erro ao salvar perfil: {e}")
+        return response
+
+    def _save(self, environ, status, elapsed, profiler, sampler):
+        path = environ.get('PATH_INFO', '')
+        now = datetime.now()
+        slug = re.sub(r'[^a-zA-Z0-9]+', '_', path).strip('_') or 'raiz'
+        name = f"{now.strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}-{slug}"
+        base = os.path.join(self.profile_dir, name)
+        profiler.dump_stats(base + '.pstats')
+        with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+            f.write(sampler.collapsed())
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump({"name": name, "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
+                       "method": environ.get('REQUEST_METHOD'), "path": path, "status": status,
+                       "duration_ms": round(elapsed * 1000, 2),
+                       "samples": sum(sampler.stacks.values())}, f, ensure_ascii=False)
+        self._prune()
+
+    def _prune(self):
+        for info in list_profiles(self.profile_dir)[self.keep:]:
+            for extension in ('.pstats', '.collapsed', '.json'):
+                try:
+                    os.remove(os.path.join(self.profile_dir, info['name'] + extension))
+                except FileNotFoundError:
+                    pass
+
+
+def list_profiles(profile_dir=PROFILE_DIR, limit=None):
+    """Metadados dos perfis salvos, do mais recente para o mais antigo"""
+    try:
+        names = sorted((f for f in os.listdir(profile_dir) if f.endswith('.json')), reverse=True)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for filename in names[:limit]:
+        try:
+            with open(os.path.join(profile_dir, filename), encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return profiles
+
+def summary(profile_dir, name, limit=40):
+    """Texto com as funções de maior tempo acumulado de um perfil"""
+    import pstats
+    stream = io.StringIO()
+    stats = pstats.Stats(os.path.join(profile_dir, name + '.pstats'), stream=stream)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ferramentas do modo de perfil")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sign = commands.add_parser("sign", help="gera o ?profile= de uma rota (usa PROFILE_SECRET)")
+    sign.add_argument("path", help="caminho da rota, ex.: /mybiblioteca")
+    args = parser.parse_args()
+    if not PROFILE_SECRET:
+        sys.exit("Defina PROFILE_SECRET")
+    print(f"{args.path}?profile={assinar(args.path)}")
@@ -0,0 +1,322 @@
+import bisect
+import heapq
+import itertools
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+
+# Escopos aceitos por /search e as listas que cada um cobre
+SCOPES = {
+    "all": None,
+    "biblioteca": ("movies", "series"),
+    "abertos": ("abertos.movies", "abertos.series"),
+}
+# Fração mínima dos trigramas da busca que o título precisa conter na busca aproximada
+FUZZY_THRESHOLD = 0.5
+# Máximo de candidatos avaliados por consulta
+MAX_CANDIDATES = 2000
+# Intervalo (s) em que a busca confere mutações feitas por outros workers
+SEARCH_SYNC_INTERVAL = float(os.environ.get('SEARCH_SYNC_INTERVAL', '1.0'))
+
+# Aspas e traços tipográficos viram o equivalente ASCII ("Assassin’S" == "assassin's")
+_PONTUACAO = str.maketrans({"’": "'", "‘": "'", "“": '"', "”": '"', "–": "-", "—": "-"})
+_SEPARADORES = re.compile(r"\W+")
+
+
+def normalizar(texto):
+    """Forma canônica para comparação: sem acentos, casefold e espaços simples"""
+    if not texto or not isinstance(texto, str):
+        return ""
+    texto = unicodedata.normalize('NFKD', texto.translate(_PONTUACAO))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.casefold().split())
+
+def _palavras(normalizado):
+    return tuple(p for p in _SEPARADORES.split(normalizado) if p)
+
+def _trigramas(palavras):
+    texto = ' ' + ' '.join(palavras) + ' '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class TitleIndex:
+    """Índice em memória dos títulos de todos os usuários.
+
+    Cada palavra normalizada aponta para o conjunto de ids que a contém, e
+    um vocabulário ordenado permite achar por bisect todas as palavras com
+    um dado prefixo. Um índice invertido de trigramas atende a busca
+    aproximada. É atualizado a cada mutação pelo listener `on_mutation` do
+    storage. `section` segue o padrão do storage: "movies", "series",
+    "abertos.movies" ou "abertos.series".
+
+    O listener só recebe as mutações deste processo e as que o storage
+    JSON sincroniza do journal. Para as de outros workers no SQLite, que
+    não geram notificação, `sync()` compara a soma das versões dos usuários
+    com a das versões que o índice reflete e remonta quem ficou para trás.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Acorda quem espera a primeira montagem do índice
+        self._ready = threading.Condition(self._lock)
+        self._ids = {}          # (username, section, title) -> id
+        self._docs = {}         # id -> (username, section, title, normalizado, palavras, nº de trigramas)
+        self._vocab = []        # palavras distintas, ordenadas
+        self._postings = {}     # palavra -> {ids}
+        self._trigrams = {}     # trigrama -> {ids}
+        self._by_user = {}      # username -> {ids}
+        self._next_id = 0
+        self._built = False
+        self._building = False
+        self._pending = []
+        self._versions = {}     # username -> versão refletida no índice
+        self._version_total = 0
+        self._sync_lock = threading.Lock()
+        self._synced_at = 0.0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _add(self, username, section, title, keep_sorted=True):
+        key = (username, section, title)
+        if key in self._ids:
+            return
+        doc_id = self._next_id
+        self._next_id += 1
+        normalizado = normalizar(title)
+        palavras = _palavras(normalizado)
+        trigramas = _trigramas(palavras)
+        self._ids[key] = doc_id
+        self._docs[doc_id] = (username, section, title, normalizado, palavras, len(trigramas))
+        self._by_user.setdefault(username, set()).add(doc_id)
+        for palavra in set(palavras):
+            ids = self._postings.get(palavra)
+            if ids is None:
+                ids = self._postings[palavra] = set()
+                if keep_sorted:
+                    bisect.insort(self._vocab, palavra)
+            ids.add(doc_id)
+        for trigrama in trigramas:
+            self._trigrams.setdefault(trigrama, set()).add(doc_id)
+
+    def _remove(self, username, section, title):
+        doc_id = self._ids.pop((username, section, title), None)
+        if doc_id is None:
+            return
+        palavras = self._docs.pop(doc_id)[4]
+        self._by_user[username].discard(doc_id)
+        for palavra in set(palavras):
+            ids = self._postings[palavra]
+            ids.discard(doc_id)
+            if not ids:
+                del self._postings[palavra]
+                del self._vocab[bisect.bisect_left(self._vocab, palavra)]
+        for trigrama in _trigramas(palavras):
+            ids = self._trigrams.get(trigrama)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._trigrams[trigrama]
+
+    def _apply(self, op, username, key, title, abertos):
+        if op == "add":
+            self._add(username, f"abertos.{key}" if abertos else key, title)
+        elif op == "remove":
+            self._remove(username, f"abertos.{key}" if abertos else key, title)
+        elif op == "move":
+            self._remove(username, f"abertos.{key}", title)
+            self._add(username, key, title)
+
+    def _advance(self, username, version):
+        """Avança a versão refletida do usuário; com um salto (mutações que
+        não chegaram ao listener) ela fica parada e o sync() remonta o usuário"""
+        if version is not None and version == self._versions.get(username, 0) + 1:
+            self._set_version(username, version)
+
+    def _set_version(self, username, version):
+        self._version_total += version - self._versions.get(username, 0)
+        self._versions[username] = version
+
+    def _replace(self, username, user):
+        """Troca os títulos do usuário no índice pelos de `user` (com o lock)"""
+        if user is None or self._versions.get(username, -1) >= user["version"]:
+            return
+        current = {self._docs[doc_id][1:3] for doc_id in self._by_user.get(username, ())}
+        wanted = {(key, title) for key in ("movies", "series") for title in user[key]}
+        wanted |= {(f"abertos.{key}", title) for key in ("movies", "series") for title in user["abertos"][key]}
+        for section, title in current - wanted:
+            self._remove(username, section, title)
+        for section, title in wanted - current:
+            self._add(username, section, title)
+        self._set_version(username, user["version"])
+
+    def on_mutation(self, op, username, key, title, abertos=False, version=None):
+        """Listener do storage: mantém o índice em dia com cada mutação"""
+        with self._lock:
+            if self._built:
+                self._apply(op, username, key, title, abertos)
+                self._advance(username, version)
+            elif self._building:
+                self._pending.append((op, username, key, title, abertos, version))
+
+    def ensure_built(self, storage):
+        """Monta o índice a partir do storage na primeira busca.
+
+        Quem chega durante a montagem espera ela terminar: buscar num
+        índice parcial responderia sem parte dos resultados.
+        """
+        with self._lock:
+            while self._building:
+                self._ready.wait()
+            if self._built:
+                return
+            self._building = True
+
+        try:
+            # A leitura do storage fica fora do lock (o storage notifica com o
+            # próprio lock travado); mutações nesse meio tempo ficam em _pending
+            users = [(username, storage.get_user(username)) for username in storage.list_users()]
+        except BaseException:
+            # Falhou: libera quem espera para que o próximo tente de novo
+            with self._lock:
+                self._pending = []
+                self._building = False
+                self._ready.notify_all()
+            raise
+
+        with self._lock:
+            for username, user in users:
+                if user is None:
+                    continue
+                self._set_version(username, user["version"])
+                for key in ("movies", "series"):
+                    for title in user[key]:
+                        self._add(username, key, title, keep_sorted=False)
+                    for title in user["abertos"][key]:
+                        self._add(username, f"abertos.{key}", title, keep_sorted=False)
+            self._vocab = sorted(self._postings)
+            for op, username, key, title, abertos, version in self._pending:
+                self._apply(op, username, key, title, abertos)
+                self._advance(username, version)
+            self._pending = []
+            self._built = True
+            self._building = False
+            self._ready.notify_all()
+
+    def sync(self, storage, interval=SEARCH_SYNC_INTERVAL):
+        """Antes de uma busca: traz ao índice as mutações de outros workers.
+
+        Roda no máximo a cada `interval` segundos e numa thread por vez; as
+        outras buscas seguem com o índice atual. No JSON basta o storage
+        aplicar o journal, que notifica on_mutation. No SQLite as versões só
+        crescem, então a soma delas igual à do índice quer dizer que nada
+        ficou para trás; se diferir, os usuários com versão diferente são
+        remontados a partir do storage.
+        """
+        now = time.monotonic()
+        if now - self._synced_at < interval or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = now
+            if storage.refresh() or storage.version_total() == self._version_total:
+                return
+            versions = storage.versions()
+            with self._lock:
+                stale = [username for username, version in versions if self._versions.get(username, 0) != version]
+            # A leitura do storage fica fora do lock, como na montagem
+            for username in stale:
+                user = storage.get_user(username)
+                with self._lock:
+                    self._replace(username, user)
+        finally:
+            self._sync_lock.release()
+
+    def _prefix_words(self, palavra):
+        """Palavras do vocabulário que começam com `palavra`"""
+        start = bisect.bisect_left(self._vocab, palavra)
+        end = bisect.bisect_left(self._vocab, palavra + '\U0010ffff')
+        return self._vocab[start:end]
+
+    def _prefix_matches(self, palavras, username):
+        """Ids cujos títulos têm, para cada palavra da busca, uma palavra com esse prefixo"""
+        candidates = set(self._by_user.get(username, ())) if username is not None else None
+        # Começa pela palavra mais seletiva (menos palavras no vocabulário)
+        expansions = sorted(((p, self._prefix_words(p)) for p in palavras), key=lambda item: len(item[1]))
+        for palavra, words in expansions:
+            if candidates is not None and len(candidates) <= MAX_CANDIDATES:
+                # Poucos candidatos: conferir título a título sai mais barato que unir postings
+                candidates = {doc_id for doc_id in candidates
+                              if any(w.startswith(palavra) for w in self._docs[doc_id][4])}
+            else:
+                union = set().union(*(self._postings[w] for w in words))
+                candidates = union if candidates is None else candidates & union
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, query, username=None, sections=None, limit=20):
+        """Busca por prefixo de palavras e, se faltar resultado, por trigramas.
+
+        Consultas muito abrangentes (ex: uma letra em 100 mil títulos) só
+        ordenam os primeiros MAX_CANDIDATES candidatos, para a latência
+        não crescer com o tamanho do índice.
+        """
+        normalizado = normalizar(query)
+        palavras = _palavras(normalizado)
+        if not palavras:
+            return []
+
+        with self._lock:
+            found = self._prefix_matches(palavras, username)
+            docs = [self._docs[doc_id] for doc_id in itertools.islice(found, MAX_CANDIDATES)]
+            if sections is not None:
+                docs = [doc for doc in docs if doc[1] in sections]
+            ranked = heapq.nsmallest(limit, docs, key=lambda d: (not d[3].startswith(normalizado), len(d[3]), d[3]))
+            results = [self._result(doc, "prefix", 1.0) for doc in ranked]
+
+            # Aproximada: trigramas em comum, para erros de digitação
+            if len(results) < limit and len(normalizado) >= 3:
+                results += self._fuzzy(palavras, username, sections, found, limit - len(results))
+
+        return results
+
+    def _fuzzy(self, palavras, username, sections, exclude, limit):
+        query_trigrams = sorted(_trigramas(palavras), key=lambda t: len(self._trigrams.get(t, ())))
+        postings = [self._trigrams.get(t, set()) for t in query_trigrams]
+        needed = math.ceil(FUZZY_THRESHOLD * len(query_trigrams))
+        # Quem tem `needed` trigramas da busca tem ao menos um dos mais raros
+        seeds = postings[:len(postings) - needed + 1]
+        candidates = set().union(*seeds) - exclude
+        if username is not None:
+            candidates &= self._by_user.get(username, set())
+
+        scored = []
+        for doc_id in itertools.islice(candidates, MAX_CANDIDATES):
+            doc = self._docs[doc_id]
+            if sections is not None and doc[1] not in sections:
+                continue
+            common = sum(1 for ids in postings if doc_id in ids)
+            # Cobertura da busca; desempate pela similaridade com o título todo
+            score = common / len(query_trigrams)
+            if score >= FUZZY_THRESHOLD:
+                similarity = common / (len(query_trigrams) + doc[5] - common)
+                scored.append((score, similarity, doc))
+
+        best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], -item[1], item[2][3]))
+        return [self._result(doc, "fuzzy", round(score, 3)) for score, _, doc in best]
+
+    @staticmethod
+    def _result(doc, match, score):
+        username, section, title = doc[0], doc[1], doc[2]
+        key = section.split('.')[-1]
+        return {
+            "username": username,
+            "title": title,
+            "category": "filme" if key == "movies" else "serie",
+            "lista": "abertos" if section.startswith("abertos.") else "biblioteca",
+            "match": match,
+            "score": score,
+        }
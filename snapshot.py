@@ -0,0 +1,120 @@
+import mmap
+import struct
+
+# Formato do snapshot binário (engine "mmap" do storage):
+#
+#   cabeçalho | blobs dos usuários | nomes | tabela | índice ordenado
+#
+# Cada blob é o JSON compacto (UTF-8) de um usuário, no formato do
+# media_lists.json. A tabela tem uma entrada de tamanho fixo por usuário,
+# na ordem de criação: onde estão o nome e o blob, a versão e quantos
+# títulos ele tem. O índice ordenado guarda as posições da tabela na ordem
+# dos nomes (em bytes), para achar um usuário por busca binária direto no
+# arquivo mapeado, sem montar nenhuma estrutura ao abrir.
+MAGIC = b'BIBSNAP\x00'
+FORMAT_VERSION = 1
+# magic, versão do formato, usuários, total de títulos, início dos nomes, da tabela e do índice
+_HEADER = struct.Struct('<8sIIQQQQ')
+# início do nome, tamanho do nome, início do blob, tamanho do blob, versão, títulos
+_ENTRY = struct.Struct('<QIQIQI')
+_POSITION = struct.Struct('<I')
+
+
+class SnapshotReader:
+    """Leitura de um snapshot binário mapeado em memória.
+
+    Abrir custa o mesmo para qualquer quantidade de usuários: só o
+    cabeçalho é lido, e as páginas do arquivo são carregadas pelo sistema
+    conforme os usuários são acessados (e podem ser descartadas por ele).
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"Snapshot truncado: {path}")
+        magic, version, self.count, self.titles, self._names, self._table, self._sorted = \
+            _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Formato de snapshot desconhecido: {path}")
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, i):
+        return _ENTRY.unpack_from(self._map, self._table + i * _ENTRY.size)
+
+    def _name_bytes(self, i):
+        offset, length = _ENTRY.unpack_from(self._map, self._table + i * _ENTRY.size)[:2]
+        return self._map[offset:offset + length]
+
+    def name(self, i):
+        return self._name_bytes(i).decode('utf-8')
+
+    def names(self):
+        """Nomes dos usuários, na ordem de criação"""
+        return (self.name(i) for i in range(self.count))
+
+    def find(self, username):
+        """Posição do usuário na tabela (busca binária no índice), ou None"""
+        if not isinstance(username, str):
+            return None
+        target = username.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            i = _POSITION.unpack_from(self._map, self._sorted + mid * _POSITION.size)[0]
+            name = self._name_bytes(i)
+            if name == target:
+                return i
+            if name < target:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def version(self, i):
+        return self._entry(i)[4]
+
+    def title_count(self, i):
+        return self._entry(i)[5]
+
+    def blob(self, i):
+        """JSON (bytes) do usuário na posição `i`"""
+        _, _, offset, length, _, _ = self._entry(i)
+        return self._map[offset:offset + length]
+
+
+def write_snapshot(f, users):
+    """Grava em `f` (binário, com seek) o snapshot de `users`, que produz
+    (nome, versão, títulos, blob JSON) na ordem de criação; retorna o total
+    de títulos.
+
+    Os blobs vão direto para o arquivo; só a tabela (tamanho fixo por
+    usuário) e os nomes ficam em memória até o fim.
+    """
+    f.write(bytes(_HEADER.size))
+    entries, names = [], []
+    offset, titles = _HEADER.size, 0
+    for username, version, count, blob in users:
+        f.write(blob)
+        entries.append([0, 0, offset, len(blob), version, count])
+        names.append(username.encode('utf-8'))
+        offset += len(blob)
+        titles += count
+
+    names_offset = offset
+    for entry, name in zip(entries, names):
+        entry[0], entry[1] = offset, len(name)
+        offset += len(name)
+    f.write(b''.join(names))
+    table_offset = offset
+    f.write(b''.join(_ENTRY.pack(*entry) for entry in entries))
+    sorted_offset = table_offset + len(entries) * _ENTRY.size
+    order = sorted(range(len(names)), key=names.__getitem__)
+    f.write(b''.join(_POSITION.pack(i) for i in order))
+
+    f.seek(0)
+    f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), titles, names_offset, table_offset, sorted_offset))
+    f.seek(0, 2)
+    return titles
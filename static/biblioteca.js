@@ -0,0 +1,118 @@
+// Página da biblioteca: seções sob demanda, adicionar e deletar títulos
+// Dados da página vêm dos atributos data-* da própria tag <script>
+const config = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function () {
+    function showToast(message, isError = false) {
+        const toast = document.getElementById("toast");
+        toast.textContent = message;
+        toast.className = "toast" + (isError ? " error" : "");
+        toast.classList.add("show");
+        setTimeout(() => {
+            toast.classList.remove("show");
+        }, 3000);
+    }
+
+    function toggleSection(sectionId) {
+        const section = document.getElementById(sectionId);
+        if (!section) return;
+        if (section.style.display === "none" || section.style.display === "") {
+            section.style.display = "grid";
+        } else {
+            section.style.display = "none";
+        }
+        if (lazySections[sectionId]) {
+            lazySections[sectionId].setVisible(section.style.display === "grid");
+        }
+    }
+
+    document.querySelectorAll('.toggle').forEach(function (toggle) {
+        toggle.addEventListener('click', function () {
+            toggleSection(this.getAttribute('data-target'));
+        });
+    });
+
+    function renderCard(title, category) {
+        const card = document.createElement('div');
+        card.className = 'card';
+
+        const span = document.createElement('span');
+        span.textContent = title;
+        card.appendChild(span);
+
+        const delBtn = document.createElement('button');
+        delBtn.textContent = 'Deletar';
+        delBtn.className = 'delete delete-button';
+        delBtn.setAttribute('data-title', title);
+        delBtn.setAttribute('data-category', category);
+        card.appendChild(delBtn);
+
+        attachDeleteEvent(delBtn);
+        return card;
+    }
+
+    const lazySections = {
+        movies: createLazySection({ containerId: 'movies', category: 'filme', username: config.username,
+                                    pageSize: Number(config.pageSize), renderCard: renderCard }),
+        series: createLazySection({ containerId: 'series', category: 'serie', username: config.username,
+                                    pageSize: Number(config.pageSize), renderCard: renderCard })
+    };
+
+    function attachDeleteEvent(button) {
+        button.addEventListener('click', function () {
+            const title = this.getAttribute('data-title');
+            const category = this.getAttribute('data-category');
+
+            fetch('/delete', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    username: config.username,
+                    title: title,
+                    category: category
+                })
+            })
+            .then(res => res.json())
+            .then(data => {
+                if (data.success) {
+                    this.closest('.card').remove();
+                    lazySections[category === 'filme' ? 'movies' : 'series'].removed();
+                    showToast(`${title} foi deletado da sua lista de ${category === 'filme' ? 'filmes' : 'séries'}`);
+                } else {
+                    showToast('Erro ao deletar item.', true);
+                }
+            });
+        });
+    }
+
+    document.getElementById('addForm').addEventListener('submit', function (event) {
+        event.preventDefault();
+        const formData = new FormData(this);
+        const title = formData.get("title");
+        const category = formData.get("category");
+
+        fetch('/add', {
+            method: 'POST',
+            body: formData
+        })
+        .then(res => res.json())
+        .then(data => {
+            if (data.success) {
+                // Se a seção ainda não chegou ao fim, o título aparece na última página
+                const sectionId = category === 'filme' ? 'movies' : 'series';
+                lazySections[sectionId].added(renderCard(title, category));
+
+                showToast(`${title} foi adicionado como ${category === 'filme' ? 'filme' : 'série'}`);
+                this.reset();
+            } else {
+                showToast('Erro ao adicionar item.', true);
+            }
+        })
+        .catch(err => {
+            console.error(err);
+            showToast('Erro inesperado.', true);
+        });
+    });
+});
@@ -0,0 +1,220 @@
+// Página Em Aberto: adicionar, deletar e mover títulos, com as mudanças
+// de outras abas chegando por /em_aberto/stream
+// Dados da página vêm dos atributos data-* da própria tag <script>
+const config = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function () {
+    function showToast(message, isError = false) {
+        const toast = document.getElementById("toast");
+        toast.textContent = message;
+        toast.className = "toast" + (isError ? " error" : "");
+        toast.classList.add("show");
+        setTimeout(() => {
+            toast.classList.remove("show");
+        }, 3000);
+    }
+
+    document.querySelectorAll('.toggle').forEach(function (toggle) {
+        toggle.addEventListener('click', function () {
+            const target = document.getElementById(this.getAttribute('data-target'));
+            target.style.display = (target.style.display === "none" || target.style.display === "") ? "grid" : "none";
+        });
+    });
+
+    // Adicionar item via AJAX
+    document.getElementById('addAbertoForm').addEventListener('submit', function (event) {
+        event.preventDefault();
+        const formData = new FormData(this);
+        const title = formData.get("title");
+        const category = formData.get("category");
+
+        fetch('/add_aberto_ajax', {
+            method: 'POST',
+            body: formData
+        })
+        .then(res => res.json())
+        .then(data => {
+            if (data.success) {
+                addCard(title, category);
+                showToast(`${title} foi adicionado como ${category === 'filme' ? 'filme' : 'série'} em aberto`);
+                this.reset();
+            } else {
+                showToast('Erro ao adicionar item.', true);
+            }
+        })
+        .catch(err => {
+            console.error(err);
+            showToast('Erro inesperado.', true);
+        });
+    });
+
+    function containerFor(category) {
+        return document.getElementById(category === 'filme' ? 'abertos_filmes' : 'abertos_series');
+    }
+
+    function findCard(title, category) {
+        const buttons = containerFor(category).querySelectorAll('.delete-aberto-btn');
+        for (const btn of buttons) {
+            if (btn.getAttribute('data-title') === title) {
+                return btn.closest('.card');
+            }
+        }
+        return null;
+    }
+
+    // Cria o card se ainda não existir (o próprio add chega de novo pelo stream)
+    function addCard(title, category) {
+        if (findCard(title, category)) {
+            return;
+        }
+        const card = document.createElement('div');
+        card.className = 'card';
+
+        const span = document.createElement('span');
+        span.textContent = title;
+        card.appendChild(span);
+
+        const delBtn = document.createElement('button');
+        delBtn.textContent = '🗑 Deletar';
+        delBtn.className = 'delete-button delete-aberto-btn';
+        delBtn.setAttribute('data-title', title);
+        delBtn.setAttribute('data-category', category);
+        delBtn.style.marginTop = '10px';
+        card.appendChild(delBtn);
+
+        const moveBtn = document.createElement('button');
+        moveBtn.textContent = '📥 Mover para Biblioteca';
+        moveBtn.className = 'add-button mover-biblioteca-btn';
+        moveBtn.setAttribute('data-title', title);
+        moveBtn.setAttribute('data-category', category);
+        card.appendChild(moveBtn);
+
+        containerFor(category).appendChild(card);
+        attachEvents(delBtn, moveBtn);
+    }
+
+    function removeCard(title, category) {
+        const card = findCard(title, category);
+        if (card) {
+            card.remove();
+        }
+    }
+
+    function attachEvents(delBtn, moveBtn) {
+        delBtn.addEventListener('click', function () {
+            const title = this.getAttribute('data-title');
+            const category = this.getAttribute('data-category');
+
+            fetch('/delete_aberto_ajax', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    username: config.username,
+                    title: title,
+                    category: category
+                })
+            })
+            .then(res => res.json())
+            .then(data => {
+                if (data.success) {
+                    this.closest('.card').remove();
+                    showToast(`${title} foi removido dos em aberto`);
+                } else {
+                    showToast('Erro ao deletar item.', true);
+                }
+            });
+        });
+
+        moveBtn.addEventListener('click', function () {
+            const title = this.getAttribute('data-title');
+            const category = this.getAttribute('data-category');
+
+            fetch('/mover_para_biblioteca_ajax', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    username: config.username,
+                    title: title,
+                    category: category
+                })
+            })
+            .then(res => res.json())
+            .then(data => {
+                if (data.success) {
+                    this.closest('.card').remove();
+                    showToast(`${title} foi movido para a biblioteca`);
+                } else {
+                    showToast('Erro ao mover item.', true);
+                }
+            });
+        });
+    }
+
+    // Anexar eventos aos botões existentes
+    document.querySelectorAll('.delete-aberto-btn').forEach(btn => {
+        const moveBtn = btn.nextElementSibling;
+        attachEvents(btn, moveBtn);
+    });
+
+    // Mudanças feitas em outras abas e aparelhos chegam pelo stream (SSE)
+    const username = config.username;
+    let version = Number(config.version);
+
+    function applyDelta(delta) {
+        if (delta.op === 'add' && delta.lista === 'abertos') {
+            addCard(delta.title, delta.category);
+        } else if (delta.op === 'move' || (delta.op === 'remove' && delta.lista === 'abertos')) {
+            removeCard(delta.title, delta.category);
+        }
+    }
+
+    // Recarrega as listas inteiras (histórico do servidor não cobre a diferença)
+    function resync() {
+        fetch('/sync_em_aberto?username=' + encodeURIComponent(username))
+        .then(res => res.ok ? res.json() : null)
+        .then(data => {
+            if (!data || !data.success) {
+                return;
+            }
+            [['filme', data.movies], ['serie', data.series]].forEach(([category, titles]) => {
+                const keep = new Set(titles);
+                containerFor(category).querySelectorAll('.delete-aberto-btn').forEach(btn => {
+                    if (!keep.has(btn.getAttribute('data-title'))) {
+                        btn.closest('.card').remove();
+                    }
+                });
+                titles.forEach(title => addCard(title, category));
+            });
+        })
+        .catch(err => console.error(err));
+    }
+
+    if (window.EventSource) {
+        const source = new EventSource('/em_aberto/stream?username=' + encodeURIComponent(username) + '&since=' + version);
+        source.addEventListener('delta', function (event) {
+            const delta = JSON.parse(event.data);
+            version = delta.version;
+            applyDelta(delta);
+        });
+        source.addEventListener('reset', function (event) {
+            version = JSON.parse(event.data).version;
+            resync();
+        });
+        source.onerror = function () {
+            // Recusado pelo servidor (limite de conexões): volta ao polling, barato com ETag
+            if (source.readyState === EventSource.CLOSED) {
+                setInterval(resync, 30000);
+            }
+        };
+    }
+
+    // Inicia fechado no mobile
+    if (window.innerWidth <= 600) {
+        document.getElementById('abertos_filmes').style.display = "none";
+        document.getElementById('abertos_series').style.display = "none";
+    }
+});
@@ -0,0 +1,62 @@
+// Seções da biblioteca carregadas sob demanda, uma página por vez,
+// a partir de /api/biblioteca
+function createLazySection(options) {
+    const container = document.getElementById(options.containerId);
+    const moreButton = document.querySelector(`.load-more[data-target="${options.containerId}"]`);
+    const state = { offset: 0, loaded: false, done: false, loading: false, visible: false };
+
+    function updateButton() {
+        moreButton.style.display = state.visible && state.loaded && !state.done ? 'block' : 'none';
+    }
+
+    function loadMore() {
+        if (state.done || state.loading) return;
+        state.loading = true;
+
+        const params = new URLSearchParams({
+            username: options.username,
+            category: options.category,
+            offset: state.offset,
+            limit: options.pageSize
+        });
+
+        fetch('/api/biblioteca?' + params)
+        .then(res => res.json())
+        .then(data => {
+            if (!data.success) return;
+            data.titles.forEach(title => container.appendChild(options.renderCard(title, options.category)));
+            state.offset += data.titles.length;
+            state.done = data.next_offset === null;
+            updateButton();
+        })
+        .catch(err => console.error(err))
+        .finally(() => {
+            state.loading = false;
+        });
+    }
+
+    moreButton.addEventListener('click', loadMore);
+
+    return {
+        // Primeira página só quando a seção é aberta
+        setVisible(visible) {
+            state.visible = visible;
+            if (visible && !state.loaded) {
+                state.loaded = true;
+                loadMore();
+            }
+            updateButton();
+        },
+        // Um card já carregado foi removido: as próximas páginas começam uma posição antes
+        removed() {
+            state.offset = Math.max(state.offset - 1, 0);
+        },
+        // Título novo vai para o fim da lista: só mostra se o fim já foi carregado
+        added(card) {
+            if (!state.done) return false;
+            container.appendChild(card);
+            state.offset += 1;
+            return true;
+        }
+    };
+}
@@ -0,0 +1,38 @@
+// Biblioteca de outro usuário, só leitura, com seções sob demanda
+// Dados da página vêm dos atributos data-* da própria tag <script>
+const config = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function () {
+    function renderCard(title) {
+        const card = document.createElement('div');
+        card.className = 'card';
+
+        const span = document.createElement('span');
+        span.textContent = title;
+        card.appendChild(span);
+        return card;
+    }
+
+    const lazySections = {
+        other_movies: createLazySection({ containerId: 'other_movies', category: 'filme', username: config.username,
+                                          pageSize: Number(config.pageSize), renderCard: renderCard }),
+        other_series: createLazySection({ containerId: 'other_series', category: 'serie', username: config.username,
+                                          pageSize: Number(config.pageSize), renderCard: renderCard })
+    };
+
+    function toggleSection(sectionId) {
+        const section = document.getElementById(sectionId);
+        if (section.style.display === "none" || section.style.display === "") {
+            section.style.display = "grid";
+        } else {
+            section.style.display = "none";
+        }
+        lazySections[sectionId].setVisible(section.style.display === "grid");
+    }
+
+    document.querySelectorAll('.toggle').forEach(function (toggle) {
+        toggle.addEventListener('click', function () {
+            toggleSection(this.getAttribute('data-target'));
+        });
+    });
+});
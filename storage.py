@@ -0,0 +1,1274 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from locks import file_lock
+from metrics import SIZE_BUCKETS, histogram
+from snapshot import SnapshotReader, write_snapshot
+
+# Engine de persistência: 'json' (snapshot + journal), 'mmap' (snapshot
+# binário mapeado em memória + journal) ou 'sqlite'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+# Engine mmap: o snapshot fica ao lado do media_lists.json, com esta extensão,
+# e no máximo USER_CACHE_SIZE usuários lidos (e não alterados) ficam decodificados
+MMAP_SNAPSHOT_SUFFIX = '.bin'
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '1000'))
+SQLITE_DB_FILE = os.environ.get('SQLITE_DB_FILE', 'biblioteca.db')
+# Quantidade de mutações no journal antes de compactar o snapshot
+COMPACT_THRESHOLD = int(os.environ.get('JOURNAL_COMPACT_THRESHOLD', '500'))
+# Durabilidade das mutações. Em todos os modos a linha já está no journal
+# quando a requisição responde (sobrevive à queda do processo); o modo só
+# decide quando ela é sincronizada no disco (fsync, para quedas do sistema):
+#   immediate: fsync antes de responder cada mutação
+#   grouped:   a mutação espera o fsync, mas as concorrentes dividem o mesmo
+#   interval:  responde na hora; uma thread faz o fsync a cada FLUSH_INTERVAL
+#              segundos ou após FLUSH_SIZE mutações
+DURABILITY_MODES = ('immediate', 'grouped', 'interval')
+DURABILITY = os.environ.get('STORAGE_DURABILITY', 'interval')
+FLUSH_INTERVAL = float(os.environ.get('STORAGE_FLUSH_INTERVAL', '1.0'))
+FLUSH_SIZE = int(os.environ.get('STORAGE_FLUSH_SIZE', '100'))
+
+# Métricas das gravações (/metrics); `op`: journal_append, fsync, compact ou transaction
+WRITE_SECONDS = histogram('biblioteca_storage_write_seconds', 'Tempo de cada gravação do storage',
+                          ('backend', 'op'))
+WRITE_BYTES = histogram('biblioteca_storage_write_bytes', 'Bytes gravados por escrita do storage JSON',
+                        ('op',), SIZE_BUCKETS)
+
+
+def validar_titulo(titulo):
+    """Valida se o título é válido"""
+    if not titulo or not isinstance(titulo, str):
+        return False
+    titulo_limpo = titulo.strip()
+    if len(titulo_limpo) < 1 or len(titulo_limpo) > 200:
+        return False
+    return True
+
+def validar_categoria(categoria):
+    """Valida se a categoria é válida"""
+    return categoria in ["filme", "serie"]
+
+# Uma linha do journal: JSON compacto (o encoder é reaproveitado entre as mutações)
+_JOURNAL_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+# Em memória, cada lista é um dict com valores None: um conjunto que mantém a
+# ordem de inserção, com busca, inserção e remoção em O(1). No JSON salvo as
+# listas continuam sendo arrays na mesma ordem. "version" cresce a cada
+# mutação do usuário e é a base dos ETags das páginas.
+
+def novo_usuario():
+    """Estrutura inicial das listas de um usuário"""
+    return {
+        "movies": {},
+        "series": {},
+        "abertos": {"movies": {}, "series": {}},
+        "version": 0
+    }
+
+def indexar_usuario(user):
+    """Converte as listas de um usuário do formato JSON para conjuntos ordenados"""
+    abertos = user.get("abertos", {})
+    return {
+        "movies": dict.fromkeys(user.get("movies", [])),
+        "series": dict.fromkeys(user.get("series", [])),
+        "abertos": {
+            "movies": dict.fromkeys(abertos.get("movies", [])),
+            "series": dict.fromkeys(abertos.get("series", []))
+        },
+        "version": user.get("version", 0)
+    }
+
+def serializar_usuario(user):
+    """Converte os conjuntos ordenados de um usuário de volta para listas"""
+    return {
+        "movies": list(user["movies"]),
+        "series": list(user["series"]),
+        "abertos": {
+            "movies": list(user["abertos"]["movies"]),
+            "series": list(user["abertos"]["series"])
+        },
+        "version": user.get("version", 0)
+    }
+
+def contar_titulos(user):
+    """Total de títulos nas quatro listas de um usuário (conjuntos ou listas)"""
+    return (len(user["movies"]) + len(user["series"])
+            + len(user["abertos"]["movies"]) + len(user["abertos"]["series"]))
+
+def _obter_lista(data, username, path):
+    """Retorna o conjunto indicado por path (ex: ['abertos', 'movies'])"""
+    node = data.setdefault(username, novo_usuario())
+    for part in path[:-1]:
+        node = node.setdefault(part, {})
+    return node.setdefault(path[-1], {})
+
+def apply_record(data, record):
+    """Aplica uma mutação do journal sobre os dados.
+
+    As operações são idempotentes (adicionar o que já existe ou remover o
+    que não existe não faz nada), então reaplicar um trecho do journal que
+    já está no snapshot não altera o resultado. A versão do usuário vai
+    para o "v" gravado no registro (ou +1 em journals antigos, sem "v").
+    """
+    op = record.get("op")
+    username = record.get("user")
+
+    if op == "init_user":
+        data.setdefault(username, novo_usuario())
+        return
+    if op == "add":
+        _obter_lista(data, username, record["path"]).setdefault(record["title"])
+    elif op == "remove":
+        _obter_lista(data, username, record["path"]).pop(record["title"], None)
+    elif op == "move":
+        key = record["key"]
+        _obter_lista(data, username, [key]).setdefault(record["title"])
+        _obter_lista(data, username, ["abertos", key]).pop(record["title"], None)
+    else:
+        return
+
+    user = data[username]
+    user["version"] = max(user.get("version", 0), record.get("v", user.get("version", 0) + 1))
+
+def _blob_entry(username, user):
+    """Entrada de write_snapshot para um usuário em memória"""
+    blob = _JOURNAL_ENCODER.encode(serializar_usuario(user)).encode('utf-8')
+    return username, user.get("version", 0), contar_titulos(user), blob
+
+
+class JournalStore:
+    """Snapshot JSON + journal append-only de mutações, compartilhado entre processos.
+
+    Cada mutação grava uma linha JSON pequena no journal, com custo constante
+    independente do tamanho da biblioteca. Leituras e escritas do arquivo
+    acontecem com `locked()` (trava de thread + trava de arquivo), então
+    vários workers podem usar os mesmos arquivos: antes de gravar, cada
+    processo lê com `read_new()` o que os outros gravaram desde a sua
+    última leitura. A compactação também roda com a trava e troca o
+    snapshot de forma atômica (arquivo temporário + rename); quem percebe
+    que o snapshot mudou precisa recarregar tudo com `load()`.
+
+    Cada `append()` devolve um número de sequência; `commit()` com esse
+    número espera o fsync conforme `durability` (ver DURABILITY_MODES).
+
+    `load()` retorna os usuários já convertidos por `indexar_usuario`.
+    """
+
+    def __init__(self, snapshot_file, journal_file=None, compact_threshold=COMPACT_THRESHOLD,
+                 durability=DURABILITY, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Modo de durabilidade desconhecido: {durability}")
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file or snapshot_file + '.journal'
+        self.compact_threshold = compact_threshold
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.pending = 0
+        # Títulos no último snapshot: o journal pode crescer até metade disso
+        self.snapshot_size = 0
+        # Mutações gravadas por este processo e quantas já passaram por fsync
+        self._seq = 0
+        self._synced_seq = 0
+        self._commit_lock = threading.Lock()
+        self._flush_cond = threading.Condition()
+        self._flusher = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._journal = None
+        # Identificação (dispositivo, inode) dos arquivos que este processo já leu
+        self._snapshot_id = None
+        self._journal_id = None
+        self._offset = 0
+
+    @property
+    def _rotated_file(self):
+        return self.journal_file + '.old'
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None, 0
+        return (st.st_dev, st.st_ino), st.st_size
+
+    @contextmanager
+    def locked(self):
+        """Trava exclusiva entre threads e processos"""
+        with self._lock, file_lock(self.snapshot_file):
+            yield
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def load(self):
+        """Lê o snapshot e reaplica o journal, inclusive um rotacionado e não
+        compactado (chamar com locked())"""
+        self._close_journal()
+        self._snapshot_id = self._stat(self.snapshot_file)[0]
+        data = self._read_snapshot()
+
+        rotated, _, _ = self._read_from(self._rotated_file)
+        self._journal_id, self._offset = self._stat(self.journal_file)[0], 0
+        records = rotated + self._read_tail()
+        for record in records:
+            self.apply(data, record)
+        self.pending = len(records)
+        return data
+
+    def _read_snapshot(self):
+        """Usuários do snapshot; também atualiza `snapshot_size`"""
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            data = {username: indexar_usuario(user) for username, user in snapshot.items()}
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        self.snapshot_size = sum(contar_titulos(user) for user in data.values())
+        return data
+
+    def apply(self, data, record):
+        """Aplica uma mutação sobre os dados retornados por load()"""
+        apply_record(data, record)
+
+    @staticmethod
+    def _read_from(path, offset=0):
+        """Registros das linhas completas de `path` a partir de `offset`.
+
+        Retorna (registros, posição logo após a última linha completa,
+        tamanho do arquivo).
+        """
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return [], offset, offset
+        end = chunk.rfind(b'\n') + 1
+        records = []
+        for line in chunk[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return records, offset + end, offset + len(chunk)
+
+    def _read_tail(self):
+        records, end, size = self._read_from(self.journal_file, self._offset)
+        if size > end:
+            # Linha incompleta de um processo que morreu no meio da escrita:
+            # como temos a trava, ninguém mais está escrevendo
+            os.truncate(self.journal_file, end)
+        self._offset = end
+        return records
+
+    def should_compact(self):
+        """Compacta quando o journal passa de `compact_threshold` e de metade
+        do snapshot, para o custo de reescrever o snapshot ficar amortizado
+        mesmo em importações grandes"""
+        return self.pending >= max(self.compact_threshold, self.snapshot_size // 2)
+
+    def changed(self):
+        """Verificação barata, sem trava, se outro processo mexeu no journal"""
+        journal_id, size = self._stat(self.journal_file)
+        return journal_id != self._journal_id or size != self._offset
+
+    def read_new(self):
+        """Mutações gravadas por outros processos desde a última leitura
+        (chamar com locked()).
+
+        Retorna None se outro processo compactou os dados e o estado
+        precisa ser recarregado com `load()`.
+        """
+        if self._stat(self.snapshot_file)[0] != self._snapshot_id:
+            return None
+        journal_id, size = self._stat(self.journal_file)
+        if journal_id != self._journal_id:
+            if self._journal_id is not None:
+                return None
+            # Journal criado por outro processo depois do nosso load()
+            self._journal_id, self._offset = journal_id, 0
+        if size == self._offset:
+            return []
+        records = self._read_tail()
+        self.pending += len(records)
+        return records
+
+    def append(self, records):
+        """Grava mutações já aplicadas nos dados, num único write (chamar com
+        locked(), depois de read_new()); retorna o número de sequência para
+        `commit()`"""
+        payload = ''.join(_JOURNAL_ENCODER.encode(record) + '\n' for record in records).encode('utf-8')
+        with WRITE_SECONDS.time(backend='json', op='journal_append'):
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'ab')
+                self._journal_id = self._stat(self.journal_file)[0]
+            self._journal.write(payload)
+            self._journal.flush()
+        WRITE_BYTES.observe(len(payload), op='journal_append')
+        self._offset = self._journal.tell()
+        self.pending += len(records)
+        self._seq += 1
+        return self._seq
+
+    def _fsync(self):
+        """fsync do journal; retorna até qual sequência ficou durável"""
+        with self._lock:
+            target = self._seq
+            if self._journal is None:
+                # Nada gravado desde o load() ou a última compactação (que já fez fsync)
+                return target
+            fd = os.dup(self._journal.fileno())
+        try:
+            with WRITE_SECONDS.time(backend='json', op='fsync'):
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        return target
+
+    def commit(self, seq):
+        """Espera a mutação `seq` ficar durável, conforme o modo de durabilidade"""
+        if seq is None:
+            return
+        if self.durability == 'interval':
+            if seq - self._synced_seq >= self.flush_size:
+                with self._flush_cond:
+                    self._flush_cond.notify()
+            return
+        with self._commit_lock:
+            # grouped: quem esperou enquanto outro fazia fsync normalmente já está coberto
+            if self.durability == 'grouped' and self._synced_seq >= seq:
+                return
+            self._synced_seq = max(self._synced_seq, self._fsync())
+
+    def flush(self):
+        """fsync das mutações ainda não duráveis"""
+        with self._commit_lock:
+            if self._synced_seq < self._seq:
+                self._synced_seq = max(self._synced_seq, self._fsync())
+
+    def start(self):
+        """Inicia a thread de fsync periódico (só no modo interval)"""
+        if self.durability == 'interval' and self._flusher is None:
+            self._flusher = threading.Thread(target=self._run, name='journal-flusher', daemon=True)
+            self._flusher.start()
+        return self
+
+    def _run(self):
+        while True:
+            with self._flush_cond:
+                if not self._stopped:
+                    self._flush_cond.wait(self.flush_interval)
+                stopped = self._stopped
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao sincronizar dados: {e}")
+            if stopped:
+                return
+
+    def stop(self):
+        """Para a thread de fsync e sincroniza o que estiver pendente"""
+        with self._flush_cond:
+            self._stopped = True
+            self._flush_cond.notify()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+            self._flusher = None
+        self.flush()
+
+    def compact(self, snapshot):
+        """Grava `snapshot` (usuários já serializados, ou as entradas de
+        write_snapshot no formato binário) e descarta o journal (chamar com
+        locked(), depois de read_new())"""
+        start = time.perf_counter()
+        # Rotaciona o journal: se a gravação falhar, o .old é reaplicado no load()
+        self._close_journal()
+        if os.path.exists(self.journal_file):
+            if os.path.exists(self._rotated_file):
+                # Compactação anterior falhou: preserva as duas partes
+                with open(self._rotated_file, 'ab') as dst, open(self.journal_file, 'rb') as src:
+                    dst.write(src.read())
+                os.remove(self.journal_file)
+            else:
+                os.replace(self.journal_file, self._rotated_file)
+        self._journal_id, self._offset = None, 0
+        size = self._save_snapshot(snapshot)
+
+        if os.path.exists(self._rotated_file):
+            os.remove(self._rotated_file)
+        self.pending = 0
+        self._synced_seq = self._seq
+        WRITE_SECONDS.observe(time.perf_counter() - start, backend='json', op='compact')
+        WRITE_BYTES.observe(size, op='compact')
+
+    def _save_snapshot(self, snapshot):
+        """Grava o snapshot num temporário e troca o arquivo de forma atômica;
+        retorna o tamanho gravado"""
+        tmp_file = self.snapshot_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            self.snapshot_size = self._write_snapshot(f, snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp_file, self.snapshot_file)
+        self._snapshot_id = self._stat(self.snapshot_file)[0]
+        return size
+
+    def _write_snapshot(self, f, snapshot):
+        """Serializa `snapshot` em `f` (binário); retorna o total de títulos"""
+        f.write(json.dumps(snapshot, ensure_ascii=False, indent=4).encode('utf-8'))
+        return sum(contar_titulos(user) for user in snapshot.values())
+
+
+class LazyUsers:
+    """Usuários de um snapshot binário, decodificados sob demanda.
+
+    Faz o papel do dict de usuários da JsonStorage (`in`, `get`, `[]`,
+    `setdefault`, `keys()`, `len()`), mas só decodifica um usuário quando
+    ele é acessado. Os lidos ficam num LRU de até `capacity` usuários; os
+    alterados desde o snapshot ficam fixos em memória (`pin`) até a próxima
+    compactação, porque a mutação só existe neles e no journal. Versões e
+    nomes saem direto da tabela do snapshot, sem decodificar ninguém.
+    """
+
+    def __init__(self, reader, capacity=USER_CACHE_SIZE):
+        self.reader = reader
+        self.capacity = capacity
+        self._resident = OrderedDict()
+        self._pinned = {}
+        # Usuários que não estão no snapshot, na ordem de criação
+        self._created = []
+        self._lock = threading.Lock()
+
+    def _cached(self, username):
+        """Usuário já decodificado, ou None (chamar com _lock)"""
+        user = self._pinned.get(username)
+        if user is None:
+            user = self._resident.get(username)
+            if user is not None:
+                self._resident.move_to_end(username)
+        return user
+
+    def _lookup(self, username):
+        # Nome ausente na requisição (None) ou de outro tipo: como no dict, não existe
+        if not isinstance(username, str):
+            return None
+        while True:
+            with self._lock:
+                user = self._cached(username)
+                reader = self.reader
+            if user is not None or reader is None:
+                return user
+            i = reader.find(username)
+            if i is None:
+                return None
+            user = indexar_usuario(json.loads(reader.blob(i)))
+            with self._lock:
+                # Outra thread pode ter decodificado o usuário enquanto isso, e
+                # depois de uma compactação o snapshot lido pode estar velho
+                current = self._cached(username)
+                if current is not None:
+                    return current
+                if reader is self.reader:
+                    self._resident[username] = user
+                    while len(self._resident) > self.capacity:
+                        self._resident.popitem(last=False)
+                    return user
+
+    def __contains__(self, username):
+        if not isinstance(username, str):
+            return False
+        with self._lock:
+            if username in self._pinned or username in self._resident:
+                return True
+            reader = self.reader
+        return reader is not None and reader.find(username) is not None
+
+    def get(self, username, default=None):
+        user = self._lookup(username)
+        return default if user is None else user
+
+    def __getitem__(self, username):
+        user = self._lookup(username)
+        if user is None:
+            raise KeyError(username)
+        return user
+
+    def setdefault(self, username, default=None):
+        user = self._lookup(username)
+        if user is None:
+            with self._lock:
+                if username not in self._pinned:
+                    self._pinned[username] = default
+                    self._created.append(username)
+                user = self._pinned[username]
+        return user
+
+    def pin(self, username):
+        """Fixa o usuário em memória até a próxima compactação (antes de alterá-lo)"""
+        while True:
+            user = self._lookup(username)
+            if user is None:
+                return
+            with self._lock:
+                if username in self._pinned:
+                    return
+                # Se outra thread o tirou do LRU nesse meio tempo, decodifica de novo
+                if self._resident.get(username) is user:
+                    self._pinned[username] = self._resident.pop(username)
+                    return
+
+    def version(self, username):
+        """Versão do usuário, ou None"""
+        if not isinstance(username, str):
+            return None
+        with self._lock:
+            user = self._pinned.get(username) or self._resident.get(username)
+            reader = self.reader
+        if user is not None:
+            return user["version"]
+        i = None if reader is None else reader.find(username)
+        return None if i is None else reader.version(i)
+
+    def versions(self):
+        """(nome, versão) de todos os usuários, na ordem de criação, sem decodificar"""
+        with self._lock:
+            live = {username: user["version"]
+                    for username, user in itertools.chain(self._resident.items(), self._pinned.items())}
+            reader, created = self.reader, list(self._created)
+        for i in range(len(reader) if reader is not None else 0):
+            username = reader.name(i)
+            yield username, live.get(username, reader.version(i))
+        for username in created:
+            yield username, live[username]
+
+    def keys(self):
+        with self._lock:
+            reader, created = self.reader, list(self._created)
+        if reader is not None:
+            yield from reader.names()
+        yield from created
+
+    __iter__ = keys
+
+    def __len__(self):
+        return (len(self.reader) if self.reader is not None else 0) + len(self._created)
+
+    def entries(self):
+        """Entradas de write_snapshot para todos os usuários. Os que não estão
+        em memória têm o blob copiado do snapshot atual, sem decodificar"""
+        reader = self.reader
+        for i in range(len(reader) if reader is not None else 0):
+            username = reader.name(i)
+            with self._lock:
+                user = self._pinned.get(username) or self._resident.get(username)
+            if user is not None:
+                yield _blob_entry(username, user)
+            else:
+                yield username, reader.version(i), reader.title_count(i), reader.blob(i)
+        for username in list(self._created):
+            yield _blob_entry(username, self._pinned[username])
+
+    def rebase(self, reader):
+        """Passa a ler do snapshot recém-gravado, que já contém os usuários fixados"""
+        with self._lock:
+            self.reader = reader
+            self._resident.update(self._pinned)
+            self._pinned, self._created = {}, []
+            while len(self._resident) > self.capacity:
+                self._resident.popitem(last=False)
+
+
+class BinaryJournalStore(JournalStore):
+    """JournalStore com o snapshot binário de snapshot.py.
+
+    `load()` retorna um LazyUsers: abrir o snapshot só mapeia o arquivo,
+    e o journal reaplicado fixa em memória os usuários que alterou. Se o
+    snapshot ainda não existe, é criado a partir de `legacy_file` (o
+    media_lists.json da engine json, com o journal dele).
+    """
+
+    def __init__(self, snapshot_file, legacy_file=None, cache_size=USER_CACHE_SIZE, **options):
+        super().__init__(snapshot_file, **options)
+        self.legacy_file = legacy_file
+        self.cache_size = cache_size
+
+    def _read_snapshot(self):
+        if (self.legacy_file and os.path.exists(self.legacy_file)
+                and not os.path.exists(self.snapshot_file) and not os.path.exists(self.journal_file)):
+            self._import_legacy()
+        try:
+            reader = SnapshotReader(self.snapshot_file)
+        except (FileNotFoundError, ValueError):
+            reader = None
+        self.snapshot_size = reader.titles if reader is not None else 0
+        return LazyUsers(reader, self.cache_size)
+
+    def _import_legacy(self):
+        legacy = JournalStore(self.legacy_file)
+        with legacy.locked():
+            data = legacy.load()
+        self._save_snapshot(_blob_entry(username, user) for username, user in data.items())
+        print(f"Snapshot {self.snapshot_file} criado a partir de {self.legacy_file} ({len(data)} usuários)")
+
+    def apply(self, data, record):
+        data.pin(record.get("user"))
+        apply_record(data, record)
+
+    def _write_snapshot(self, f, snapshot):
+        return write_snapshot(f, snapshot)
+
+
+class Storage:
+    """Interface de persistência das listas de filmes e séries.
+
+    `key` é sempre "movies" ou "series"; com `abertos=True` a operação vale
+    para a lista Em Aberto do usuário em vez da biblioteca.
+
+    Quem precisa acompanhar as mutações (índices, caches) se registra com
+    `subscribe(callback)`; o callback recebe (op, username, key, title,
+    abertos, version) a cada "add", "remove" ou "move" efetivado, onde
+    `version` é a versão do usuário logo após a mutação.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def _notify(self, op, username, key, title, abertos=False, version=None):
+        for callback in self._listeners:
+            try:
+                callback(op, username, key, title, abertos, version)
+            except Exception as e:
+                print(f"Erro ao notificar mutação: {e}")
+
+    def has_user(self, username):
+        raise NotImplementedError
+
+    def list_users(self):
+        """Nomes dos usuários, na ordem de criação"""
+        raise NotImplementedError
+
+    def get_user(self, username):
+        """Cópia das listas do usuário no formato do media_lists.json, ou None"""
+        raise NotImplementedError
+
+    def init_user(self, username):
+        """Cria o usuário se não existir; retorna True se foi criado"""
+        raise NotImplementedError
+
+    def get_version(self, username):
+        """Versão das listas do usuário (cresce a cada mutação), ou None"""
+        raise NotImplementedError
+
+    def refresh(self):
+        """Entrega aos listeners as mutações gravadas por outros processos.
+
+        Retorna False se a engine não as notifica: quem depende delas
+        compara `version_total()` e `versions()` com o que já recebeu.
+        """
+        return False
+
+    def versions(self):
+        """(nome, versão) de todos os usuários"""
+        return [(username, self.get_version(username)) for username in self.list_users()]
+
+    def version_total(self):
+        """Soma das versões de todos os usuários: muda a cada mutação, de qualquer processo"""
+        return sum(version for _, version in self.versions())
+
+    def count_titles(self, username, key, abertos=False):
+        raise NotImplementedError
+
+    def page_titles(self, username, key, offset, limit, abertos=False):
+        """Até `limit` títulos a partir da posição `offset`, na ordem de inserção"""
+        raise NotImplementedError
+
+    def iter_titles(self, username, key, abertos=False, chunk=1000):
+        """Percorre todos os títulos da lista sem copiá-la inteira (lê `chunk` por vez)"""
+        offset = 0
+        while True:
+            page = self.page_titles(username, key, offset, chunk, abertos)
+            if not page:
+                return
+            yield from page
+            offset += len(page)
+
+    def add_title(self, username, key, title, abertos=False):
+        """Adiciona o título; retorna False se ele já estava na lista"""
+        raise NotImplementedError
+
+    def remove_title(self, username, key, title, abertos=False):
+        """Remove o título; retorna False se ele não estava na lista"""
+        raise NotImplementedError
+
+    def move_to_library(self, username, key, title):
+        """Move o título de Em Aberto para a biblioteca"""
+        raise NotImplementedError
+
+    def apply_batch(self, username, operations):
+        """Aplica várias operações (op, key, title, abertos) de um usuário de uma vez.
+
+        `op` é "add", "remove" ou "move"; retorna um bool por operação, como
+        os métodos individuais. As engines aplicam tudo numa única escrita.
+        """
+        actions = {"add": self.add_title, "remove": self.remove_title}
+        return [self.move_to_library(username, key, title) if op == "move"
+                else actions[op](username, key, title, abertos)
+                for op, key, title, abertos in operations]
+
+    def flush(self):
+        """Garante em disco as mutações já feitas, independente da durabilidade"""
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """Engine original: tudo em memória (conjuntos ordenados), persistido com JournalStore.
+
+    Escritas são serializadas pela trava do journal, que vale também entre
+    workers; antes de cada escrita (e de cada leitura, se o journal mudou)
+    o processo aplica o que os outros gravaram. As listas de cada usuário
+    têm uma trava própria, então ler um usuário não espera escritas nas
+    listas de outro.
+    """
+
+    journal_class = JournalStore
+
+    def __init__(self, snapshot_file, **journal_options):
+        super().__init__()
+        self.journal = self.journal_class(snapshot_file, **journal_options)
+        self._user_locks = {}
+        self._compacting = False
+        with self.journal.locked():
+            self.data = self.journal.load()
+        self.journal.start()
+
+    def _user_lock(self, username):
+        lock = self._user_locks.get(username)
+        if lock is None:
+            lock = self._user_locks.setdefault(username, threading.Lock())
+        return lock
+
+    def _sync(self):
+        """Aplica as mutações gravadas por outros processos (chamar com journal.locked())"""
+        records = self.journal.read_new()
+        if records is None:
+            self._reload()
+            return
+        for record in records:
+            with self._user_lock(record.get("user")):
+                self.journal.apply(self.data, record)
+            op = record.get("op")
+            if op in ("add", "remove"):
+                path = record["path"]
+                self._notify(op, record["user"], path[-1], record["title"], path[0] == "abertos",
+                             record.get("v"))
+            elif op == "move":
+                self._notify("move", record["user"], record["key"], record["title"], False, record.get("v"))
+
+    def _reload(self):
+        """Recarrega tudo após uma compactação de outro processo, notificando as diferenças"""
+        old, self.data = self.data, self.journal.load()
+        for username, user in self.data.items():
+            self._notify_changes(username, old.get(username) or novo_usuario(), user)
+
+    def _notify_changes(self, username, before, user):
+        """Notifica o que mudou nas listas do usuário entre `before` e `user`"""
+        for key in ("movies", "series"):
+            for abertos, antes, depois in ((False, before[key], user[key]),
+                                           (True, before["abertos"][key], user["abertos"][key])):
+                for title in antes.keys() - depois.keys():
+                    self._notify("remove", username, key, title, abertos, user["version"])
+                for title in depois.keys() - antes.keys():
+                    self._notify("add", username, key, title, abertos, user["version"])
+
+    def _refresh(self):
+        """Antes de uma leitura: aplica o que outros processos gravaram, se houver"""
+        if self.journal.changed():
+            with self.journal.locked():
+                self._sync()
+
+    def _versionar(self, record):
+        """Grava no registro a próxima versão do usuário (com a trava do usuário)"""
+        if record["op"] != "init_user":
+            user = self.data.get(record["user"])
+            record["v"] = (user["version"] if user else 0) + 1
+        return record
+
+    def _mutate(self, record):
+        """Aplica a mutação em memória e grava no journal (chamar com
+        journal.locked() e a trava do usuário); retorna a sequência para
+        journal.commit(), a ser chamado já sem as travas"""
+        self.journal.apply(self.data, self._versionar(record))
+        return self._persist([record])
+
+    def _persist(self, records):
+        """Grava no journal mutações já aplicadas em memória (mesmas travas de _mutate)"""
+        try:
+            seq = self.journal.append(records)
+        except Exception as e:
+            print(f"Erro ao salvar dados: {e}")
+            return None
+        if self.journal.should_compact() and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self.compact, daemon=True).start()
+        return seq
+
+    def compact(self, force=False):
+        """Reescreve o snapshot com o estado atual e descarta o journal"""
+        try:
+            with self.journal.locked():
+                self._sync()
+                if self.journal.pending and (force or self.journal.should_compact()):
+                    self._write_snapshot()
+        except Exception as e:
+            print(f"Erro ao compactar dados: {e}")
+        finally:
+            self._compacting = False
+
+    def _write_snapshot(self):
+        """Grava o snapshot com o estado atual (chamar com journal.locked())"""
+        snapshot = {}
+        for username in list(self.data):
+            with self._user_lock(username):
+                snapshot[username] = serializar_usuario(self.data[username])
+        self.journal.compact(snapshot)
+
+    def has_user(self, username):
+        self._refresh()
+        return username in self.data
+
+    def list_users(self):
+        self._refresh()
+        return list(self.data.keys())
+
+    def get_user(self, username):
+        self._refresh()
+        with self._user_lock(username):
+            user = self.data.get(username)
+            if user is None:
+                return None
+            return serializar_usuario(user)
+
+    def init_user(self, username):
+        with self.journal.locked():
+            self._sync()
+            with self._user_lock(username):
+                if username in self.data:
+                    return False
+                seq = self._mutate({"op": "init_user", "user": username})
+        self.journal.commit(seq)
+        return True
+
+    def get_version(self, username):
+        self._refresh()
+        user = self.data.get(username)
+        return None if user is None else user["version"]
+
+    def refresh(self):
+        self._refresh()
+        return True
+
+    def count_titles(self, username, key, abertos=False):
+        path = ["abertos", key] if abertos else [key]
+        self._refresh()
+        with self._user_lock(username):
+            if username not in self.data:
+                return 0
+            return len(_obter_lista(self.data, username, path))
+
+    def page_titles(self, username, key, offset, limit, abertos=False):
+        path = ["abertos", key] if abertos else [key]
+        self._refresh()
+        with self._user_lock(username):
+            if username not in self.data:
+                return []
+            return list(itertools.islice(_obter_lista(self.data, username, path), offset, offset + limit))
+
+    def iter_titles(self, username, key, abertos=False, chunk=1000):
+        # Mantém o iterador do dict entre os lotes (page_titles recomeçaria do
+        # início a cada página); se a lista mudar no meio, retoma pela posição
+        path = ["abertos", key] if abertos else [key]
+        offset, titles = 0, None
+        while True:
+            self._refresh()
+            with self._user_lock(username):
+                if username not in self.data:
+                    return
+                if titles is None:
+                    titles = iter(_obter_lista(self.data, username, path))
+                try:
+                    page = list(itertools.islice(titles, chunk))
+                except RuntimeError:
+                    titles = itertools.islice(iter(_obter_lista(self.data, username, path)), offset, None)
+                    page = list(itertools.islice(titles, chunk))
+            if not page:
+                return
+            yield from page
+            offset += len(page)
+
+    def add_title(self, username, key, title, abertos=False):
+        path = ["abertos", key] if abertos else [key]
+        with self.journal.locked():
+            self._sync()
+            with self._user_lock(username):
+                if title in _obter_lista(self.data, username, path):
+                    return False
+                record = {"op": "add", "user": username, "path": path, "title": title}
+                seq = self._mutate(record)
+            self._notify("add", username, key, title, abertos, record["v"])
+        self.journal.commit(seq)
+        return True
+
+    def remove_title(self, username, key, title, abertos=False):
+        path = ["abertos", key] if abertos else [key]
+        with self.journal.locked():
+            self._sync()
+            with self._user_lock(username):
+                if title not in _obter_lista(self.data, username, path):
+                    return False
+                record = {"op": "remove", "user": username, "path": path, "title": title}
+                seq = self._mutate(record)
+            self._notify("remove", username, key, title, abertos, record["v"])
+        self.journal.commit(seq)
+        return True
+
+    def move_to_library(self, username, key, title):
+        with self.journal.locked():
+            self._sync()
+            with self._user_lock(username):
+                record = {"op": "move", "user": username, "key": key, "title": title}
+                seq = self._mutate(record)
+            self._notify("move", username, key, title, False, record["v"])
+        self.journal.commit(seq)
+        return True
+
+    def apply_batch(self, username, operations):
+        results, records = [], []
+        with self.journal.locked():
+            self._sync()
+            with self._user_lock(username):
+                # Cada operação vê o efeito das anteriores; o journal recebe tudo num write
+                events = []
+                for op, key, title, abertos in operations:
+                    path = ["abertos", key] if abertos else [key]
+                    if op == "move":
+                        record = {"op": "move", "user": username, "key": key, "title": title}
+                    else:
+                        present = title in _obter_lista(self.data, username, path)
+                        if present == (op == "add"):
+                            results.append(False)
+                            continue
+                        record = {"op": op, "user": username, "path": path, "title": title}
+                    self.journal.apply(self.data, self._versionar(record))
+                    records.append(record)
+                    results.append(True)
+                    events.append((op, username, key, title, op != "move" and abertos, record["v"]))
+                seq = self._persist(records) if records else None
+            for event in events:
+                self._notify(*event)
+        self.journal.commit(seq)
+        return results
+
+    def flush(self):
+        self.journal.flush()
+
+    def close(self):
+        self.journal.stop()
+        self.compact(force=True)
+
+
+class MmapStorage(JsonStorage):
+    """JsonStorage com o snapshot binário mapeado em memória (ver LazyUsers).
+
+    O tempo de início e a memória não crescem com a quantidade de usuários:
+    só o journal é reaplicado, e cada usuário é decodificado no primeiro
+    acesso. A compactação copia direto do snapshot anterior os usuários que
+    não estão em memória.
+    """
+
+    journal_class = BinaryJournalStore
+
+    def _reload(self):
+        # O snapshot novo tem os usuários do antigo nas mesmas posições (ordem
+        # de criação), então basta comparar as versões e decodificar só quem mudou
+        old, self.data = self.data, self.journal.load()
+        previous = old.versions()
+        for username, version in self.data.versions():
+            before = next(previous, (None, None))
+            if before[0] != username:
+                before = (username, old.version(username))
+            if before[1] != version:
+                self._notify_changes(username, old.get(username) or novo_usuario(), self.data[username])
+
+    def _write_snapshot(self):
+        self.journal.compact(self.data.entries())
+        self.data.rebase(SnapshotReader(self.journal.snapshot_file))
+
+    def get_version(self, username):
+        self._refresh()
+        return self.data.version(username)
+
+
+class SqliteStorage(Storage):
+    """Uma linha por título, com índice único em (usuário, categoria, título).
+
+    Inserções e remoções são de uma única linha, então o custo de escrita
+    não depende do tamanho da biblioteca. A categoria guarda o caminho da
+    lista: "movies", "series", "abertos.movies" ou "abertos.series".
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS titles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            category TEXT NOT NULL,
+            title TEXT NOT NULL,
+            UNIQUE (username, category, title)
+        );
+        CREATE INDEX IF NOT EXISTS titles_by_list ON titles (username, category, id);
+    """
+
+    def __init__(self, db_file, durability=DURABILITY):
+        super().__init__()
+        self.db_file = db_file
+        # Em WAL, FULL faz fsync a cada commit; NORMAL só nos checkpoints
+        self._synchronous = 'NORMAL' if durability == 'interval' else 'FULL'
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        # Bancos criados antes da coluna de versão
+        if 'version' not in [row[1] for row in conn.execute('PRAGMA table_info(users)')]:
+            conn.execute('ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+    def _conn(self):
+        """Uma conexão por thread, em modo WAL e autocommit"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Importado só aqui: as outras engines não pagam pelo sqlite3 no início
+            import sqlite3
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self._synchronous}')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Transação de escrita (BEGIN IMMEDIATE) na conexão da thread"""
+        conn = self._conn()
+        with WRITE_SECONDS.time(backend='sqlite', op='transaction'):
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                yield conn
+
+    @staticmethod
+    def _category(key, abertos):
+        return f"abertos.{key}" if abertos else key
+
+    @staticmethod
+    def _bump(conn, username, count=1):
+        """Incrementa a versão do usuário (dentro da transação); retorna a nova versão"""
+        conn.execute('UPDATE users SET version = version + ? WHERE name = ?', (count, username))
+        row = conn.execute('SELECT version FROM users WHERE name = ?', (username,)).fetchone()
+        return None if row is None else row[0]
+
+    def has_user(self, username):
+        row = self._conn().execute('SELECT 1 FROM users WHERE name = ?', (username,)).fetchone()
+        return row is not None
+
+    def get_version(self, username):
+        row = self._conn().execute('SELECT version FROM users WHERE name = ?', (username,)).fetchone()
+        return None if row is None else row[0]
+
+    def list_users(self):
+        return [row[0] for row in self._conn().execute('SELECT name FROM users ORDER BY id')]
+
+    def versions(self):
+        return self._conn().execute('SELECT name, version FROM users ORDER BY id').fetchall()
+
+    def version_total(self):
+        return self._conn().execute('SELECT COALESCE(SUM(version), 0) FROM users').fetchone()[0]
+
+    def get_user(self, username):
+        version = self.get_version(username)
+        if version is None:
+            return None
+        user = {"movies": [], "series": [], "abertos": {"movies": [], "series": []}, "version": version}
+        rows = self._conn().execute(
+            'SELECT category, title FROM titles WHERE username = ? ORDER BY id', (username,))
+        for category, title in rows:
+            if category.startswith('abertos.'):
+                user["abertos"][category[len('abertos.'):]].append(title)
+            else:
+                user[category].append(title)
+        return user
+
+    def init_user(self, username):
+        cur = self._conn().execute('INSERT OR IGNORE INTO users (name) VALUES (?)', (username,))
+        return cur.rowcount > 0
+
+    def count_titles(self, username, key, abertos=False):
+        row = self._conn().execute(
+            'SELECT COUNT(*) FROM titles WHERE username = ? AND category = ?',
+            (username, self._category(key, abertos))).fetchone()
+        return row[0]
+
+    def page_titles(self, username, key, offset, limit, abertos=False):
+        rows = self._conn().execute(
+            'SELECT title FROM titles WHERE username = ? AND category = ? ORDER BY id LIMIT ? OFFSET ?',
+            (username, self._category(key, abertos), limit, offset))
+        return [row[0] for row in rows]
+
+    def iter_titles(self, username, key, abertos=False, chunk=1000):
+        # Paginação pela chave (id > último visto) em vez de OFFSET
+        last_id = 0
+        while True:
+            rows = self._conn().execute(
+                'SELECT id, title FROM titles WHERE username = ? AND category = ? AND id > ? ORDER BY id LIMIT ?',
+                (username, self._category(key, abertos), last_id, chunk)).fetchall()
+            if not rows:
+                return
+            for _, title in rows:
+                yield title
+            last_id = rows[-1][0]
+
+    def add_title(self, username, key, title, abertos=False):
+        with self._transaction() as conn:
+            cur = conn.execute(
+                'INSERT OR IGNORE INTO titles (username, category, title) VALUES (?, ?, ?)',
+                (username, self._category(key, abertos), title))
+            version = self._bump(conn, username) if cur.rowcount else None
+        if cur.rowcount == 0:
+            return False
+        self._notify("add", username, key, title, abertos, version)
+        return True
+
+    def remove_title(self, username, key, title, abertos=False):
+        with self._transaction() as conn:
+            cur = conn.execute(
+                'DELETE FROM titles WHERE username = ? AND category = ? AND title = ?',
+                (username, self._category(key, abertos), title))
+            version = self._bump(conn, username) if cur.rowcount else None
+        if cur.rowcount == 0:
+            return False
+        self._notify("remove", username, key, title, abertos, version)
+        return True
+
+    def move_to_library(self, username, key, title):
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO titles (username, category, title) VALUES (?, ?, ?)',
+                (username, key, title))
+            conn.execute(
+                'DELETE FROM titles WHERE username = ? AND category = ? AND title = ?',
+                (username, self._category(key, True), title))
+            version = self._bump(conn, username)
+        self._notify("move", username, key, title, False, version)
+        return True
+
+    def apply_batch(self, username, operations):
+        results, events = [], []
+        with self._transaction() as conn:
+            for op, key, title, abertos in operations:
+                if op == "move":
+                    conn.execute(
+                        'INSERT OR IGNORE INTO titles (username, category, title) VALUES (?, ?, ?)',
+                        (username, key, title))
+                    conn.execute(
+                        'DELETE FROM titles WHERE username = ? AND category = ? AND title = ?',
+                        (username, self._category(key, True), title))
+                    done = True
+                elif op == "add":
+                    done = conn.execute(
+                        'INSERT OR IGNORE INTO titles (username, category, title) VALUES (?, ?, ?)',
+                        (username, self._category(key, abertos), title)).rowcount > 0
+                else:
+                    done = conn.execute(
+                        'DELETE FROM titles WHERE username = ? AND category = ? AND title = ?',
+                        (username, self._category(key, abertos), title)).rowcount > 0
+                results.append(done)
+                if done:
+                    events.append((op, username, key, title, op != "move" and abertos))
+            version = self._bump(conn, username, len(events)) if events else None
+        # O lote ocupa as últimas len(events) versões, até a atual
+        first = None if version is None else version - len(events) + 1
+        for i, event in enumerate(events):
+            self._notify(*event, None if first is None else first + i)
+        return results
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_storage(backend=STORAGE_BACKEND, json_file='media_lists.json', db_file=SQLITE_DB_FILE,
+                   durability=DURABILITY):
+    """Instancia a engine configurada em STORAGE_BACKEND"""
+    if backend == 'sqlite':
+        return SqliteStorage(db_file, durability=durability)
+    if backend == 'json':
+        return JsonStorage(json_file, durability=durability)
+    if backend == 'mmap':
+        return MmapStorage(os.path.splitext(json_file)[0] + MMAP_SNAPSHOT_SUFFIX, legacy_file=json_file,
+                           durability=durability)
+    raise ValueError(f"Engine de persistência desconhecida: {backend}")
+
+def migrate_json_to_sqlite(json_file, db_file):
+    """Importa um media_lists.json (e seu journal) para o banco SQLite"""
+    store = JournalStore(json_file)
+    with store.locked():
+        data = store.load()
+    db = SqliteStorage(db_file)
+    conn = db._conn()
+    rows = 0
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        for username, user in data.items():
+            conn.execute('INSERT OR IGNORE INTO users (name, version) VALUES (?, ?)',
+                         (username, user.get("version", 0)))
+            lists = [(key, user.get(key, [])) for key in ("movies", "series")]
+            lists += [(f"abertos.{key}", user.get("abertos", {}).get(key, [])) for key in ("movies", "series")]
+            for category, titles in lists:
+                cur = conn.executemany(
+                    'INSERT OR IGNORE INTO titles (username, category, title) VALUES (?, ?, ?)',
+                    ((username, category, title) for title in titles))
+                rows += cur.rowcount
+    db.close()
+    return len(data), rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ferramentas de persistência da biblioteca")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="importa um media_lists.json para o SQLite")
+    migrate.add_argument("json_file", nargs="?", default="media_lists.json")
+    migrate.add_argument("db_file", nargs="?", default=SQLITE_DB_FILE)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        users, rows = migrate_json_to_sqlite(args.json_file, args.db_file)
+        print(f"{users} usuários e {rows} títulos importados para {args.db_file}")
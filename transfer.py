@@ -0,0 +1,172 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+
+from storage import create_storage, validar_categoria, validar_titulo
+
+# Formatos de importação/exportação e o Content-Type de cada um
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+# Colunas do CSV (e chaves de cada linha do JSON Lines), no formato do /batch
+FIELDS = ("lista", "category", "title")
+# Listas exportadas, na ordem
+SECTIONS = (("biblioteca", "movies"), ("biblioteca", "series"),
+            ("abertos", "movies"), ("abertos", "series"))
+# Linhas por pedaço gerado na exportação e operações por lote na importação
+EXPORT_CHUNK = 1000
+IMPORT_CHUNK = 5000
+
+
+def export_rows(storage, username):
+    """Gera (lista, categoria, título) de todas as listas do usuário, sem copiá-las"""
+    for lista, key in SECTIONS:
+        category = "filme" if key == "movies" else "serie"
+        for title in storage.iter_titles(username, key, abertos=lista == "abertos"):
+            yield lista, category, title
+
+def export_chunks(storage, username, fmt="csv", rows_per_chunk=EXPORT_CHUNK):
+    """Texto da exportação em pedaços de `rows_per_chunk` linhas (memória constante)"""
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(FIELDS)
+        write = writer.writerow
+    else:
+        # lista e categoria são valores fixos: só o título passa pelo encoder
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+
+        def write(row):
+            buffer.write(f'{{"lista": "{row[0]}", "category": "{row[1]}", "title": {encode(row[2])}}}\n')
+
+    for count, row in enumerate(export_rows(storage, username), 1):
+        write(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def text_lines(stream):
+    """Linhas de texto de um stream binário (corpo da requisição, arquivo enviado)"""
+    for line in stream:
+        yield line.decode('utf-8-sig', errors='replace')
+
+def parse_rows(lines, fmt="csv"):
+    """Lê as linhas incrementalmente; gera um dict por título (None se a linha for inválida).
+
+    No CSV o cabeçalho é opcional: sem ele, as colunas seguem FIELDS.
+    """
+    if fmt == "csv":
+        reader = csv.reader(lines)
+        first = next(reader, None)
+        if first is None:
+            return
+        header = [column.strip().lower() for column in first]
+        if "title" in header:
+            columns = header
+        else:
+            columns = FIELDS
+            yield dict(zip(columns, first))
+        for values in reader:
+            if values:
+                yield dict(zip(columns, values))
+    else:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+def _operacao(item):
+    """Converte uma linha importada em operação "add" do storage, ou None se inválida"""
+    if not isinstance(item, dict):
+        return None
+    title, category = item.get("title"), item.get("category")
+    lista = item.get("lista") or "biblioteca"
+    if not validar_titulo(title) or not validar_categoria(category) or lista not in ("biblioteca", "abertos"):
+        return None
+    return ("add", "movies" if category == "filme" else "series", title.strip(), lista == "abertos")
+
+def import_rows(storage, username, rows, chunk_size=IMPORT_CHUNK):
+    """Adiciona os títulos em lotes, descartando repetidos; retorna os totais.
+
+    Repetidos dentro do próprio arquivo são descartados antes de chegar ao
+    storage; os que já estavam na biblioteca contam como repetidos também.
+    """
+    storage.init_user(username)
+    totals = {"imported": 0, "duplicates": 0, "invalid": 0}
+    seen, batch = set(), []
+
+    def aplicar():
+        imported = sum(storage.apply_batch(username, batch))
+        totals["imported"] += imported
+        totals["duplicates"] += len(batch) - imported
+        batch.clear()
+
+    for item in rows:
+        operation = _operacao(item)
+        if operation is None:
+            totals["invalid"] += 1
+        elif operation in seen:
+            totals["duplicates"] += 1
+        else:
+            seen.add(operation)
+            batch.append(operation)
+            if len(batch) >= chunk_size:
+                aplicar()
+    if batch:
+        aplicar()
+    return totals
+
+def guess_format(filename, default="csv"):
+    """Formato pela extensão do arquivo (.csv, .jsonl, .ndjson)"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    return default
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta e importa bibliotecas em CSV ou JSON Lines")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="exporta as listas de um usuário")
+    export.add_argument("username")
+    export.add_argument("-o", "--output", help="arquivo de saída (padrão: stdout)")
+    export.add_argument("-f", "--format", choices=FORMATS)
+    load = commands.add_parser("import", help="importa títulos para um usuário")
+    load.add_argument("username")
+    load.add_argument("file", help="arquivo de entrada ('-' para stdin)")
+    load.add_argument("-f", "--format", choices=FORMATS)
+    parser.add_argument("--data", default="media_lists.json", help="media_lists.json (storage JSON)")
+    args = parser.parse_args()
+
+    storage = create_storage(json_file=args.data)
+    try:
+        if args.command == "export":
+            if not storage.has_user(args.username):
+                sys.exit(f"Usuário não encontrado: {args.username}")
+            fmt = args.format or guess_format(args.output)
+            out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+            try:
+                for chunk in export_chunks(storage, args.username, fmt):
+                    out.write(chunk)
+            finally:
+                if args.output:
+                    out.close()
+        else:
+            fmt = args.format or guess_format(args.file)
+            source = sys.stdin.buffer if args.file == '-' else open(args.file, 'rb')
+            with source:
+                totals = import_rows(storage, args.username, parse_rows(text_lines(source), fmt))
+            print(f"{totals['imported']} importados, {totals['duplicates']} repetidos, "
+                  f"{totals['invalid']} inválidos")
+    finally:
+        storage.close()
@@ -0,0 +1,44 @@
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+# Quantidade de pares (User-Agent, Accept-Language) distintos guardados no cache
+USER_AGENT_CACHE_SIZE = int(os.environ.get('USER_AGENT_CACHE_SIZE', '1024'))
+
+DeviceInfo = namedtuple('DeviceInfo', ['is_mobile', 'browser', 'os', 'language'])
+
+
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
+def parse_user_agent(user_agent, accept_language):
+    """Detecta dispositivo, navegador, SO e idioma (memoizado: o tráfego real
+    tem poucos User-Agents distintos)"""
+    # Detecta tipo de dispositivo
+    is_mobile = any(keyword in user_agent.lower() for keyword in
+                    ['mobile', 'android', 'iphone', 'ipad', 'windows phone'])
+
+    # Detecta navegador
+    browser = 'Unknown'
+    if 'Chrome' in user_agent:
+        browser = 'Chrome'
+    elif 'Firefox' in user_agent:
+        browser = 'Firefox'
+    elif 'Safari' in user_agent and 'Chrome' not in user_agent:
+        browser = 'Safari'
+    elif 'Edge' in user_agent:
+        browser = 'Edge'
+
+    # Detecta sistema operacional
+    os_info = 'Unknown'
+    if 'Windows' in user_agent:
+        os_info = 'Windows'
+    elif 'Mac' in user_agent:
+        os_info = 'macOS'
+    elif 'Linux' in user_agent:
+        os_info = 'Linux'
+    elif 'Android' in user_agent:
+        os_info = 'Android'
+    elif 'iOS' in user_agent or 'iPhone' in user_agent or 'iPad' in user_agent:
+        os_info = 'iOS'
+
+    language = accept_language.split(',')[0] if accept_language else 'Unknown'
+    return DeviceInfo(is_mobile, browser, os_info, language)
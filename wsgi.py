@@ -0,0 +1,4 @@
+"""Ponto de entrada WSGI: gunicorn -c gunicorn.conf.py wsgi:app"""
+from main import create_app
+
+app = create_app()